@@ -1,8 +1,10 @@
-# backend/app/__init__.py - v1.0
-from flask import Flask
+# backend/app/__init__.py - v1.1
+import time
+from flask import Flask, Response, g, request
 from flask_cors import CORS
 from app.config import config
 from app.tasks.celery_app import celery_app
+from app.utils.prometheus_metrics import API_LATENCY, render_metrics
 
 __all__ = ['celery_app']
 
@@ -25,8 +27,28 @@ def create_app():
     app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
     app.register_blueprint(tvl_sparkline_bp, url_prefix='/api/analytics/tvl')
     
+    @app.before_request
+    def start_request_timer():
+        g.request_started_at = time.perf_counter()
+    
+    @app.after_request
+    def record_request_latency(response):
+        started_at = g.pop('request_started_at', None)
+        if started_at is not None and request.endpoint != 'metrics':
+            API_LATENCY.labels(
+                request.blueprint or 'app',
+                request.method,
+                response.status_code
+            ).observe(time.perf_counter() - started_at)
+        return response
+    
     @app.route('/health')
     def health():
         return {'status': 'healthy'}, 200
     
+    @app.route('/metrics')
+    def metrics():
+        body, content_type = render_metrics()
+        return Response(body, content_type=content_type)
+    
     return app
\ No newline at end of file
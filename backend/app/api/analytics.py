@@ -1,9 +1,16 @@
-# backend/app/api/analytics.py - v3.1
+# backend/app/api/analytics.py - v3.11
+from datetime import datetime
+import redis
 from flask import Blueprint, jsonify, request
-from app.models import stakes_collection, users_collection
-from app.models.metric import Metric
+from app.models import stakes_collection
+from app.models.metric import MAX_HOURS, Metric
+from app.models.user import User
+from app.models.pool_stats import PoolStats
 from app.utils.web3_utils import web3_manager
-from app.utils.mongodb_helpers import convert_to_double
+from app.utils.mongodb_helpers import decode_amount
+from app.utils.analytics_helpers import DOWNSAMPLING_METHODS, downsample_series
+from app.services.contract_state import get_contract_info as get_contract_snapshot
+from app.services import leaderboard
 
 analytics_bp = Blueprint('analytics', __name__)
 
@@ -47,21 +54,8 @@ def get_tier_analytics():
 @analytics_bp.route('/contract', methods=['GET'])
 def get_contract_info():
     try:
-        contract = web3_manager.staking_pool
-        
-        total_staked = contract.functions.totalStaked().call()
-        reward_pool = contract.functions.rewardPoolBalance().call()
-        
-        contract_balance = web3_manager.dai_token.functions.balanceOf(
-            web3_manager.staking_pool.address
-        ).call()
-        
-        return jsonify({
-            'total_staked': str(total_staked),
-            'reward_pool_balance': str(reward_pool),
-            'contract_balance': str(contract_balance),
-            'contract_address': web3_manager.staking_pool.address
-        }), 200
+        # Snapshot of the latest block, shared through Redis (see app.services.contract_state)
+        return jsonify(get_contract_snapshot(web3_manager)), 200
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -73,20 +67,30 @@ def get_metrics_history():
         metric_type = request.args.get('type', 'tvl')
         hours = int(request.args.get('hours', 24))
         limit = int(request.args.get('limit', 100))
+        method = request.args.get('method', 'lttb')
         
-        if limit > 500:
-            return jsonify({'error': 'Limit cannot exceed 500'}), 400
+        if hours < 1 or hours > MAX_HOURS:
+            return jsonify({'error': f'hours must be between 1 and {MAX_HOURS}'}), 400
+        if limit < 10 or limit > 500:
+            return jsonify({'error': 'Limit must be between 10 and 500'}), 400
+        if method not in DOWNSAMPLING_METHODS:
+            return jsonify({'error': f"method must be one of {', '.join(DOWNSAMPLING_METHODS)}"}), 400
         
-        history = Metric.get_history(metric_type, hours=hours, limit=limit)
+        # Bucketed by MongoDB (first/min/max/last per bin), then reduced to
+        # `limit` points keeping spikes and the oldest point; oldest first
+        series = Metric.get_series(metric_type, hours=hours, points=limit, metadata=True)
+        history = downsample_series(series, limit, method=method)
         
         return jsonify({
             'type': metric_type,
             'hours': hours,
+            'resolution': Metric.resolution_for(hours, limit).name,
+            'method': method,
             'data_points': len(history),
             'history': [
                 {
                     'value': str(h['value']),
-                    'metadata': h.get('metadata', {}),
+                    'metadata': h['metadata'],
                     'timestamp': h['timestamp'].isoformat()
                 }
                 for h in history
@@ -110,61 +114,63 @@ def get_metric_types():
 @analytics_bp.route('/top-stakers', methods=['GET'])
 def get_top_stakers():
     """
-    Get top stakers from latest snapshot.
+    Get the staker leaderboard (Redis sorted sets maintained by the listener,
+    see app.services.leaderboard).
 
     Query params:
-    - limit (int): Number of stakers to return (default: 3, max: 100)
-    - tier_id (int): Optional filter by tier (0, 1, or 2)
+    - limit (int): Number of stakers to return (default: 3, max: 1000)
+    - offset (int): Ranks to skip, for paging (default: 0)
+    - tier_id (int): Optional, rank by active stake in that tier only
+    - by (str): 'staked' (default) or 'rewards' (rewards claimed)
     """
     try:
-        # Parse query parameters
         limit = int(request.args.get('limit', 3))
+        offset = int(request.args.get('offset', 0))
         tier_id = request.args.get('tier_id', None)
+        tier_id = int(tier_id) if tier_id is not None else None
+        by = request.args.get('by', 'staked')
+
+        if limit < 1 or limit > 1000:
+            return jsonify({'error': 'Limit must be between 1 and 1000'}), 400
+        if offset < 0:
+            return jsonify({'error': 'Offset cannot be negative'}), 400
+        if by not in ('staked', 'rewards'):
+            return jsonify({'error': "by must be 'staked' or 'rewards'"}), 400
+        if by == 'rewards' and tier_id is not None:
+            return jsonify({'error': 'tier_id only applies to by=staked'}), 400
+
+        try:
+            if by == 'rewards':
+                ranked = leaderboard.top(limit, offset, key=leaderboard.REWARDS_KEY)
+            else:
+                ranked = leaderboard.top(limit, offset, tier_id=tier_id)
+        except redis.RedisError:
+            if offset or tier_id is not None or by != 'staked':
+                raise
+            return _get_top_stakers_snapshot(limit)
+
+        addresses = [address for address, _ in ranked]
+        details = leaderboard.describe(addresses, tier_id)
 
-        # Validate limit
-        if limit < 1 or limit > 100:
-            return jsonify({'error': 'Limit must be between 1 and 100'}), 400
-
-        # Get latest top_users snapshot from metrics
-        latest_snapshot = Metric.get_latest('top_users')
-
-        if not latest_snapshot:
-            return jsonify({
-                'stakers': [],
-                'timestamp': None,
-                'message': 'No snapshots available yet'
-            }), 200
-
-        # Extract users array from metadata
-        users = latest_snapshot.get('metadata', {}).get('users', [])
-
-        # Filter by tier if specified
-        if tier_id is not None:
-            tier_id_int = int(tier_id)
-            # Note: Tier filtering requires aggregation from stakes_collection
-            # For now, we'll skip filtering and just return top users
-            # This can be enhanced later if needed
-
-        # Apply limit
-        users = users[:limit]
-
-        # Format response with rank
         stakers = [
             {
-                'rank': idx + 1,
-                'address': user['address'],
-                'total_staked': user['total_staked'],
-                'total_staked_formatted': f"{int(user['total_staked']) / 10**18:,.2f} DAI",
-                'rewards_claimed': user['rewards_claimed'],
-                'active_stakes': user['active_stakes']
+                'rank': offset + idx + 1,
+                'address': address,
+                'total_staked': str(details[address]['total_staked']),
+                'total_staked_formatted': f"{details[address]['total_staked'] / 10**18:,.2f} DAI",
+                'rewards_claimed': str(details[address]['rewards_claimed']),
+                'active_stakes': details[address]['active_stakes']
             }
-            for idx, user in enumerate(users)
+            for idx, address in enumerate(addresses)
         ]
 
         return jsonify({
             'stakers': stakers,
             'count': len(stakers),
-            'timestamp': latest_snapshot['timestamp'].isoformat()
+            'offset': offset,
+            'tier_id': tier_id,
+            'by': by,
+            'timestamp': datetime.utcnow().isoformat()
         }), 200
 
     except ValueError:
@@ -172,26 +178,42 @@ def get_top_stakers():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def _get_tvl():
-    """
-    Calculate Total Value Locked (TVL) from active stakes.
+def _get_top_stakers_snapshot(limit):
+    """Fallback without Redis: the latest top_users snapshot (top 10, up to 15 minutes old)."""
+    latest_snapshot = Metric.get_latest('top_users')
 
-    Uses convert_to_double() to handle mixed int/string amounts in MongoDB.
-    Large uint256 values (>2^63) are stored as strings to avoid overflow.
-    """
-    pipeline = [
-        {'$match': {'status': 'active'}},
+    if not latest_snapshot:
+        return jsonify({
+            'stakers': [],
+            'timestamp': None,
+            'message': 'No snapshots available yet'
+        }), 200
+
+    users = latest_snapshot.get('metadata', {}).get('users', [])[:limit]
+    stakers = [
         {
-            '$group': {
-                '_id': None,
-                # Convert amount (int or string) to double before summing
-                'total': {'$sum': convert_to_double('$amount')}
-            }
+            'rank': idx + 1,
+            'address': user['address'],
+            'total_staked': user['total_staked'],
+            'total_staked_formatted': f"{int(user['total_staked']) / 10**18:,.2f} DAI",
+            'rewards_claimed': user['rewards_claimed'],
+            'active_stakes': user['active_stakes']
         }
+        for idx, user in enumerate(users)
     ]
 
-    result = list(stakes_collection.aggregate(pipeline))
-    tvl_wei = int(result[0]['total']) if result else 0
+    return jsonify({
+        'stakers': stakers,
+        'count': len(stakers),
+        'timestamp': latest_snapshot['timestamp'].isoformat()
+    }), 200
+
+def _get_tvl():
+    """
+    Total Value Locked (TVL): sum of active stake amounts, read from the
+    pool_stats documents the listener maintains.
+    """
+    tvl_wei = PoolStats.get()['tvl']
 
     # Convert Wei to DAI (divide by 10^18)
     tvl_dai = tvl_wei / 10**18
@@ -202,89 +224,66 @@ def _get_tvl():
     }
 
 def _get_user_stats():
-    total_users = users_collection.count_documents({})
-    active_users = users_collection.count_documents({'active_stakes_count': {'$gt': 0}})
-    
-    pipeline = [
-        {
-            '$group': {
-                '_id': None,
-                'avg_staked': {'$avg': '$total_staked'},
-                'total_rewards': {'$sum': '$total_rewards_claimed'}
-            }
-        }
-    ]
-    
-    result = list(users_collection.aggregate(pipeline))
+    # Distinct addresses: users are stored once per pool
+    stats = User.stats()
     
     return {
-        'total_users': total_users,
-        'active_users': active_users,
-        'inactive_users': total_users - active_users,
-        'avg_stake_per_user': str(int(result[0]['avg_staked'])) if result else '0',
-        'total_rewards_distributed': str(int(result[0]['total_rewards'])) if result else '0'
+        'total_users': stats['total_users'],
+        'active_users': stats['active_users'],
+        'inactive_users': stats['total_users'] - stats['active_users'],
+        'avg_stake_per_user': str(stats['avg_staked']),
+        'total_rewards_distributed': str(stats['total_rewards'])
     }
 
 def _get_stake_stats():
-    total_stakes = stakes_collection.count_documents({})
-    active_stakes = stakes_collection.count_documents({'status': 'active'})
-    unstaked = stakes_collection.count_documents({'status': 'unstaked'})
-    emergency = stakes_collection.count_documents({'status': 'emergency_withdrawn'})
+    counts = PoolStats.get()['stakes']
     
     return {
-        'total_stakes': total_stakes,
-        'active_stakes': active_stakes,
-        'unstaked_stakes': unstaked,
-        'emergency_withdrawals': emergency
+        'total_stakes': sum(counts.values()),
+        'active_stakes': counts['active'],
+        'unstaked_stakes': counts['unstaked'],
+        'emergency_withdrawals': counts['emergency_withdrawn']
     }
 
-def _get_reward_stats():
-    """
-    Calculate total and average rewards claimed across all stakes.
-
-    Converts total_rewards_claimed to double to handle potential large values.
-    """
-    pipeline = [
+def reward_stats_pipeline():
+    """Total and average rewards claimed over every stake (a whole-collection aggregation)."""
+    return [
         {
             '$group': {
                 '_id': None,
-                # Convert rewards (may be large uint256) to double before aggregation
-                'total_claimed': {'$sum': convert_to_double('$total_rewards_claimed')},
-                'avg_per_stake': {'$avg': convert_to_double('$total_rewards_claimed')}
+                'total_claimed': {'$sum': '$total_rewards_claimed'},
+                'avg_per_stake': {'$avg': '$total_rewards_claimed'}
             }
         }
     ]
 
-    result = list(stakes_collection.aggregate(pipeline))
+def _get_reward_stats():
+    """
+    Calculate total and average rewards claimed across all stakes.
+    """
+    result = list(stakes_collection.aggregate(reward_stats_pipeline()))
 
     return {
-        'total_rewards_claimed': str(int(result[0]['total_claimed'])) if result else '0',
-        'avg_rewards_per_stake': str(int(result[0]['avg_per_stake'])) if result else '0'
+        'total_rewards_claimed': str(decode_amount(result[0]['total_claimed'])) if result else '0',
+        'avg_rewards_per_stake': str(decode_amount(result[0]['avg_per_stake'])) if result else '0'
     }
 
 def _get_tier_distribution():
     """
-    Group active stakes by tier and calculate distribution metrics.
+    Distribution of active stakes by tier, from pool_stats.
 
     Returns stake count, total amount, and average amount per tier.
-    Uses convert_to_double() for amount aggregations.
     """
-    pipeline = [
-        {'$match': {'status': 'active'}},
+    tiers = [
         {
-            '$group': {
-                '_id': '$tier_id',
-                'count': {'$sum': 1},
-                # Convert amount (int or string) to double for aggregation
-                'total_amount': {'$sum': convert_to_double('$amount')},
-                'avg_amount': {'$avg': convert_to_double('$amount')}
-            }
-        },
-        {'$sort': {'_id': 1}}
+            '_id': tier_id,
+            'count': tier['count'],
+            'total_amount': tier['amount'],
+            'avg_amount': tier['amount'] // tier['count']
+        }
+        for tier_id, tier in PoolStats.get()['tiers'].items()
     ]
 
-    tiers = list(stakes_collection.aggregate(pipeline))
-
     tier_names = {
         0: '7 days (5% APY)',
         1: '30 days (8% APY)',
@@ -297,8 +296,8 @@ def _get_tier_distribution():
                 'tier_id': tier['_id'],
                 'tier_name': tier_names.get(tier['_id'], 'Unknown'),
                 'stake_count': tier['count'],
-                'total_staked': str(int(tier['total_amount'])),
-                'avg_stake_amount': str(int(tier['avg_amount'])),
+                'total_staked': str(tier['total_amount']),
+                'avg_stake_amount': str(tier['avg_amount']),
                 # Add human-readable formatted values (Wei → DAI)
                 'total_staked_formatted': f"{tier['total_amount'] / 10**18:,.2f} DAI",
                 'avg_stake_formatted': f"{tier['avg_amount'] / 10**18:,.2f} DAI"
@@ -1,7 +1,8 @@
-# backend/app/api/stakes.py - v2.1
+# backend/app/api/stakes.py - v2.4
 from flask import Blueprint, request, jsonify
 from app.models.stake import Stake
 from app.utils.api_formatters import format_stake_for_api
+from app.utils.mongodb_helpers import decode_amount
 
 stakes_bp = Blueprint('stakes', __name__)
 
@@ -16,18 +17,13 @@ def list_stakes():
         if limit > 100:
             return jsonify({'error': 'Limit cannot exceed 100'}), 400
         
-        query = {}
-        if status:
-            query['status'] = status
         if tier_id is not None:
             try:
-                query['tier_id'] = int(tier_id)
+                int(tier_id)
             except ValueError:
                 return jsonify({'error': 'Invalid tier_id'}), 400
         
-        from app.models import stakes_collection
-        stakes = list(stakes_collection.find(query).skip(skip).limit(limit).sort('created_at', -1))
-        total = stakes_collection.count_documents(query)
+        stakes, total = Stake.get_page(skip, limit, status=status, tier_id=tier_id)
         
         return jsonify({
             'stakes': [format_stake_for_api(s) for s in stakes],
@@ -51,7 +47,8 @@ def get_stake(address, stake_index):
         if not address.startswith('0x') or len(address) != 42:
             return jsonify({'error': 'Invalid address format'}), 400
         
-        stake = Stake.get_by_user_and_index(address, stake_index)
+        # Stake indexes are per pool: ?pool=chain_id:address, default pool otherwise
+        stake = Stake.get_by_user_and_index(address, stake_index, pool=request.args.get('pool'))
         
         if not stake:
             return jsonify({'error': 'Stake not found'}), 404
@@ -77,41 +74,15 @@ def get_active_stakes():
 @stakes_bp.route('/stats', methods=['GET'])
 def get_stakes_stats():
     try:
-        from app.models import stakes_collection
-        
-        pipeline = [
-            {
-                '$group': {
-                    '_id': '$status',
-                    'count': {'$sum': 1},
-                    'total_amount': {'$sum': '$amount'}
-                }
-            }
-        ]
-        
-        stats_by_status = list(stakes_collection.aggregate(pipeline))
-        
-        tier_pipeline = [
-            {
-                '$match': {'status': 'active'}
-            },
-            {
-                '$group': {
-                    '_id': '$tier_id',
-                    'count': {'$sum': 1},
-                    'total_amount': {'$sum': '$amount'}
-                }
-            }
-        ]
-        
-        stats_by_tier = list(stakes_collection.aggregate(tier_pipeline))
+        stats_by_status = Stake.stats_by_status()
+        stats_by_tier = Stake.stats_by_tier()
         
         return jsonify({
             'by_status': [
                 {
                     'status': stat['_id'],
                     'count': stat['count'],
-                    'total_amount': str(stat['total_amount'])
+                    'total_amount': str(decode_amount(stat['total_amount']))
                 }
                 for stat in stats_by_status
             ],
@@ -119,7 +90,7 @@ def get_stakes_stats():
                 {
                     'tier_id': stat['_id'],
                     'count': stat['count'],
-                    'total_amount': str(stat['total_amount'])
+                    'total_amount': str(decode_amount(stat['total_amount']))
                 }
                 for stat in stats_by_tier
             ]
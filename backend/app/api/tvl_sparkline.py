@@ -1,16 +1,19 @@
-# backend/app/api/tvl_sparkline.py - v1.0
+# backend/app/api/tvl_sparkline.py - v1.4
 """
 TVL Sparkline API endpoint for ChainStalker dashboard.
 
-Provides optimized TVL historical data for sparkline visualization.
-Uses centralized helpers from analytics_helpers.py (WEB3 RULESET compliant).
+Provides optimized TVL historical data for sparkline visualization: MongoDB
+buckets the window (Metric.get_series), then analytics_helpers.py reduces
+it to the requested points with LTTB or min-max, so spikes and the baseline
+survive any window. Uses centralized helpers from analytics_helpers.py
+(WEB3 RULESET compliant).
 """
 
 from flask import Blueprint, request, jsonify
-from app.models.metric import Metric
+from app.models.metric import MAX_HOURS, Metric
 from app.utils.analytics_helpers import (
-    calculate_time_window,
-    aggregate_metrics_to_points,
+    DOWNSAMPLING_METHODS,
+    downsample_series,
     format_sparkline_data,
     get_metric_change_data
 )
@@ -24,8 +27,9 @@ def get_tvl_sparkline():
     Get TVL sparkline data for dashboard visualization.
 
     Query Parameters:
-        hours (int, optional): Number of hours to look back (default: 24)
+        hours (int, optional): Number of hours to look back (default: 24, max: MAX_HOURS)
         points (int, optional): Number of data points to return (default: 50)
+        method (str, optional): Downsampling, 'lttb' (default) or 'minmax'
 
     Returns:
         JSON response with:
@@ -59,14 +63,18 @@ def get_tvl_sparkline():
         # Parse query parameters with validation
         hours = int(request.args.get('hours', 24))
         points = int(request.args.get('points', 50))
+        method = request.args.get('method', 'lttb')
 
         # Validate parameters
-        if hours < 1 or hours > 720:  # Max 30 days
-            return jsonify({'error': 'hours must be between 1 and 720'}), 400
+        if hours < 1 or hours > MAX_HOURS:
+            return jsonify({'error': f'hours must be between 1 and {MAX_HOURS}'}), 400
 
         if points < 10 or points > 500:
             return jsonify({'error': 'points must be between 10 and 500'}), 400
 
+        if method not in DOWNSAMPLING_METHODS:
+            return jsonify({'error': f"method must be one of {', '.join(DOWNSAMPLING_METHODS)}"}), 400
+
         # Get current TVL (latest metric)
         current_metric = Metric.get_latest('tvl')
         if not current_metric:
@@ -86,25 +94,25 @@ def get_tvl_sparkline():
 
         current_value_dai = float(current_value_wei) / 1e18
 
-        # Get historical data
-        start_time = calculate_time_window(hours)
-        history_metrics = Metric.get_history(
+        # Get historical data: first/min/max/last of about `points` time
+        # bins, bucketed server-side, oldest first
+        series = Metric.get_series(
             metric_type='tvl',
             hours=hours,
-            limit=1000  # Get more data for better aggregation
+            points=points
         )
 
-        # Aggregate to target number of points (avoid sending too much data)
-        aggregated_metrics = aggregate_metrics_to_points(history_metrics, points)
+        # Downsample to target number of points, keeping spikes and both ends
+        sampled_series = downsample_series(series, points, method=method)
 
         # Format for frontend consumption
         formatted_data = format_sparkline_data(
-            aggregated_metrics,
+            sampled_series,
             value_key='value',
             convert_from_wei=True
         )
 
-        # Calculate change metrics
+        # Calculate change metrics against the oldest point of the window
         change_data = get_metric_change_data(
             current_value=current_value_dai,
             history=formatted_data,
@@ -1,7 +1,8 @@
-# backend/app/api/users.py - v2.1
+# backend/app/api/users.py - v2.3
 from flask import Blueprint, request, jsonify
 from app.models.user import User
 from app.models.stake import Stake
+from app.services import leaderboard
 from app.utils.api_formatters import format_stake_for_api, format_user_for_api
 
 users_bp = Blueprint('users', __name__)
@@ -11,12 +12,14 @@ def list_users():
     try:
         skip = int(request.args.get('skip', 0))
         limit = int(request.args.get('limit', 50))
+        # Optional "chain_id:address" pool key; by default one entry per address over all pools
+        pool = request.args.get('pool')
         
         if limit > 100:
             return jsonify({'error': 'Limit cannot exceed 100'}), 400
         
-        users = User.get_all(skip=skip, limit=limit)
-        total = User.count()
+        users = User.get_all(skip=skip, limit=limit, pool=pool)
+        total = User.count(pool=pool)
         
         return jsonify({
             'users': [format_user_for_api(u) for u in users],
@@ -36,7 +39,8 @@ def get_user(address):
         if not address.startswith('0x') or len(address) != 42:
             return jsonify({'error': 'Invalid address format'}), 400
         
-        user = User.get_by_address(address)
+        # Totals over every pool, or of ?pool=chain_id:address only
+        user = User.get_by_address(address, pool=request.args.get('pool'))
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -72,4 +76,31 @@ def get_user_stakes(address):
         }), 200
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@users_bp.route('/<address>/rank', methods=['GET'])
+def get_user_rank(address):
+    """Leaderboard rank by active stake, overall or within ?tier_id=N."""
+    try:
+        if not address.startswith('0x') or len(address) != 42:
+            return jsonify({'error': 'Invalid address format'}), 400
+
+        tier_id = request.args.get('tier_id')
+        tier_id = int(tier_id) if tier_id is not None else None
+
+        rank, out_of = leaderboard.rank(address, tier_id)
+        details = leaderboard.describe([address.lower()], tier_id)[address.lower()]
+
+        return jsonify({
+            'user_address': address.lower(),
+            'tier_id': tier_id,
+            'rank': rank,
+            'out_of': out_of,
+            'total_staked': str(details['total_staked']),
+            'active_stakes': details['active_stakes']
+        }), 200
+
+    except ValueError:
+        return jsonify({'error': 'Invalid tier_id'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -11,10 +11,21 @@ class Config:
     DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
     
     # Blockchain
-    RPC_URL = os.getenv('RPC_URL', 'http://127.0.0.1:8545')
+    RPC_URL = os.getenv('RPC_URL', 'http://127.0.0.1:8545')  # "url|url|..." for an endpoint pool
+    WS_URL = os.getenv('WS_URL', '')  # Optional, enables newHeads push in the listener
     CHAIN_ID = int(os.getenv('CHAIN_ID', '31337'))
     STAKING_POOL_ADDRESS = os.getenv('STAKING_POOL_ADDRESS')
     DAI_TOKEN_ADDRESS = os.getenv('DAI_TOKEN_ADDRESS')
+    # Multicall3 batching contract reads ('' = one eth_call per read, the
+    # default; the canonical one is 0xcA11bde05977b3631167028862bE2a173976CA11)
+    MULTICALL_ADDRESS = os.getenv('MULTICALL_ADDRESS', '')
+    
+    # Multi-pool listener (see app.utils.pools): "chain_id:address,..." pools,
+    # "chain_id=url,..." endpoints for chains other than CHAIN_ID
+    POOLS = os.getenv('POOLS', '')
+    RPC_URLS = os.getenv('RPC_URLS', '')
+    WS_URLS = os.getenv('WS_URLS', '')
+    LISTENER_PROCESSES = int(os.getenv('LISTENER_PROCESSES', '1'))
     
     # Database
     MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/chainstaker')
@@ -28,7 +39,56 @@ class Config:
     # Event Listener
     START_BLOCK = int(os.getenv('START_BLOCK', '0'))
     POLL_INTERVAL = int(os.getenv('POLL_INTERVAL', '2'))  # Reduced from 5s to 2s for faster UI updates
-    BATCH_SIZE = int(os.getenv('BATCH_SIZE', '1000'))
+    # Blocks closer than this to the head are journaled so a reorg can be rolled back (0 = off)
+    CONFIRMATION_DEPTH = int(os.getenv('CONFIRMATION_DEPTH', '12'))
+    HEAD_TIMEOUT = int(os.getenv('HEAD_TIMEOUT', '60'))  # Max wait for a pushed head before re-checking
+    BATCH_SIZE = int(os.getenv('BATCH_SIZE', '1000'))  # Initial range size, adapted at runtime
+    MIN_BATCH_SIZE = int(os.getenv('MIN_BATCH_SIZE', '10'))
+    MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '50000'))
+    TARGET_EVENTS_PER_RANGE = int(os.getenv('TARGET_EVENTS_PER_RANGE', '2000'))
+    # RPC HTTP client: per-request timeout (seconds) and keep-alive connections per endpoint
+    RPC_TIMEOUT = float(os.getenv('RPC_TIMEOUT', '30'))
+    RPC_POOL_SIZE = int(os.getenv('RPC_POOL_SIZE', '10'))
+    # RPC endpoint pool (app.utils.rpc_pool): hedge reads slower than this latency
+    # percentile of the endpoint (0 = off), latency samples kept per endpoint,
+    # consecutive failures before an endpoint cools down for RPC_COOLDOWN seconds
+    RPC_HEDGE_PERCENTILE = float(os.getenv('RPC_HEDGE_PERCENTILE', '95'))
+    RPC_HEDGE_MIN_DELAY = float(os.getenv('RPC_HEDGE_MIN_DELAY', '0.05'))
+    RPC_LATENCY_WINDOW = int(os.getenv('RPC_LATENCY_WINDOW', '200'))
+    RPC_ERROR_THRESHOLD = int(os.getenv('RPC_ERROR_THRESHOLD', '3'))
+    RPC_COOLDOWN = float(os.getenv('RPC_COOLDOWN', '30'))
+    
+    # Block headers (for event timestamps): blocks per batched JSON-RPC call, cached headers
+    HEADER_BATCH_SIZE = int(os.getenv('HEADER_BATCH_SIZE', '100'))
+    BLOCK_HEADER_CACHE_SIZE = int(os.getenv('BLOCK_HEADER_CACHE_SIZE', '10000'))
+    
+    # Active/standby listener replicas: Redis lease TTL in seconds, so about
+    # the failover time. Opt-in: 0 (default) = no lease and no Redis needed,
+    # only ever run one listener per pool
+    LISTENER_LEASE_TTL = float(os.getenv('LISTENER_LEASE_TTL', '0'))
+    
+    # Failed-range retry queue (exponential backoff, seconds)
+    RETRY_INTERVAL = int(os.getenv('RETRY_INTERVAL', '10'))
+    RETRY_BASE_DELAY = int(os.getenv('RETRY_BASE_DELAY', '30'))
+    RETRY_MAX_DELAY = int(os.getenv('RETRY_MAX_DELAY', '3600'))
+    
+    # Async listener (python -m app.services.async_listener): max fetched
+    # ranges waiting to be written to MongoDB
+    LISTENER_QUEUE_SIZE = int(os.getenv('LISTENER_QUEUE_SIZE', '4'))
+    
+    # Historical backfill (python -m app.services.backfill)
+    BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', '4'))
+    BACKFILL_SHARD_SIZE = int(os.getenv('BACKFILL_SHARD_SIZE', '2000'))
+    
+    # Prometheus /metrics servers of the listener and the Celery worker (0 = off);
+    # the API serves /metrics on its own port
+    LISTENER_METRICS_PORT = int(os.getenv('LISTENER_METRICS_PORT', '9108'))
+    CELERY_METRICS_PORT = int(os.getenv('CELERY_METRICS_PORT', '9109'))
+    
+    # Chain-vs-database reconciliation (app.services.reconciliation): users per
+    # chunk, view calls per Multicall3 eth_call
+    RECONCILE_CHUNK_SIZE = int(os.getenv('RECONCILE_CHUNK_SIZE', '1000'))
+    RECONCILE_MULTICALL_SIZE = int(os.getenv('RECONCILE_MULTICALL_SIZE', '250'))
     
     # Notifications
     ENABLE_NOTIFICATIONS = os.getenv('ENABLE_NOTIFICATIONS', 'true').lower() == 'true'
@@ -37,6 +97,13 @@ class Config:
     # Analytics
     ANALYTICS_UPDATE_INTERVAL = int(os.getenv('ANALYTICS_UPDATE_INTERVAL', '300'))
     CACHE_TTL = int(os.getenv('CACHE_TTL', '60'))
+    # Lifetime of the per-block contract snapshot in Redis (refreshed by the listener on new heads)
+    CONTRACT_INFO_TTL = int(os.getenv('CONTRACT_INFO_TTL', '30'))
+    # Days each metric resolution is kept (app.models.metric, 0 = forever):
+    # raw snapshots, hourly and daily rollups
+    METRIC_RETENTION_RAW_DAYS = int(os.getenv('METRIC_RETENTION_RAW_DAYS', '30'))
+    METRIC_RETENTION_1H_DAYS = int(os.getenv('METRIC_RETENTION_1H_DAYS', '365'))
+    METRIC_RETENTION_1D_DAYS = int(os.getenv('METRIC_RETENTION_1D_DAYS', '1825'))
     
     @staticmethod
     def validate():
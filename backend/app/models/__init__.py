@@ -1,4 +1,4 @@
-# backend/app/models/__init__.py - v1.0
+# backend/app/models/__init__.py - v1.6
 from pymongo import MongoClient
 from app.config import config
 
@@ -11,11 +11,7 @@ stakes_collection = db['stakes']
 metrics_collection = db['metrics']
 notifications_collection = db['notifications']
 raw_events_collection = db['raw_events']
+pool_stats_collection = db['pool_stats']
 
-# Indexes
-users_collection.create_index('address', unique=True)
-stakes_collection.create_index([('user_address', 1), ('stake_index', 1)])
-stakes_collection.create_index('timestamp')
-metrics_collection.create_index('timestamp')
-raw_events_collection.create_index('timestamp')
-raw_events_collection.create_index('event')
\ No newline at end of file
+# Indexes are declared in app.models.indexes and applied by
+# python -m app.models.indexes migrate, not on import
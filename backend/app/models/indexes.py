@@ -0,0 +1,248 @@
+# backend/app/models/indexes.py - v1.5
+"""
+Declarative MongoDB index spec, one list per collection, derived from the
+query shapes the models, API and services actually run (see
+app.models.query_shapes), and the time-series collections of the metric
+resolutions (see app.models.metric).
+
+Neither is created at import time: apply the spec once per deployment
+(and after changing it) with
+
+    python -m app.models.indexes migrate [--dry-run]
+
+which creates the missing time-series collections (converting a regular
+`metrics` collection written by older versions: renamed to metrics_legacy,
+copied, dropped), aligns their expireAfterSeconds with the configured
+retention, then creates the missing indexes and drops the ones the spec no
+longer lists (_id_ excepted). It is idempotent; existing indexes keep their
+default names, so a database indexed by older versions is picked up as is.
+
+    python -m app.models.indexes status     # spec vs database, no changes
+    python -m app.models.indexes explain    # explain() every query shape,
+                                            # exit 1 on a collection scan
+
+The listeners and the backfill refuse to start without the unique
+raw_events index their idempotent replays rely on (require_event_index).
+"""
+import argparse
+import logging
+import sys
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from app.models import db
+from app.models.metric import RESOLUTIONS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Unique raw_events key: a replayed log hits it instead of being applied twice
+EVENT_KEY = [('transaction_hash', ASCENDING), ('log_index', ASCENDING)]
+
+INDEXES = {
+    'users': [
+        # One user document per (address, pool); distinct addresses (User.get_all / count)
+        IndexModel([('address', ASCENDING), ('pool', ASCENDING)], unique=True),
+        # Reconciliation walks a pool's users in _id order; per-pool counts
+        IndexModel([('pool', ASCENDING), ('_id', ASCENDING)]),
+    ],
+    'stakes': [
+        IndexModel([('user_address', ASCENDING), ('stake_index', ASCENDING)]),
+        IndexModel([('pool', ASCENDING), ('user_address', ASCENDING), ('stake_index', ASCENDING)]),
+        # GET /api/stakes: filtered by status and/or tier_id, newest first;
+        # status also drives every active-stakes aggregation
+        IndexModel([('status', ASCENDING), ('created_at', DESCENDING)]),
+        IndexModel([('tier_id', ASCENDING), ('created_at', DESCENDING)]),
+        IndexModel([('created_at', DESCENDING)]),
+    ],
+    # Time-series collections of the metric resolutions
+    **{
+        resolution.collection: [
+            # Created by MongoDB with the collection: Metric.get_series /
+            # get_latest / get_all_types
+            IndexModel([('type', ASCENDING), ('timestamp', ASCENDING)]),
+            # Metric.rollup: newest bucket, source range, re-rolled range
+            IndexModel([('timestamp', ASCENDING)]),
+        ]
+        for resolution in RESOLUTIONS
+    },
+    'raw_events': [
+        # One document per log: lets the listener replay ranges without double-applying
+        IndexModel(EVENT_KEY, unique=True),
+        # Per-pool chain order: projection rebuild, reorg rollback, reconciliation
+        IndexModel([('pool', ASCENDING), ('block_number', ASCENDING), ('log_index', ASCENDING)]),
+        # Time-bucketed analytics (rewards timeline, activity heatmap)
+        IndexModel([('event_name', ASCENDING), ('block_time', ASCENDING)]),
+    ],
+    'undo_journal': [
+        IndexModel([('pool', ASCENDING), ('block_number', ASCENDING)]),
+    ],
+    'failed_ranges': [
+        IndexModel([('pool', ASCENDING), ('next_retry_at', ASCENDING)]),
+    ],
+    'block_coverage': [
+        IndexModel([('pool', ASCENDING), ('from_block', ASCENDING)]),
+    ],
+    'backfill_shards': [
+        # Applied shards of a range; shards following the listener checkpoint
+        IndexModel([('pool', ASCENDING), ('from_block', ASCENDING)]),
+    ],
+}
+
+
+# Documents per insert_many when converting a legacy metrics collection
+COPY_BATCH_SIZE = 1000
+
+
+def timeseries_options(resolution):
+    """create_collection() options of a resolution's collection."""
+    options = {'timeseries': {'timeField': 'timestamp', 'metaField': 'type', 'granularity': resolution.granularity}}
+    if resolution.retention_days:
+        options['expireAfterSeconds'] = resolution.retention_days * 86400
+    return options
+
+
+def collection_plan(database=db):
+    """[(resolution, action)]: 'create', 'convert' (regular collection) or 'expire' (retention changed)."""
+    existing = {info['name']: info for info in database.list_collections()}
+    plan = []
+    for resolution in RESOLUTIONS:
+        info = existing.get(resolution.collection)
+        if info is None:
+            plan.append((resolution, 'create'))
+        elif info.get('type') != 'timeseries':
+            plan.append((resolution, 'convert'))
+        elif info['options'].get('expireAfterSeconds') != timeseries_options(resolution).get('expireAfterSeconds'):
+            plan.append((resolution, 'expire'))
+    return plan
+
+
+def _convert(database, resolution):
+    """Replace a regular collection by a time-series one holding the same documents."""
+    legacy = f"{resolution.collection}_legacy"
+    if legacy not in database.list_collection_names():
+        database[resolution.collection].rename(legacy)
+    else:
+        # An earlier conversion stopped after the rename
+        database.drop_collection(resolution.collection)
+    collection = database.create_collection(resolution.collection, **timeseries_options(resolution))
+
+    batch, copied = [], 0
+    for doc in database[legacy].find({}).sort('timestamp', ASCENDING):
+        batch.append(doc)
+        if len(batch) == COPY_BATCH_SIZE:
+            collection.insert_many(batch)
+            copied, batch = copied + len(batch), []
+    if batch:
+        collection.insert_many(batch)
+        copied += len(batch)
+    database.drop_collection(legacy)
+    return copied
+
+
+def migrate_collections(database=db, dry_run=False):
+    """Create, convert or re-expire the metric time-series collections."""
+    for resolution, action in collection_plan(database):
+        name = resolution.collection
+        options = timeseries_options(resolution)
+        if action == 'create':
+            logger.info(f"{'Would create' if dry_run else 'Creating'} time-series collection {name}")
+            if not dry_run:
+                database.create_collection(name, **options)
+        elif action == 'convert':
+            logger.info(f"{'Would convert' if dry_run else 'Converting'} {name} to a time-series collection")
+            if not dry_run:
+                logger.info(f"Copied {_convert(database, resolution)} documents into {name}")
+        else:
+            expire = options.get('expireAfterSeconds', 'off')
+            logger.info(f"{'Would set' if dry_run else 'Setting'} {name} expireAfterSeconds to {expire}")
+            if not dry_run:
+                database.command('collMod', name, expireAfterSeconds=expire)
+
+
+def _spec_key(document):
+    return list(document['key'].items())
+
+
+def index_plan(database=db):
+    """(collection, missing IndexModels, names of unlisted indexes, names with a different definition)."""
+    plan = []
+    for name, models in INDEXES.items():
+        existing = database[name].index_information()
+        missing, changed = [], []
+        for model in models:
+            wanted = model.document
+            current = existing.get(wanted['name'])
+            if current is None:
+                missing.append(model)
+            elif list(current['key']) != _spec_key(wanted) or current.get('unique', False) != wanted.get('unique', False):
+                changed.append(wanted['name'])
+        listed = {model.document['name'] for model in models}
+        unlisted = [index for index in existing if index != '_id_' and index not in listed]
+        plan.append((name, missing, unlisted, changed))
+    return plan
+
+
+def migrate_indexes(database=db, dry_run=False):
+    """Create missing indexes, drop unlisted and redefined ones (then recreate them)."""
+    for name, missing, unlisted, changed in index_plan(database):
+        collection = database[name]
+        for index in unlisted + changed:
+            logger.info(f"{'Would drop' if dry_run else 'Dropping'} {name}.{index}")
+            if not dry_run:
+                collection.drop_index(index)
+
+        to_create = missing + [model for model in INDEXES[name] if model.document['name'] in changed]
+        for model in to_create:
+            logger.info(f"{'Would create' if dry_run else 'Creating'} {name}.{model.document['name']}")
+        if to_create and not dry_run:
+            collection.create_indexes(to_create)
+
+
+def require_event_index(database=db):
+    """
+    Raise RuntimeError unless raw_events has its unique (transaction_hash,
+    log_index) index: without it a replayed range would apply its events
+    twice instead of being skipped.
+    """
+    for info in database['raw_events'].index_information().values():
+        if info.get('unique') and [(field, int(order)) for field, order in info['key']] == EVENT_KEY:
+            return
+    raise RuntimeError(
+        "raw_events has no unique (transaction_hash, log_index) index: "
+        "run python -m app.models.indexes migrate first"
+    )
+
+
+def main():
+    from app.models.query_shapes import check_query_plans
+
+    parser = argparse.ArgumentParser(description='Apply or check the MongoDB index spec')
+    parser.add_argument('command', choices=['migrate', 'status', 'explain'])
+    parser.add_argument('--dry-run', action='store_true', help='migrate: only log the changes')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        migrate_collections(dry_run=args.dry_run)
+        migrate_indexes(dry_run=args.dry_run)
+        return
+
+    if args.command == 'status':
+        in_sync = True
+        for resolution, action in collection_plan():
+            logger.info(f"{resolution.collection}: time-series collection to {action}")
+            in_sync = False
+        for name, missing, unlisted, changed in index_plan():
+            for model in missing:
+                logger.info(f"{name}: missing {model.document['name']}")
+            for index in unlisted:
+                logger.info(f"{name}: unlisted {index}")
+            for index in changed:
+                logger.info(f"{name}: redefined {index}")
+            in_sync = in_sync and not (missing or unlisted or changed)
+        logger.info("Collections and indexes match the spec" if in_sync else "Run: python -m app.models.indexes migrate")
+        sys.exit(0 if in_sync else 1)
+
+    sys.exit(0 if check_query_plans() else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,46 @@
-# backend/app/models/metric.py - v1.0
+# backend/app/models/metric.py - v1.5
+"""
+Metric snapshots in MongoDB time-series collections (metaField `type`),
+at three resolutions:
+
+    metrics     raw snapshots (every 5-15 min) with their metadata
+    metrics_1h  hourly rollups of metrics
+    metrics_1d  daily rollups of metrics_1h
+
+A rollup document is {'type', 'timestamp' (bucket start), 'min', 'max',
+'avg', 'last', 'count'}, values as Decimal128. Each collection expires its
+documents after its own retention (METRIC_RETENTION_*_DAYS, 0 = keep),
+through the time-series expireAfterSeconds; the collections are created by
+python -m app.models.indexes migrate. Rollups are written by the
+tasks.rollup_metrics Celery task (Metric.rollup_all) once a bucket is
+complete, so the newest hour / day of a rollup tier lags its source.
+"""
+from collections import namedtuple
 from datetime import datetime, timedelta
-from app.models import metrics_collection
+from app.config import config
+from app.models import db, metrics_collection
+from app.utils.mongodb_helpers import decode_amount
+
+Resolution = namedtuple('Resolution', ['name', 'step', 'unit', 'collection', 'retention_days', 'granularity'])
+
+# Finest first; each tier is rolled up from the previous one
+RESOLUTIONS = [
+    Resolution('5m', timedelta(minutes=5), None, 'metrics', config.METRIC_RETENTION_RAW_DAYS, 'minutes'),
+    Resolution('1h', timedelta(hours=1), 'hour', 'metrics_1h', config.METRIC_RETENTION_1H_DAYS, 'hours'),
+    Resolution('1d', timedelta(days=1), 'day', 'metrics_1d', config.METRIC_RETENTION_1D_DAYS, 'hours'),
+]
+
+# Longest window the history endpoints accept: what the coarsest tier keeps
+MAX_HOURS = (RESOLUTIONS[-1].retention_days or 365) * 24
+
+
+def _covers(resolution, window):
+    return not resolution.retention_days or timedelta(days=resolution.retention_days) >= window
+
+
+def _decimal(field):
+    return {'$convert': {'input': field, 'to': 'decimal', 'onError': None, 'onNull': None}}
+
 
 class Metric:
     @staticmethod
@@ -14,19 +54,119 @@ class Metric:
         }
         metrics_collection.insert_one(metric_data)
         return metric_data
-    
+
     @staticmethod
-    def get_history(metric_type, hours=24, limit=100):
-        """Get metric history for the last N hours"""
-        since = datetime.utcnow() - timedelta(hours=hours)
-        
-        return list(metrics_collection.find(
-            {
-                'type': metric_type,
-                'timestamp': {'$gte': since}
-            }
-        ).sort('timestamp', -1).limit(limit))
-    
+    def resolution_for(hours, points):
+        """
+        Coarsest resolution still giving `points` buckets over the last
+        `hours` among those retained that long; the finest retained one
+        when none does.
+        """
+        window = timedelta(hours=hours)
+        covering = [resolution for resolution in RESOLUTIONS if _covers(resolution, window)] or RESOLUTIONS[-1:]
+        for resolution in reversed(covering):
+            if window / resolution.step >= points:
+                return resolution
+        return covering[0]
+
+    @staticmethod
+    def get_series(metric_type, hours=24, points=50, metadata=False):
+        """
+        The last N hours as about `points` time bins, bucketed by MongoDB:
+        each bin returns only its first, lowest, highest and last
+        (timestamp, value) pairs (M4), read at the coarsest resolution
+        giving `points` bins (resolution_for). Spikes and the oldest point
+        of the window survive, and at most 4 * points small documents are
+        transferred, whatever the window. Rollup bins use their rollups'
+        min / max.
+
+        Returns [{'timestamp', 'value' (int)}], oldest first, for
+        analytics_helpers.downsample_series() to reduce to `points`; with
+        metadata=True, raw snapshots also carry their 'metadata' (rollups
+        have none).
+        """
+        resolution = Metric.resolution_for(hours, points)
+        series = []
+        pipeline = Metric.series_pipeline(metric_type, hours, points, resolution, metadata)
+        for bucket in db[resolution.collection].aggregate(pipeline):
+            picked = {}
+            for output in (bucket['first'], bucket['low'], bucket['high'], bucket['last']):
+                point = {'timestamp': output[0], 'value': decode_amount(output[1])}
+                if metadata:
+                    point['metadata'] = output[2] if len(output) > 2 and output[2] else {}
+                picked.setdefault((point['timestamp'], point['value']), point)
+            series.extend(picked[key] for key in sorted(picked))
+        return series
+
+    # Query builders, shared with the explain() harness (app.models.query_shapes)
+
+    @staticmethod
+    def window_query(metric_type, hours):
+        """Snapshots or rollups of a metric over the last N hours."""
+        return {
+            'type': metric_type,
+            'timestamp': {'$gte': datetime.utcnow() - timedelta(hours=hours)}
+        }
+
+    @staticmethod
+    def series_pipeline(metric_type, hours, points, resolution=None, metadata=False):
+        """The M4 bucketing of get_series(), against resolution_for(hours, points) by default."""
+        resolution = resolution or Metric.resolution_for(hours, points)
+        step_minutes = int(resolution.step.total_seconds() // 60)
+        bin_minutes = max(step_minutes, -(-hours * 60 // points))
+
+        raw = resolution.unit is None
+        # [timestamp, value(, metadata)] of a bin's picked points
+        fields = ['$timestamp', '$value'] + (['$metadata'] if metadata and raw else [])
+        low = ['$timestamp', '$low'] + fields[2:]
+        high = ['$timestamp', '$high'] + fields[2:]
+        return [
+            {'$match': Metric.window_query(metric_type, hours)},
+            {'$project': {
+                '_id': 0,
+                'timestamp': 1,
+                'value': _decimal('$value' if raw else '$last'),
+                'low': _decimal('$value' if raw else '$min'),
+                'high': _decimal('$value' if raw else '$max'),
+                **({'metadata': 1} if metadata and raw else {})
+            }},
+            {'$match': {'value': {'$ne': None}}},
+            {'$sort': {'timestamp': 1}},
+            {'$group': {
+                '_id': {'$dateTrunc': {'date': '$timestamp', 'unit': 'minute', 'binSize': bin_minutes}},
+                'first': {'$first': fields},
+                'low': {'$top': {'sortBy': {'low': 1}, 'output': low}},
+                'high': {'$top': {'sortBy': {'high': -1}, 'output': high}},
+                'last': {'$last': fields}
+            }},
+            {'$sort': {'_id': 1}}
+        ]
+
+    @staticmethod
+    def rollup_pipeline(resolution, start, end):
+        """Rollup documents of `resolution` for [start, end), from the tier below."""
+        source = RESOLUTIONS[RESOLUTIONS.index(resolution) - 1]
+        pipeline = [{'$match': {'timestamp': {'$gte': start, '$lt': end}}}]
+        if source.unit is None:
+            # Raw snapshots: every field of a rollup is the value itself
+            value = _decimal('$value')
+            pipeline.append({'$set': {'min': value, 'max': value, 'avg': value, 'last': value, 'count': 1}})
+        return pipeline + [
+            {'$sort': {'timestamp': 1}},
+            {'$group': {
+                '_id': {
+                    'type': '$type',
+                    'timestamp': {'$dateTrunc': {'date': '$timestamp', 'unit': resolution.unit}}
+                },
+                'min': {'$min': '$min'},
+                'max': {'$max': '$max'},
+                'last': {'$last': '$last'},
+                'count': {'$sum': '$count'},
+                'weighted': {'$sum': {'$multiply': ['$avg', '$count']}}
+            }},
+            {'$set': {'avg': {'$divide': ['$weighted', '$count']}}}
+        ]
+
     @staticmethod
     def get_latest(metric_type):
         """Get latest metric value"""
@@ -34,15 +174,61 @@ class Metric:
             {'type': metric_type},
             sort=[('timestamp', -1)]
         )
-    
+
     @staticmethod
     def get_all_types():
         """Get list of all metric types"""
         return metrics_collection.distinct('type')
-    
+
+    @staticmethod
+    def rollup(resolution, now=None):
+        """
+        Roll the complete buckets of `resolution` up from the tier below.
+        Restarts from the newest bucket already written (deleted and
+        recomputed), so an interrupted run is repaired by the next one.
+        Returns the number of rollup documents written.
+        """
+        source = RESOLUTIONS[RESOLUTIONS.index(resolution) - 1]
+        target = db[resolution.collection]
+        end = Metric.bucket_start(resolution, now or datetime.utcnow())
+
+        newest = target.find_one({}, sort=[('timestamp', -1)])
+        if newest:
+            start = newest['timestamp']
+        else:
+            oldest = db[source.collection].find_one({}, sort=[('timestamp', 1)])
+            if not oldest:
+                return 0
+            start = Metric.bucket_start(resolution, oldest['timestamp'])
+        if start >= end:
+            return 0
+
+        docs = [
+            {
+                'type': group['_id']['type'],
+                'timestamp': group['_id']['timestamp'],
+                'min': group['min'],
+                'max': group['max'],
+                'avg': group['avg'],
+                'last': group['last'],
+                'count': group['count']
+            }
+            for group in db[source.collection].aggregate(Metric.rollup_pipeline(resolution, start, end))
+        ]
+
+        target.delete_many({'timestamp': {'$gte': start}})
+        if docs:
+            target.insert_many(docs)
+        return len(docs)
+
+    @staticmethod
+    def rollup_all(now=None):
+        """Bring every rollup tier up to date, finest first; {resolution name: documents written}."""
+        return {resolution.name: Metric.rollup(resolution, now) for resolution in RESOLUTIONS[1:]}
+
     @staticmethod
-    def cleanup_old(days=30):
-        """Delete metrics older than N days"""
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        result = metrics_collection.delete_many({'timestamp': {'$lt': cutoff}})
-        return result.deleted_count
\ No newline at end of file
+    def bucket_start(resolution, timestamp):
+        """Start of the `resolution` bucket holding timestamp."""
+        if resolution.unit == 'day':
+            return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+        return timestamp.replace(minute=0, second=0, microsecond=0)
@@ -0,0 +1,167 @@
+# backend/app/models/pool_stats.py - v1.1
+from datetime import datetime
+from pymongo import UpdateOne
+from app.models import db, pool_stats_collection
+from app.utils.mongodb_helpers import decode_amount, encode_amount
+
+STATUSES = ('active', 'unstaked', 'emergency_withdrawn')
+
+
+def _is_amount(field):
+    return field == 'tvl' or field.endswith('.amount')
+
+
+class PoolStats:
+    """
+    One document per pool, kept current by the listener with $inc in the
+    same batch as the events that change it:
+
+        {'_id': pool_key, 'pool': pool_key,
+         'tvl': Decimal128,                                  sum of active stake amounts
+         'stakes': {'active': n, 'unstaked': n, 'emergency_withdrawn': n},
+         'tiers': {'<tier_id>': {'count': n, 'amount': Decimal128}},   active stakes only
+         'updated_at': datetime}
+
+    Changes are expressed as the difference between a stake's state before
+    and after an event (see delta()), so re-applying an event the database
+    already reflects adds nothing.
+    """
+
+    @staticmethod
+    def contribution(state):
+        """$inc fields a stake in state {'status', 'tier_id', 'amount'} adds to the stats."""
+        if not state:
+            return {}
+        increments = {f"stakes.{state['status']}": 1}
+        if state['status'] == 'active' and state.get('tier_id') is not None:
+            increments['tvl'] = state['amount']
+            increments[f"tiers.{state['tier_id']}.count"] = 1
+            increments[f"tiers.{state['tier_id']}.amount"] = state['amount']
+        return increments
+
+    @staticmethod
+    def delta(before, after):
+        """$inc fields turning a stake's contribution in state before into state after."""
+        increments = PoolStats.contribution(after)
+        for field, value in PoolStats.contribution(before).items():
+            increments[field] = increments.get(field, 0) - value
+        return {field: value for field, value in increments.items() if value}
+
+    @staticmethod
+    def encode_increments(increments):
+        """$inc deltas as stored: amounts as Decimal128, counts as int."""
+        return {
+            field: encode_amount(value) if _is_amount(field) else int(value)
+            for field, value in increments.items()
+        }
+
+    @staticmethod
+    def increments_op(pool, increments):
+        """Upserting UpdateOne applying merged $inc deltas to a pool's stats."""
+        return UpdateOne(
+            {'_id': pool},
+            {
+                '$inc': PoolStats.encode_increments(increments),
+                '$set': {'pool': pool, 'updated_at': datetime.utcnow()}
+            },
+            upsert=True
+        )
+
+    @staticmethod
+    def get(pool=None):
+        """
+        Stats of one pool, or summed over every pool: one document per pool,
+        whatever the number of stakes.
+        Returns {'tvl': int, 'stakes': {status: n}, 'tiers': {tier_id: {'count', 'amount'}}}.
+        """
+        query = {'_id': pool} if pool else {}
+        totals = {'tvl': 0, 'stakes': dict.fromkeys(STATUSES, 0), 'tiers': {}}
+        for doc in pool_stats_collection.find(query):
+            totals['tvl'] += decode_amount(doc.get('tvl'))
+            for status, count in doc.get('stakes', {}).items():
+                totals['stakes'][status] = totals['stakes'].get(status, 0) + count
+            for tier_id, tier in doc.get('tiers', {}).items():
+                merged = totals['tiers'].setdefault(int(tier_id), {'count': 0, 'amount': 0})
+                merged['count'] += tier.get('count', 0)
+                merged['amount'] += decode_amount(tier.get('amount'))
+        # Tiers whose last active stake closed keep zeroed counters
+        totals['tiers'] = {
+            tier_id: tier for tier_id, tier in sorted(totals['tiers'].items()) if tier['count']
+        }
+        return totals
+
+    @staticmethod
+    def compute_pipeline(pools=None):
+        """Stake counts and amounts per (pool, status, tier), of `pools` only when given."""
+        pipeline = [{'$match': {'pool': {'$in': list(pools)}}}] if pools is not None else []
+        return pipeline + [{'$group': {
+            '_id': {'pool': '$pool', 'status': '$status', 'tier_id': '$tier_id'},
+            'count': {'$sum': 1},
+            'amount': {'$sum': '$amount'}
+        }}]
+
+    @staticmethod
+    def compute(stakes, pools=None):
+        """
+        Stats documents computed from a stakes collection with one
+        aggregation, {pool: doc}; only those of `pools` when given.
+        """
+        docs = {}
+        for group in stakes.aggregate(PoolStats.compute_pipeline(pools)):
+            key = group['_id']
+            if key.get('status') is None:
+                continue
+            pool = key.get('pool')
+            doc = docs.setdefault(pool, {
+                '_id': pool, 'pool': pool, 'tvl': 0,
+                'stakes': dict.fromkeys(STATUSES, 0), 'tiers': {}
+            })
+            doc['stakes'][key['status']] = doc['stakes'].get(key['status'], 0) + group['count']
+            if key['status'] == 'active' and key.get('tier_id') is not None:
+                amount = decode_amount(group['amount'])
+                doc['tvl'] += amount
+                tier = doc['tiers'].setdefault(str(key['tier_id']), {'count': 0, 'amount': 0})
+                tier['count'] += group['count']
+                tier['amount'] += amount
+
+        now = datetime.utcnow()
+        for doc in docs.values():
+            doc['tvl'] = encode_amount(doc['tvl'])
+            for tier in doc['tiers'].values():
+                tier['amount'] = encode_amount(tier['amount'])
+            doc['updated_at'] = now
+        return docs
+
+    @staticmethod
+    def recompute(stakes=None, target=None):
+        """
+        Rebuild every pool's document from the stakes collection. Not safe
+        while a listener writes: run it with the listener stopped
+        (python -m app.services.rebuild_projections --pool-stats).
+        """
+        stakes = stakes if stakes is not None else db['stakes']
+        target = target if target is not None else pool_stats_collection
+        docs = PoolStats.compute(stakes)
+        target.delete_many({})
+        if docs:
+            target.insert_many(list(docs.values()))
+        return len(docs)
+
+    @staticmethod
+    def seed_missing(stakes=None, target=None):
+        """
+        Create the document of every pool that has stakes but no stats yet
+        (a database written before pool_stats existed), so the listener's
+        first delta does not land on an empty document. Run before the
+        listener starts (app.services.pool_listeners.migrate_legacy_data);
+        an existing document is never overwritten. Returns the pools seeded.
+        """
+        stakes = stakes if stakes is not None else db['stakes']
+        target = target if target is not None else pool_stats_collection
+        missing = set(stakes.distinct('pool')) - set(target.distinct('_id'))
+        if not missing:
+            return []
+        docs = PoolStats.compute(stakes, missing)
+        for pool, doc in docs.items():
+            target.update_one({'_id': pool}, {'$setOnInsert': doc}, upsert=True)
+        return sorted(docs, key=str)
@@ -0,0 +1,226 @@
+# backend/app/models/query_shapes.py - v1.10
+"""
+Query shapes run by the models, API and services, and an explain() harness
+checking that each one is served by an index.
+
+Every shape is the database command the code sends (find, aggregate,
+distinct, delete; count_documents() is the aggregate it expands to), built
+with placeholder values by the same query builder the code calls
+(User.key(), Stake.stats_by_tier_pipeline(), reorg.blocks_query(), ...), so
+a query changed in the code is explained as changed. check_query_plans()
+explains them all against the configured database and fails on any
+COLLSCAN in a winning plan. Shapes marked full_scan aggregate a whole
+collection by design and are only reported (tests/test_query_shapes.py runs
+it against a scratch database).
+
+Add a shape here whenever a query is added (factor its filter / pipeline
+into a builder first), then run
+    python -m app.models.indexes explain
+against a database indexed with `python -m app.models.indexes migrate`.
+"""
+import logging
+from datetime import datetime, timedelta
+from app.models import db
+from app.models.metric import RESOLUTIONS, Metric
+from app.models.pool_stats import PoolStats
+from app.models.stake import LIST_SORT, Stake
+from app.models.user import User
+from app.utils.pools import default_pool
+
+logger = logging.getLogger(__name__)
+
+ADDRESS = '0x' + '00' * 20
+TX_HASH = '0x' + '00' * 32
+
+
+def find(collection, query, sort=None, limit=None, projection=None):
+    command = {'find': collection, 'filter': query}
+    if sort:
+        command['sort'] = sort
+    if limit:
+        command['limit'] = limit
+    if projection:
+        command['projection'] = projection
+    return command
+
+
+def aggregate(collection, pipeline):
+    return {'aggregate': collection, 'pipeline': pipeline, 'cursor': {}}
+
+
+def count(collection, query):
+    """What Collection.count_documents() sends."""
+    return aggregate(collection, [{'$match': query}, {'$group': {'_id': 1, 'n': {'$sum': 1}}}])
+
+
+def distinct(collection, key, query):
+    return {'distinct': collection, 'key': key, 'query': query}
+
+
+def delete(collection, query):
+    return {'delete': collection, 'deletes': [{'q': query, 'limit': 0}]}
+
+
+def query_shapes():
+    """
+    [(label, command, full_scan)] for every query the application runs,
+    each filter / pipeline built by the function the code itself calls.
+    """
+    # Services import the listener stack; only needed when explaining
+    from app.api.analytics import reward_stats_pipeline
+    from app.services import backfill, leaderboard, pool_listeners, range_recovery, rebuild_projections, reconciliation
+    from app.services.blockchain_listener import STAKE_STATE_FIELDS, backfilled_query
+    from app.services.event_batch import unapplied_query
+    from app.services.reorg import blocks_query
+    from app.tasks import analytics_tasks
+    from app.utils.analytics_helpers import user_total_staked_pipeline
+
+    pool = default_pool().key
+    since = datetime.utcnow() - timedelta(days=1)
+    page = User.addresses_pipeline() + [{'$sort': {'_id': 1}}, {'$skip': 0}, {'$limit': 50}]
+    stakes_page = Stake.query(status='active', tier_id=1)
+
+    return [
+        # users
+        ('User.get_by_address', find('users', User.key(ADDRESS)), False),
+        ('User.get_all: page of addresses', aggregate('users', page), False),
+        ('User.get_all: documents of a page', find('users', User.page_query([ADDRESS])), False),
+        ('User.count', aggregate('users', User.addresses_pipeline() + [{'$count': 'n'}]), False),
+        ('User.count (pool)', count('users', {'pool': pool}), False),
+        ('user upsert', find('users', User.key(ADDRESS, pool), limit=1), False),
+        ('leaderboard: rewards of a page', find('users', leaderboard.rewards_query([ADDRESS]),
+                                                projection=leaderboard.REWARDS_PROJECTION), False),
+        ('reconciliation: users of a pool', find('users', reconciliation.users_chunk_query(pool),
+                                                 sort={'_id': 1}, limit=1000,
+                                                 projection=reconciliation.USER_PROJECTION), False),
+        ('User.stats', aggregate('users', User.stats_pipeline()), True),
+
+        # stakes
+        ('Stake.get_by_user', find('stakes', Stake.query(ADDRESS, 'active')), False),
+        ('Stake.get_by_user_and_index / stake upsert', find('stakes', Stake.key(ADDRESS, 0, pool), limit=1), False),
+        ('Stake.get_all_active', find('stakes', Stake.query(status='active')), False),
+        ('Stake.count_by_status', count('stakes', Stake.query(status='active')), False),
+        *[
+            (f'GET /stakes{label}', find('stakes', query, sort=dict(LIST_SORT), limit=50), False)
+            for label, query in (
+                ('', Stake.query()),
+                ('?status', Stake.query(status='active')),
+                ('?tier_id', Stake.query(tier_id=1)),
+                ('?status&tier_id', stakes_page)
+            )
+        ],
+        ('GET /stakes?status&tier_id count', count('stakes', stakes_page), False),
+        ('GET /stakes/stats by tier', aggregate('stakes', Stake.stats_by_tier_pipeline()), False),
+        ('listener: stake states of a batch', find('stakes', Stake.pool_users_query(pool, [ADDRESS]),
+                                                   projection=STAKE_STATE_FIELDS), False),
+        ('top users', aggregate('stakes', analytics_tasks.top_users_pipeline()), False),
+        ('user total staked from stakes', aggregate('stakes', user_total_staked_pipeline(ADDRESS)), False),
+        ('leaderboard: stakes of a page',
+         aggregate('stakes', leaderboard.active_stakes_pipeline([ADDRESS], tier_id=1)), False),
+        ('reconciliation: stakes of a chunk', find('stakes', Stake.pool_users_query(pool, [ADDRESS])), False),
+        ('GET /stakes/stats by status', aggregate('stakes', Stake.stats_by_status_pipeline()), True),
+        ('reward stats', aggregate('stakes', reward_stats_pipeline()), True),
+        ('effective APY', aggregate('stakes', analytics_tasks.stake_totals_pipeline()), True),
+
+        # pool_stats: one document per pool, read whole by design
+        ('PoolStats.get', find('pool_stats', {}), True),
+        ('PoolStats.seed_missing: pools with stats', distinct('pool_stats', '_id', {}), True),
+        ('PoolStats.seed_missing: pools with stakes', distinct('stakes', 'pool', {}), False),
+        ('PoolStats.seed_missing: aggregation', aggregate('stakes', PoolStats.compute_pipeline([pool])), False),
+        ('PoolStats.recompute', aggregate('stakes', PoolStats.compute_pipeline()), True),
+
+        # metrics (time-series, one collection per resolution)
+        *[
+            shape
+            for resolution in RESOLUTIONS
+            for shape in (
+                (f'Metric.get_series ({resolution.name})', aggregate(
+                    resolution.collection, Metric.series_pipeline('tvl', 24, 50, resolution, metadata=True)
+                ), False),
+                (f'Metric.rollup: newest bucket ({resolution.name})',
+                 find(resolution.collection, {}, sort={'timestamp': -1}, limit=1), False),
+                (f'Metric.rollup: re-rolled range ({resolution.name})',
+                 delete(resolution.collection, {'timestamp': {'$gte': since}}), False),
+            )
+        ],
+        *[
+            (f'Metric.rollup: source range ({source.name})',
+             aggregate(source.collection, Metric.rollup_pipeline(resolution, since, datetime.utcnow())), False)
+            for source, resolution in zip(RESOLUTIONS, RESOLUTIONS[1:])
+        ],
+        ('Metric.get_latest', find('metrics', {'type': 'tvl'}, sort={'timestamp': -1}, limit=1), False),
+        ('Metric.get_all_types', distinct('metrics', 'type', {}), False),
+
+        # raw_events
+        ('event batch: unapplied duplicates', find('raw_events', unapplied_query([(TX_HASH, 0)]),
+                                                   projection={'transaction_hash': 1, 'log_index': 1}), False),
+        ('rewards timeline', aggregate('raw_events', analytics_tasks.rewards_timeline_pipeline(since)), False),
+        ('activity heatmap', aggregate('raw_events', analytics_tasks.activity_heatmap_pipeline(since)), False),
+        ('rebuild: replay a pool', find('raw_events', rebuild_projections.replay_query(pool, (0, 0)),
+                                        sort={'block_number': 1, 'log_index': 1}), False),
+        ('migrate: blocks without block_time', distinct('raw_events', 'block_number',
+                                                        pool_listeners.missing_block_time_query(pool)), False),
+        ('rebuild: untagged events', count('raw_events', rebuild_projections.UNTAGGED_QUERY), False),
+        ('reconciliation: users in flux', distinct('raw_events', 'args.user',
+                                                   reconciliation.in_flux_query(pool, [ADDRESS], 0)), False),
+        ('reorg: rollback raw events', delete('raw_events', blocks_query(pool, first=0)), False),
+
+        # listener bookkeeping
+        ('reorg: journaled blocks', find('undo_journal', blocks_query(pool, last=0), sort={'block_number': -1},
+                                         projection={'block_number': 1, 'block_hash': 1}), False),
+        ('reorg: rollback journal', find('undo_journal', blocks_query(pool, first=0),
+                                         sort={'block_number': -1}), False),
+        ('reorg: prune journal', delete('undo_journal', blocks_query(pool, last=0)), False),
+        ('range recovery: due retries', find('failed_ranges', range_recovery.due_query(pool, since),
+                                             sort={'from_block': 1}, limit=10), False),
+        ('range recovery: coverage', find('block_coverage', {'pool': pool},
+                                          projection=range_recovery.COVERAGE_FIELDS), False),
+        ('backfill: applied shards', find('backfill_shards', backfill.shards_query(pool, 0, 100),
+                                          projection={'_id': 1}), False),
+        ('listener: backfilled blocks', find('backfill_shards', backfilled_query(pool, 0), sort={'from_block': 1},
+                                             projection={'from_block': 1, 'to_block': 1}), False),
+    ]
+
+
+def plan_stages(explanation):
+    """(stage names, index names) of the winning plan(s) in an explain() output."""
+    stages, indexes = set(), set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            if 'stage' in node:
+                stages.add(node['stage'])
+            if node.get('indexName'):
+                indexes.add(node['indexName'])
+            for key, value in node.items():
+                if key not in ('rejectedPlans', 'allPlansExecution'):
+                    walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(explanation)
+    return stages, indexes
+
+
+def check_query_plans(database=db):
+    """Explain every query shape; False if any unexpected collection scan."""
+    passed = True
+    existing = set(database.list_collection_names())
+    for label, command, full_scan in query_shapes():
+        collection = next(iter(command.values()))
+        if collection not in existing:
+            logger.warning(f"SKIP  {label}: no {collection} collection")
+            continue
+
+        explanation = database.command('explain', command, verbosity='queryPlanner')
+        stages, indexes = plan_stages(explanation)
+        uses = ', '.join(sorted(indexes)) or '-'
+        if 'COLLSCAN' not in stages:
+            logger.info(f"OK    {label}: {uses}")
+        elif full_scan:
+            logger.info(f"SCAN  {label}: whole-collection aggregation (expected)")
+        else:
+            passed = False
+            logger.error(f"FAIL  {label}: COLLSCAN on {collection}")
+    return passed
@@ -1,93 +1,211 @@
-# backend/app/models/stake.py - v1.1
+# backend/app/models/stake.py - v1.12
 from datetime import datetime
+from pymongo import DeleteOne, UpdateOne
 from app.models import stakes_collection
-from app.utils.mongodb_helpers import convert_uint256_for_mongodb
+from app.utils.mongodb_helpers import encode_amount
+from app.utils.pools import default_pool
+
+# Fields later events change; StakeCreated only sets them on insert
+MUTABLE_FIELDS = ('status', 'total_rewards_claimed', 'last_reward_claim', 'updated_at')
+# Order of stake listings (GET /stakes), newest first
+LIST_SORT = [('created_at', -1)]
 
 class Stake:
     @staticmethod
-    def create(event_data):
+    def build(event_data):
         """
-        Create a new stake record from blockchain event data.
+        Build a new stake document from blockchain event data.
 
-        Uses convert_uint256_for_mongodb() to safely store large amounts.
+        Amounts are stored as Decimal128 (encode_amount()). created_at and
+        updated_at are the event's block time (blockTime, else the stake's
+        own timestamp), so a replay or rebuild writes the same document.
         """
+        created_at = datetime.utcfromtimestamp(int(event_data.get('blockTime', event_data['timestamp'])))
         stake_data = {
             'user_address': event_data['user'].lower(),
             'stake_index': int(event_data['stakeIndex']),
-            'amount': convert_uint256_for_mongodb(event_data['amount']),
+            'amount': encode_amount(event_data['amount']),
             'tier_id': int(event_data['tierId']),
             'start_time': int(event_data['timestamp']),
             'last_reward_claim': int(event_data['timestamp']),
             'status': 'active',
-            'total_rewards_claimed': 0,
+            'total_rewards_claimed': encode_amount(0),
             'tx_hash': event_data['transactionHash'].hex(),
             'block_number': int(event_data['blockNumber']),
-            'created_at': datetime.utcnow(),
-            'updated_at': datetime.utcnow()
+            'created_at': created_at,
+            'updated_at': created_at
         }
-
-        stakes_collection.insert_one(stake_data)
+        if event_data.get('pool'):
+            stake_data['pool'] = event_data['pool']
         return stake_data
+
+    # Query builders, shared with the explain() harness (app.models.query_shapes)
+
+    @staticmethod
+    def key(user_address, stake_index, pool=None):
+        """Filter on one stake; the pool's one when given."""
+        key = {
+            'user_address': user_address.lower(),
+            'stake_index': int(stake_index)
+        }
+        if pool:
+            key['pool'] = pool
+        return key
+    
+    @staticmethod
+    def query(user_address=None, status=None, tier_id=None):
+        """Filter on stakes, by any of user, status and tier."""
+        query = {}
+        if user_address:
+            query['user_address'] = user_address.lower()
+        if status:
+            query['status'] = status
+        if tier_id is not None:
+            query['tier_id'] = int(tier_id)
+        return query
     
     @staticmethod
-    def update_status(user_address, stake_index, status, **kwargs):
+    def pool_users_query(pool, addresses):
+        """Filter on every stake of some users in one pool."""
+        return {'pool': pool, 'user_address': {'$in': list(addresses)}}
+    
+    @staticmethod
+    def stats_by_status_pipeline():
+        return [
+            {'$group': {
+                '_id': '$status',
+                'count': {'$sum': 1},
+                'total_amount': {'$sum': '$amount'}
+            }}
+        ]
+    
+    @staticmethod
+    def stats_by_tier_pipeline():
+        """Active stakes per tier."""
+        return [
+            {'$match': Stake.query(status='active')},
+            {'$group': {
+                '_id': '$tier_id',
+                'count': {'$sum': 1},
+                'total_amount': {'$sum': '$amount'}
+            }}
+        ]
+    
+    @staticmethod
+    def _status_update(status, **kwargs):
         update_data = {
             'status': status,
             'updated_at': datetime.utcnow()
         }
         update_data.update(kwargs)
-        
-        stakes_collection.update_one(
-            {
-                'user_address': user_address.lower(),
-                'stake_index': stake_index
-            },
-            {'$set': update_data}
-        )
+        return {'$set': update_data}
     
     @staticmethod
-    def add_rewards(user_address, stake_index, rewards):
+    def _rewards_update(rewards, claimed_at=None):
         """
-        Add rewards to a stake and update last_reward_claim timestamp.
-
-        Uses get_current_timestamp() from mongodb_helpers to store timestamp
-        as integer (matching on-chain block.timestamp format).
+        Stores the claim time as an integer timestamp (on-chain block.timestamp
+        format): the claim's block time when known, else now via
+        get_current_timestamp() from mongodb_helpers.
         """
         from app.utils.mongodb_helpers import get_current_timestamp
 
-        stakes_collection.update_one(
-            {
-                'user_address': user_address.lower(),
-                'stake_index': stake_index
-            },
-            {
-                '$inc': {'total_rewards_claimed': rewards},
-                '$set': {
-                    'last_reward_claim': get_current_timestamp(),
-                    'updated_at': datetime.utcnow()
-                }
+        return {
+            '$inc': {'total_rewards_claimed': encode_amount(rewards)},
+            '$set': {
+                'last_reward_claim': int(claimed_at) if claimed_at is not None else get_current_timestamp(),
+                'updated_at': datetime.utcfromtimestamp(int(claimed_at)) if claimed_at is not None else datetime.utcnow()
             }
+        }
+    
+    @staticmethod
+    def create_op(event_data):
+        """
+        Bulk-write op creating a stake from its StakeCreated event. Upserts on
+        (user_address, stake_index, pool) so re-applying the same event never
+        duplicates the stake.
+
+        Immutable creation facts are $set while lifecycle fields only get
+        their defaults on insert, so a StakeCreated applied after its own
+        Unstaked/RewardsClaimed (a retried range) does not reset them.
+        """
+        stake_data = Stake.build(event_data)
+        lifecycle = {
+            field: stake_data.pop(field)
+            for field in MUTABLE_FIELDS
+        }
+        return UpdateOne(
+            Stake.key(stake_data['user_address'], stake_data['stake_index'], stake_data.get('pool')),
+            {'$set': stake_data, '$setOnInsert': lifecycle},
+            upsert=True
+        )
+    
+    @staticmethod
+    def update_status_op(user_address, stake_index, status, pool=None, **kwargs):
+        """Bulk-write op setting a stake's status (and kwargs); upserts, see create_op()."""
+        return UpdateOne(
+            Stake.key(user_address, stake_index, pool),
+            Stake._status_update(status, **kwargs),
+            upsert=True
         )
     
+    @staticmethod
+    def add_rewards_op(user_address, stake_index, rewards, claimed_at=None, pool=None):
+        """Bulk-write op adding claimed rewards to a stake; upserts, see create_op()."""
+        return UpdateOne(
+            Stake.key(user_address, stake_index, pool),
+            Stake._rewards_update(rewards, claimed_at),
+            upsert=True
+        )
+    
+    @staticmethod
+    def undo_op(spec):
+        """
+        Build the bulk-write op reverting one journaled stake change.
+
+        spec is a plain dict (storable in the undo journal):
+        {'action': 'delete' | 'set' | 'inc', 'user', 'stake_index', 'pool', 'set', 'unset', 'inc'}
+        """
+        key = Stake.key(spec['user'], spec['stake_index'], spec.get('pool'))
+        if spec['action'] == 'delete':
+            return DeleteOne(key)
+        
+        update = {'$set': {'updated_at': datetime.utcnow()}}
+        if spec['action'] == 'set':
+            update['$set'].update(spec.get('set', {}))
+            if spec.get('unset'):
+                update['$unset'] = {field: '' for field in spec['unset']}
+        elif spec['action'] == 'inc':
+            update['$inc'] = spec['inc']
+        return UpdateOne(key, update)
+    
     @staticmethod
     def get_by_user(user_address, status=None):
-        query = {'user_address': user_address.lower()}
-        if status:
-            query['status'] = status
-        return list(stakes_collection.find(query))
+        return list(stakes_collection.find(Stake.query(user_address, status)))
     
     @staticmethod
-    def get_by_user_and_index(user_address, stake_index):
-        return stakes_collection.find_one({
-            'user_address': user_address.lower(),
-            'stake_index': stake_index
-        })
+    def get_by_user_and_index(user_address, stake_index, pool=None):
+        """One stake of a pool (key "chain_id:address"); the default pool's when None."""
+        return stakes_collection.find_one(Stake.key(user_address, stake_index, pool or default_pool().key))
     
     @staticmethod
     def get_all_active():
-        return list(stakes_collection.find({'status': 'active'}))
+        return list(stakes_collection.find(Stake.query(status='active')))
     
     @staticmethod
     def count_by_status(status=None):
-        query = {'status': status} if status else {}
-        return stakes_collection.count_documents(query)
\ No newline at end of file
+        return stakes_collection.count_documents(Stake.query(status=status))
+    
+    @staticmethod
+    def get_page(skip=0, limit=50, status=None, tier_id=None):
+        """(stakes, total) of a listing filtered by status and tier, newest first."""
+        query = Stake.query(status=status, tier_id=tier_id)
+        stakes = list(stakes_collection.find(query).sort(LIST_SORT).skip(skip).limit(limit))
+        return stakes, stakes_collection.count_documents(query)
+    
+    @staticmethod
+    def stats_by_status():
+        return list(stakes_collection.aggregate(Stake.stats_by_status_pipeline()))
+    
+    @staticmethod
+    def stats_by_tier():
+        return list(stakes_collection.aggregate(Stake.stats_by_tier_pipeline()))
\ No newline at end of file
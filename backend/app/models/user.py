@@ -1,58 +1,149 @@
-# backend/app/models/user.py - v1.0
+# backend/app/models/user.py - v1.7
 from datetime import datetime
+from pymongo import UpdateOne
 from app.models import users_collection
+from app.utils.mongodb_helpers import decode_amount, encode_amount
+
+# Counters a user document starts with; incremented by the listener
+COUNTER_FIELDS = ('total_staked', 'total_rewards_claimed', 'active_stakes_count')
+# Counters holding token amounts (Decimal128, see encode_amount)
+AMOUNT_FIELDS = ('total_staked', 'total_rewards_claimed')
+
+
+def _counter_value(field, value):
+    return encode_amount(decode_amount(value)) if field in AMOUNT_FIELDS else int(value)
+
+
+def _merge(address, docs):
+    """One user out of an address's per-pool documents: counters summed over the pools."""
+    merged = {
+        'address': address,
+        'total_staked': encode_amount(sum(decode_amount(doc.get('total_staked')) for doc in docs)),
+        'total_rewards_claimed': encode_amount(sum(decode_amount(doc.get('total_rewards_claimed')) for doc in docs)),
+        'active_stakes_count': sum(doc.get('active_stakes_count', 0) for doc in docs),
+        'pools': sorted(doc['pool'] for doc in docs if doc.get('pool'))
+    }
+    created = [doc['created_at'] for doc in docs if doc.get('created_at')]
+    updated = [doc['updated_at'] for doc in docs if doc.get('updated_at')]
+    merged['created_at'] = min(created) if created else None
+    merged['updated_at'] = max(updated) if updated else None
+    return merged
 
 class User:
     @staticmethod
-    def create_or_update(address):
-        user = users_collection.find_one({'address': address.lower()})
+    def increments_op(address, increments, pool=None):
+        """
+        Build an upserting UpdateOne applying several merged $inc deltas to a
+        user (for bulk_write). Creates the user with zeroed counters on first
+        sight; amount deltas are applied as Decimal128.
+        With a pool key the counters are that pool's (one document per pool).
+        """
+        now = datetime.utcnow()
+        inc = {field: _counter_value(field, value) for field, value in increments.items()}
+        on_insert = {'created_at': now}
+        on_insert.update({
+            field: _counter_value(field, 0)
+            for field in COUNTER_FIELDS if field not in inc
+        })
         
-        if not user:
-            user_data = {
-                'address': address.lower(),
-                'total_staked': 0,
-                'total_rewards_claimed': 0,
-                'active_stakes_count': 0,
-                'created_at': datetime.utcnow(),
-                'updated_at': datetime.utcnow()
-            }
-            users_collection.insert_one(user_data)
-            return user_data
+        update = {
+            '$set': {'updated_at': now},
+            '$setOnInsert': on_insert
+        }
+        if inc:
+            update['$inc'] = inc
         
-        return user
+        return UpdateOne(User.key(address, pool), update, upsert=True)
     
+    # Query builders, shared with the explain() harness (app.models.query_shapes)
+
     @staticmethod
-    def update_stats(address, **kwargs):
-        update_data = {'updated_at': datetime.utcnow()}
-        update_data.update(kwargs)
-        
-        users_collection.update_one(
-            {'address': address.lower()},
-            {'$set': update_data}
-        )
+    def key(address, pool=None):
+        """Filter on an address's documents, or its one document of a pool."""
+        key = {'address': address.lower()}
+        if pool:
+            key['pool'] = pool
+        return key
     
     @staticmethod
-    def increment_field(address, field, value):
-        # Convert uint256 - store as int if within MongoDB int64 range
-        int_value = int(value)
-        # For amounts that exceed int64, we'll need to handle differently
-        # For now, keep as int (negative values are OK for decrements)
-        users_collection.update_one(
-            {'address': address.lower()},
-            {
-                '$inc': {field: int_value if -2**63 <= int_value < 2**63 else 0},
-                '$set': {'updated_at': datetime.utcnow()}
-            }
-        )
+    def addresses_pipeline(pool=None):
+        """Distinct addresses (of one pool) in address order, off the (address, pool) index."""
+        pipeline = [{'$match': {'pool': pool}}] if pool else []
+        return pipeline + [
+            {'$sort': {'address': 1}},
+            {'$group': {'_id': '$address'}}
+        ]
     
     @staticmethod
-    def get_by_address(address):
-        return users_collection.find_one({'address': address.lower()})
+    def page_query(addresses, pool=None):
+        query = {'address': {'$in': list(addresses)}}
+        if pool:
+            query['pool'] = pool
+        return query
     
     @staticmethod
-    def get_all(skip=0, limit=50):
-        return list(users_collection.find().skip(skip).limit(limit))
+    def stats_pipeline(pool=None):
+        """See stats()."""
+        pipeline = [{'$match': {'pool': pool}}] if pool else []
+        return pipeline + [
+            {'$group': {
+                '_id': '$address',
+                'staked': {'$sum': '$total_staked'},
+                'rewards': {'$sum': '$total_rewards_claimed'},
+                'active_stakes': {'$sum': '$active_stakes_count'}
+            }},
+            {'$group': {
+                '_id': None,
+                'total_users': {'$sum': 1},
+                'active_users': {'$sum': {'$cond': [{'$gt': ['$active_stakes', 0]}, 1, 0]}},
+                'avg_staked': {'$avg': '$staked'},
+                'total_rewards': {'$sum': '$rewards'}
+            }}
+        ]
     
+    # The listener keeps one document per (address, pool); the reads below
+    # return one user per address, summed over its pools, unless a pool is given.
+
+    @staticmethod
+    def get_by_address(address, pool=None):
+        docs = list(users_collection.find(User.key(address, pool)))
+        return _merge(address.lower(), docs) if docs else None
+    
+    @staticmethod
+    def get_all(skip=0, limit=50, pool=None):
+        """A page of users in address order."""
+        pipeline = User.addresses_pipeline(pool) + [
+            {'$sort': {'_id': 1}},
+            {'$skip': skip},
+            {'$limit': limit}
+        ]
+        addresses = [group['_id'] for group in users_collection.aggregate(pipeline)]
+        docs = {}
+        for doc in users_collection.find(User.page_query(addresses, pool)):
+            docs.setdefault(doc['address'], []).append(doc)
+        return [_merge(address, docs[address]) for address in addresses if address in docs]
+    
+    @staticmethod
+    def count(pool=None):
+        """Number of distinct addresses (of one pool: one document per address)."""
+        if pool:
+            return users_collection.count_documents({'pool': pool})
+        result = list(users_collection.aggregate(User.addresses_pipeline() + [{'$count': 'n'}]))
+        return result[0]['n'] if result else 0
+
     @staticmethod
-    def count():
-        return users_collection.count_documents({})
\ No newline at end of file
+    def stats(pool=None):
+        """
+        {'total_users', 'active_users', 'avg_staked', 'total_rewards'} over
+        distinct addresses: counters are summed per address first, so a user
+        staking in several pools counts once. One aggregation.
+        """
+        result = list(users_collection.aggregate(User.stats_pipeline(pool)))
+        if not result:
+            return {'total_users': 0, 'active_users': 0, 'avg_staked': 0, 'total_rewards': 0}
+        return {
+            'total_users': result[0]['total_users'],
+            'active_users': result[0]['active_users'],
+            'avg_staked': decode_amount(result[0]['avg_staked']),
+            'total_rewards': decode_amount(result[0]['total_rewards'])
+        }
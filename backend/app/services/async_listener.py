@@ -0,0 +1,264 @@
+# backend/app/services/async_listener.py - v1.13
+"""
+Asyncio listener with overlapped fetch and apply.
+
+Same event handling as BlockchainListener, but split into two coroutines
+connected by a bounded queue:
+
+- fetcher: pulls eth_getLogs ranges through web3's async HTTP provider
+- applier: commits each range's EventBatch and checkpoint through motor
+
+While range N is being written to MongoDB, range N+1 is already being
+fetched, so steady-state throughput is bounded by the slower of RPC and
+Mongo instead of their sum. The queue size caps how far fetching may run
+ahead of the last committed checkpoint.
+
+Unlike the sync listener it stays CONFIRMATION_DEPTH blocks behind the head
+instead of journaling unconfirmed blocks, so it never needs a reorg rollback.
+
+With LISTENER_LEASE_TTL set it takes the same Redis lease as the sync
+listener: it waits as a standby until leader, and every checkpoint write is
+fenced by the lease token (BlockchainListener.checkpoint_write). On losing
+the lease both coroutines are cancelled and it goes back to standby.
+
+Usage:
+    python -m app.services.async_listener
+"""
+import asyncio
+import logging
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
+from web3 import AsyncWeb3, AsyncHTTPProvider
+from web3.middleware import async_geth_poa_middleware
+from app.models.indexes import require_event_index
+from app.services.blockchain_listener import BlockchainListener
+from app.services.listener_lease import ListenerLease, LeaseLostError
+from app.utils.web3_utils import is_range_limit_error
+from app.utils.rpc_pool import split_rpc_urls
+from app.utils.prometheus_metrics import (
+    MONGO_LATENCY, RPC_LATENCY, observe_latency, record_listener_progress, start_metrics_server
+)
+from app.config import config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class AsyncBlockchainListener(BlockchainListener):
+    def __init__(self, pool=None):
+        super().__init__(pool)
+
+        # The async provider talks to the first endpoint only; header lookups
+        # still go through the sync manager's endpoint pool
+        self.async_w3 = AsyncWeb3(AsyncHTTPProvider(split_rpc_urls(self.pool.rpc_url)[0]))
+        if self.pool.chain_id in [31337, 11155111]:
+            self.async_w3.middleware_onion.inject(async_geth_poa_middleware, layer=0)
+
+        self.motor_client = AsyncIOMotorClient(config.MONGODB_URI)
+        self.motor_db = self.motor_client[config.MONGODB_DB_NAME]
+        self.async_state_collection = self.motor_db['listener_state']
+        self.queue = asyncio.Queue(maxsize=config.LISTENER_QUEUE_SIZE)
+        self.latest_head = None
+
+    async def fetch_events_async(self, from_block, to_block):
+        """Async fetch_events(): split and retry ranges the provider rejects."""
+        try:
+            with observe_latency(RPC_LATENCY, 'eth_getLogs'):
+                logs = await self.async_w3.eth.get_logs(
+                    self.web3.pool_log_filter(from_block, to_block)
+                )
+            return self.web3.decode_pool_logs(logs)
+        except Exception as e:
+            if from_block >= to_block or not is_range_limit_error(e):
+                raise
+
+            mid_block = (from_block + to_block) // 2
+            self.batch_size = self._clamp_batch_size((to_block - from_block + 1) // 2)
+            logger.warning(
+                f"Range {from_block}-{to_block} rejected ({str(e)}), "
+                f"splitting at {mid_block}"
+            )
+            return (
+                await self.fetch_events_async(from_block, mid_block)
+                + await self.fetch_events_async(mid_block + 1, to_block)
+            )
+
+    async def save_checkpoint_async(self, block_number):
+        """Fenced like save_last_processed_block(); raises LeaseLostError once stepped down."""
+        query, update = self.checkpoint_write(block_number)
+        try:
+            await self.async_state_collection.update_one(query, update, upsert=True)
+        except DuplicateKeyError:
+            raise self.checkpoint_claimed()
+
+        now = datetime.utcnow()
+        await self.async_state_collection.update_one(
+            {'_id': self.range_sizing_id},
+            {'$set': {
+                'batch_size': self.batch_size,
+                'events_per_block': self.events_per_block,
+                'updated_at': now
+            }},
+            upsert=True
+        )
+
+    async def get_head_async(self):
+        subscription = self.head_subscription
+        if subscription and subscription.connected and subscription.latest_head is not None:
+            return subscription.latest_head
+        with observe_latency(RPC_LATENCY, 'eth_blockNumber'):
+            return await self.async_w3.eth.block_number
+
+    async def wait_for_head_async(self):
+        subscription = self.head_subscription
+        if subscription and subscription.connected:
+            await subscription.wait(config.HEAD_TIMEOUT)
+        else:
+            await asyncio.sleep(self.poll_interval)
+
+    async def fetcher(self, last_block):
+        """Produce (from_block, to_block, events) ranges into the queue."""
+        while True:
+            try:
+                # Only final blocks: this mode has no undo journal to roll back a reorg
+                self.latest_head = await self.get_head_async()
+                # API contract snapshot, once per new head (sync multicall + Redis)
+                await asyncio.to_thread(self.publish_contract_info, self.latest_head)
+                current_block = self.latest_head - config.CONFIRMATION_DEPTH
+
+                if current_block <= last_block:
+                    await self.wait_for_head_async()
+                    continue
+
+                # Far behind: continue after what a backfill already applied,
+                # as an empty range so the applier moves the (fenced) checkpoint
+                if current_block - last_block > self.batch_size:
+                    backfilled = min(await asyncio.to_thread(self.skip_backfilled, last_block), current_block)
+                    if backfilled > last_block:
+                        logger.info(f"[{self.pool_key}] Blocks {last_block + 1}-{backfilled} already backfilled")
+                        await self.queue.put((last_block + 1, backfilled, []))
+                        last_block = backfilled
+                        continue
+
+                from_block = last_block + 1
+                to_block = min(last_block + self.batch_size, current_block)
+                events = await self.fetch_events_async(from_block, to_block)
+                # Header lookups are sync (batched JSON-RPC + LRU); keep them off the loop
+                events = await asyncio.to_thread(self.attach_block_times, events)
+                self.resize_window(from_block, to_block, len(events))
+
+                # Blocks when the applier is QUEUE_SIZE ranges behind
+                await self.queue.put((from_block, to_block, events))
+                last_block = to_block
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Range is not skipped: the same from_block is retried
+                logger.error(f"Error fetching from block {last_block + 1}: {str(e)}")
+                await asyncio.sleep(self.poll_interval * 2)
+
+    async def applier(self):
+        """Consume ranges in order, commit them and checkpoint."""
+        while True:
+            from_block, to_block, events = await self.queue.get()
+            batch = None
+
+            while True:
+                try:
+                    if self.lease and not self.lease.held:
+                        raise LeaseLostError(f"Lease for {self.pool_key} lapsed before blocks {from_block}-{to_block}")
+                    if batch is None:
+                        # Failed ranges are retried before this range's batch
+                        # reads the stake states, never alongside it
+                        await asyncio.to_thread(self.range_recovery.maintain)
+                        # Sync pymongo reads of the stakes' current state: off the loop
+                        batch = await asyncio.to_thread(self.build_batch, events)
+                    if not batch.is_empty():
+                        with observe_latency(MONGO_LATENCY, 'event_batch'):
+                            applied = await batch.commit_async(self.motor_db)
+                        if applied < batch.event_count:
+                            logger.info(f"Skipped {batch.event_count - applied} already-applied events")
+                        # Sync Redis + Mongo reads
+                        await asyncio.to_thread(self.publish_leaderboards, batch.addresses())
+                    await self.motor_db['block_coverage'].insert_one({
+                        'pool': self.pool_key,
+                        'from_block': from_block,
+                        'to_block': to_block,
+                        'processed_at': datetime.utcnow()
+                    })
+                    with observe_latency(MONGO_LATENCY, 'checkpoint'):
+                        await self.save_checkpoint_async(to_block)
+                    break
+                except (asyncio.CancelledError, LeaseLostError):
+                    raise
+                except Exception as e:
+                    logger.error(f"Error applying blocks {from_block}-{to_block}: {str(e)}")
+                    await asyncio.sleep(self.poll_interval * 2)
+
+            record_listener_progress(self.pool_key, self.latest_head, to_block)
+            logger.info(f"Applied blocks {from_block} to {to_block} ({len(events)} events)")
+            self.queue.task_done()
+
+    async def run(self):
+        logger.info(f"Starting async blockchain listener for pool {self.pool_key}...")
+        logger.info(f"RPC: {self.pool.rpc_url}")
+        logger.info(f"Contract: {self.pool.address}")
+        # Replays are only idempotent with the unique event index
+        require_event_index()
+
+        if config.LISTENER_METRICS_PORT:
+            logger.info(f"Metrics: http://0.0.0.0:{config.LISTENER_METRICS_PORT}/metrics")
+            start_metrics_server(config.LISTENER_METRICS_PORT)
+
+        if self.head_subscription:
+            logger.info(f"Head subscription: {self.pool.ws_url}")
+            self.subscription_task = asyncio.create_task(self.head_subscription.run())
+
+        if config.LISTENER_LEASE_TTL:
+            self.lease = ListenerLease(self.pool_key)
+
+        while True:
+            tasks = []
+            try:
+                if self.lease:
+                    # Standby until leader (blocking wait, off the loop)
+                    await asyncio.to_thread(self.lease.wait_until_acquired)
+
+                # Few one-off reads per leadership, the sync client is fine here
+                last_block = self.get_last_processed_block()
+                if self.lease:
+                    # Claims the checkpoint for our token, fencing off the old leader
+                    await self.save_checkpoint_async(last_block)
+                logger.info(f"[{self.pool_key}] Active, starting from block: {last_block}")
+
+                # Ranges fetched under a previous leadership are dropped
+                self.queue = asyncio.Queue(maxsize=config.LISTENER_QUEUE_SIZE)
+                tasks = [
+                    asyncio.create_task(self.fetcher(last_block)),
+                    asyncio.create_task(self.applier())
+                ]
+                await asyncio.gather(*tasks)
+            except LeaseLostError as e:
+                logger.warning(f"[{self.pool_key}] {str(e)}, back to standby")
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    def start(self):
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            logger.info("Listener stopped by user")
+            if self.lease:
+                self.lease.release()
+
+
+if __name__ == '__main__':
+    from app.services.pool_listeners import migrate_legacy_data
+
+    migrate_legacy_data()
+    listener = AsyncBlockchainListener()
+    listener.start()
@@ -0,0 +1,208 @@
+# backend/app/services/backfill.py - v1.7
+"""
+Parallel sharded historical backfill.
+
+Splits [from_block, to_block] into fixed-size shards, fetches their logs
+concurrently with a bounded thread pool, and applies the decoded events to
+MongoDB strictly in (block, logIndex) order, one shard at a time.
+
+Progress is one backfill_shards document per applied shard; the listener
+checkpoint is never written here, so a --from-block below the checkpoint
+cannot move it back. A rerun over the same range and shard size skips the
+shards already applied; a failed shard is queued in the listener's retry
+queue and left unrecorded. The listener jumps its checkpoint over shards
+that contiguously follow it (BlockchainListener.skip_backfilled).
+
+A backfill never runs next to the pool's live listener: both would read the
+same stakes' state and write conflicting pool_stats deltas. With listener
+leases (LISTENER_LEASE_TTL > 0) the backfill takes the pool's lease, so
+listeners stand by until it is done, and refuses to start while a listener
+holds it. Without leases it only applies blocks up to the listener
+checkpoint, unless --listener-stopped says the listener is not running.
+
+Usage:
+    python -m app.services.backfill [--from-block N] [--to-block N]
+                                    [--workers N] [--shard-size N]
+                                    [--pool chain_id:address] [--listener-stopped]
+"""
+import argparse
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from app.models import db
+from app.models.indexes import require_event_index
+from app.services.blockchain_listener import BlockchainListener
+from app.services.listener_lease import LeaseLostError, ListenerLease
+from app.utils.pools import pool_by_key
+from app.config import config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def split_shards(from_block, to_block, shard_size):
+    """Split an inclusive block range into consecutive (start, end) shards."""
+    return [
+        (start, min(start + shard_size - 1, to_block))
+        for start in range(from_block, to_block + 1, shard_size)
+    ]
+
+
+def shard_id(pool, from_block, to_block):
+    return f"{pool}:{from_block}-{to_block}"
+
+
+def shards_query(pool, from_block, to_block):
+    """A pool's applied shards starting within [from_block, to_block]."""
+    return {'pool': pool, 'from_block': {'$gte': from_block, '$lte': to_block}}
+
+
+def applied_shards(pool, from_block, to_block, database=db):
+    """Ids of the shards of [from_block, to_block] a previous run already applied."""
+    return {
+        doc['_id']
+        for doc in database['backfill_shards'].find(shards_query(pool, from_block, to_block), {'_id': 1})
+    }
+
+
+def record_shard(pool, from_block, to_block, event_count, database=db):
+    database['backfill_shards'].replace_one(
+        {'_id': shard_id(pool, from_block, to_block)},
+        {
+            'pool': pool,
+            'from_block': from_block,
+            'to_block': to_block,
+            'events': event_count,
+            'applied_at': datetime.utcnow()
+        },
+        upsert=True
+    )
+
+
+def fetch_shard(listener, from_block, to_block):
+    """Fetch a shard's events with their block times, in a worker thread."""
+    return listener.attach_block_times(listener.fetch_events(from_block, to_block))
+
+
+def run_backfill(from_block=None, to_block=None, workers=None, shard_size=None, pool=None,
+                 listener_stopped=False):
+    require_event_index()
+    listener = BlockchainListener(pool)
+    workers = workers or config.BACKFILL_WORKERS
+    shard_size = shard_size or config.BACKFILL_SHARD_SIZE
+
+    if from_block is None:
+        from_block = listener.get_last_processed_block() + 1
+    if to_block is None:
+        # Final blocks only: the backfill writes no reorg undo journal
+        to_block = listener.web3.get_latest_block() - config.CONFIRMATION_DEPTH
+
+    if from_block > to_block:
+        logger.info(f"Nothing to backfill (from {from_block}, head {to_block})")
+        return
+
+    lease = None
+    if config.LISTENER_LEASE_TTL:
+        lease = ListenerLease(listener.pool_key)
+        if not lease.try_hold():
+            logger.error(f"[{listener.pool_key}] A listener holds the pool's lease, stop it before backfilling")
+            return
+    elif not listener_stopped:
+        checkpoint = listener.get_last_processed_block()
+        if to_block > checkpoint:
+            logger.error(
+                f"[{listener.pool_key}] Blocks {max(from_block, checkpoint + 1)}-{to_block} are past the listener "
+                f"checkpoint ({checkpoint}) and would race the live listener: stop it and pass "
+                f"--listener-stopped, or run listeners with LISTENER_LEASE_TTL"
+            )
+            return
+
+    try:
+        apply_shards(listener, from_block, to_block, workers, shard_size, lease)
+    finally:
+        if lease:
+            lease.release()
+
+
+def apply_shards(listener, from_block, to_block, workers, shard_size, lease=None):
+    done = applied_shards(listener.pool_key, from_block, to_block)
+    shards = [
+        shard for shard in split_shards(from_block, to_block, shard_size)
+        if shard_id(listener.pool_key, *shard) not in done
+    ]
+    logger.info(
+        f"[{listener.pool_key}] Backfilling blocks {from_block}-{to_block}: "
+        f"{len(shards)} shards of {shard_size} blocks ({len(done)} already applied), {workers} workers"
+    )
+
+    started_at = time.time()
+    total_events = 0
+    pending = deque()
+    next_shard = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            while next_shard < len(shards) or pending:
+                # Keep at most 2x workers shards in flight to bound memory
+                while next_shard < len(shards) and len(pending) < workers * 2:
+                    shard = shards[next_shard]
+                    pending.append((shard, executor.submit(fetch_shard, listener, *shard)))
+                    next_shard += 1
+
+                # Apply in shard order, whatever order the fetches finish in
+                (shard_start, shard_end), future = pending.popleft()
+                if lease and not lease.held:
+                    raise LeaseLostError(f"Lost the lease of pool {listener.pool_key} at shard {shard_start}")
+                try:
+                    events = future.result()
+                except Exception as e:
+                    # Keep going; the listener's retry loop picks the shard up
+                    listener.range_recovery.record_failure(shard_start, shard_end, e)
+                    continue
+
+                listener.apply_events(events)
+                listener.range_recovery.record_processed(shard_start, shard_end)
+                record_shard(listener.pool_key, shard_start, shard_end, len(events))
+
+                total_events += len(events)
+                logger.info(
+                    f"Shard {shard_start}-{shard_end} applied "
+                    f"({len(events)} events, {total_events} total)"
+                )
+        except BaseException:
+            for _, future in pending:
+                future.cancel()
+            raise
+
+    elapsed = time.time() - started_at
+    logger.info(
+        f"Backfill complete: {total_events} events over "
+        f"{to_block - from_block + 1} blocks in {elapsed:.1f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel historical backfill of StakingPool events')
+    parser.add_argument('--from-block', type=int, default=None,
+                        help='First block (default: listener checkpoint + 1)')
+    parser.add_argument('--to-block', type=int, default=None,
+                        help='Last block (default: head - CONFIRMATION_DEPTH)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help=f'Concurrent fetch workers (default: {config.BACKFILL_WORKERS})')
+    parser.add_argument('--shard-size', type=int, default=None,
+                        help=f'Blocks per shard (default: {config.BACKFILL_SHARD_SIZE})')
+    parser.add_argument('--pool', default=None,
+                        help='Pool key chain_id:address (default: STAKING_POOL_ADDRESS)')
+    parser.add_argument('--listener-stopped', action='store_true',
+                        help='The pool\'s listener is not running: allow blocks past its checkpoint '
+                             '(without LISTENER_LEASE_TTL)')
+    args = parser.parse_args()
+
+    pool = pool_by_key(args.pool) if args.pool else None
+    run_backfill(args.from_block, args.to_block, args.workers, args.shard_size, pool, args.listener_stopped)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,146 +1,444 @@
-# backend/app/services/blockchain_listener.py - v1.1
+# backend/app/services/blockchain_listener.py - v1.24
 import time
 import logging
 from datetime import datetime
-from app.utils.web3_utils import web3_manager
-from app.utils.mongodb_helpers import convert_uint256_for_mongodb
-from app.models.user import User
+from pymongo.errors import DuplicateKeyError
+from app.utils.web3_utils import get_pool_manager, is_range_limit_error
+from app.utils.pools import default_pool
+from app.utils.mongodb_helpers import amount_overflows, convert_uint256_for_mongodb, decode_amount, encode_amount
 from app.models.stake import Stake
 from app.models import db
+from app.models.indexes import require_event_index
+from app.services.event_batch import EventBatch
+from app.services.head_subscription import HeadSubscription
+from app.services.reorg import ReorgJournal
+from app.services.range_recovery import RangeRecovery
+from app.services.listener_lease import ListenerLease, LeaseLostError
+from app.services.contract_state import refresh_contract_info
+from app.services.leaderboard import refresh_addresses
+from app.utils.prometheus_metrics import (
+    LISTENER_EVENTS, MONGO_LATENCY, observe_latency, record_listener_progress, start_metrics_server
+)
 from app.config import config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Weight of the latest range in the events-per-block moving average
+DENSITY_SMOOTHING = 0.3
+
+# Event args holding token amounts, stored as Decimal128 in raw_events
+AMOUNT_ARGS = ('amount', 'rewards')
+
+# Events changing a stake's status, tier or amount, i.e. the pool stats
+STATS_EVENTS = ('StakeCreated', 'Unstaked', 'EmergencyWithdraw')
+
+# Fields of a stake document a batch turns into pool stats deltas
+STAKE_STATE_FIELDS = {'user_address': 1, 'stake_index': 1, 'status': 1, 'tier_id': 1, 'amount': 1}
+
+
+def backfilled_query(pool, last_block):
+    """A pool's backfill shards ending after last_block."""
+    return {'pool': pool, 'to_block': {'$gt': last_block}}
+
 class BlockchainListener:
-    def __init__(self):
-        self.w3 = web3_manager.w3
-        self.contract = web3_manager.staking_pool
+    def __init__(self, pool=None):
+        """Listen to one StakingPool deployment (default: CHAIN_ID / STAKING_POOL_ADDRESS)."""
+        self.pool = pool or default_pool()
+        self.pool_key = self.pool.key
+        self.web3 = get_pool_manager(self.pool)
+        self.w3 = self.web3.w3
+        self.contract = self.web3.staking_pool
         self.poll_interval = config.POLL_INTERVAL
         self.batch_size = config.BATCH_SIZE
+        self.events_per_block = None
         
+        # Checkpoints are per (chain, pool)
         self.state_collection = db['listener_state']
+        self.checkpoint_id = f"last_block:{self.pool_key}"
+        self.range_sizing_id = f"range_sizing:{self.pool_key}"
         self.events_collection = db['raw_events']
+        
+        self.load_range_sizing()
+        
+        self.reorg_journal = ReorgJournal(self.web3, self.pool_key)
+        self.range_recovery = RangeRecovery(self)
+        
+        # Push-based head tracking when a websocket endpoint is configured
+        self.head_subscription = HeadSubscription(self.pool.ws_url) if self.pool.ws_url else None
+        
+        # Active/standby lease, taken by start(); one-off tools (backfill, CLIs) run without it
+        self.lease = None
+        
+        # Head whose contract snapshot was last published for the API
+        self.published_head = None
+    
+    def get_head(self):
+        """Latest block, from the newHeads subscription when it is live."""
+        subscription = self.head_subscription
+        if subscription and subscription.connected and subscription.latest_head is not None:
+            return subscription.latest_head
+        return self.web3.get_latest_block()
+    
+    def wait_for_head(self):
+        """Sleep until the next head: pushed when subscribed, POLL_INTERVAL otherwise."""
+        subscription = self.head_subscription
+        if subscription and subscription.connected:
+            subscription.wait_sync(config.HEAD_TIMEOUT)
+        else:
+            time.sleep(self.poll_interval)
+    
+    def publish_contract_info(self, head):
+        """Refresh the API's contract snapshot (app.services.contract_state) once per new head."""
+        if head == self.published_head:
+            return
+        try:
+            refresh_contract_info(self.web3, head)
+            self.published_head = head
+        except Exception as e:
+            logger.warning(f"[{self.pool_key}] Could not publish contract info for block {head}: {str(e)}")
+    
+    def publish_leaderboards(self, addresses):
+        """
+        Re-score the users a committed batch or rollback touched
+        (app.services.leaderboard). The events are already committed: a
+        failure only leaves their scores stale until their next event or a rebuild.
+        """
+        try:
+            refresh_addresses(addresses)
+        except Exception as e:
+            logger.warning(f"[{self.pool_key}] Could not refresh leaderboards: {str(e)}")
+    
+    def _load_state(self, state_id, legacy_id):
+        """Pool-keyed state document, or the pre multi-pool one for the default pool."""
+        state = self.state_collection.find_one({'_id': state_id})
+        if state is None and self.pool_key == default_pool().key:
+            state = self.state_collection.find_one({'_id': legacy_id})
+        return state
     
     def get_last_processed_block(self):
-        state = self.state_collection.find_one({'_id': 'last_block'})
-        return state['block_number'] if state else config.START_BLOCK
+        state = self._load_state(self.checkpoint_id, 'last_block')
+        return state['block_number'] if state else self.pool.start_block
+    
+    def checkpoint_write(self, block_number):
+        """
+        (filter, update) of a checkpoint write, for the sync and the async
+        listener alike. Under a lease the write is fenced: it only applies
+        while the stored fencing token is not newer than ours; a newer one
+        fails the filter, and the upsert then hits the existing _id
+        (DuplicateKeyError, see checkpoint_claimed()). Raises LeaseLostError
+        when the lease is not held.
+        """
+        update = {'$set': {
+            'block_number': block_number,
+            'updated_at': datetime.utcnow()
+        }}
+        if self.lease is None:
+            return {'_id': self.checkpoint_id}, update
+        
+        token = self.lease.token
+        if token is None or not self.lease.held:
+            raise LeaseLostError(f"Lease for {self.pool_key} not held, checkpoint {block_number} not saved")
+        
+        update['$set']['fencing_token'] = token
+        return {
+            '_id': self.checkpoint_id,
+            '$or': [
+                {'fencing_token': {'$lte': token}},
+                {'fencing_token': {'$exists': False}}
+            ]
+        }, update
+    
+    def checkpoint_claimed(self):
+        """LeaseLostError for a fenced write rejected by a newer leader's token; steps down."""
+        token, self.lease.token = self.lease.token, None
+        return LeaseLostError(f"Checkpoint for {self.pool_key} claimed by a newer leader (our token {token})")
     
     def save_last_processed_block(self, block_number):
+        """Write the checkpoint, fenced under a lease (see checkpoint_write())."""
+        query, update = self.checkpoint_write(block_number)
+        try:
+            with observe_latency(MONGO_LATENCY, 'checkpoint'):
+                self.state_collection.update_one(query, update, upsert=True)
+        except DuplicateKeyError:
+            raise self.checkpoint_claimed()
+    
+    def skip_backfilled(self, last_block):
+        """
+        Highest block covered by backfill shards (app.services.backfill)
+        contiguously following last_block, or last_block. The backfill never
+        writes the checkpoint; the listener moves it over what was backfilled.
+        """
+        cursor = last_block
+        shards = db['backfill_shards'].find(
+            backfilled_query(self.pool_key, last_block),
+            {'from_block': 1, 'to_block': 1}
+        ).sort('from_block', 1)
+        for shard in shards:
+            if shard['from_block'] > cursor + 1:
+                break
+            cursor = max(cursor, shard['to_block'])
+        return cursor
+    
+    def load_range_sizing(self):
+        """Restore the adaptive range size and density estimate from the last run."""
+        state = self._load_state(self.range_sizing_id, 'range_sizing')
+        if state:
+            self.events_per_block = state.get('events_per_block')
+            self.batch_size = self._clamp_batch_size(state.get('batch_size', self.batch_size))
+    
+    def save_range_sizing(self):
         self.state_collection.update_one(
-            {'_id': 'last_block'},
+            {'_id': self.range_sizing_id},
             {'$set': {
-                'block_number': block_number,
+                'batch_size': self.batch_size,
+                'events_per_block': self.events_per_block,
                 'updated_at': datetime.utcnow()
             }},
             upsert=True
         )
     
-    def process_stake_created(self, event):
-        args = event['args']
+    def _clamp_batch_size(self, size):
+        return max(config.MIN_BATCH_SIZE, min(config.MAX_BATCH_SIZE, int(size)))
+    
+    def update_range_sizing(self, from_block, to_block, event_count):
+        self.resize_window(from_block, to_block, event_count)
+        self.save_range_sizing()
+    
+    def resize_window(self, from_block, to_block, event_count):
+        """
+        Fold a completed range into the density estimate and resize the window.
+
+        The window targets TARGET_EVENTS_PER_RANGE events per eth_getLogs call.
+        It shrinks straight to the target on dense ranges but grows at most 2x
+        per range, so one empty stretch does not jump into a dense one blind.
+        """
+        density = event_count / (to_block - from_block + 1)
+        if self.events_per_block is None:
+            self.events_per_block = density
+        else:
+            self.events_per_block = (
+                DENSITY_SMOOTHING * density
+                + (1 - DENSITY_SMOOTHING) * self.events_per_block
+            )
         
-        User.create_or_update(args['user'])
+        if self.events_per_block > 0:
+            target_size = config.TARGET_EVENTS_PER_RANGE / self.events_per_block
+        else:
+            target_size = config.MAX_BATCH_SIZE
         
-        Stake.create({
+        self.batch_size = self._clamp_batch_size(min(target_size, self.batch_size * 2))
+    
+    def fetch_events(self, from_block, to_block):
+        """
+        Fetch events for a range, splitting it in half and retrying whenever
+        the provider rejects it for too many results or times out.
+        """
+        try:
+            return self.web3.get_pool_events(from_block, to_block)
+        except Exception as e:
+            if from_block >= to_block or not is_range_limit_error(e):
+                raise
+            
+            mid_block = (from_block + to_block) // 2
+            self.batch_size = self._clamp_batch_size((to_block - from_block + 1) // 2)
+            logger.warning(
+                f"Range {from_block}-{to_block} rejected ({str(e)}), "
+                f"splitting at {mid_block}"
+            )
+            return (
+                self.fetch_events(from_block, mid_block)
+                + self.fetch_events(mid_block + 1, to_block)
+            )
+    
+    def process_stake_created(self, event, batch):
+        args = event['args']
+        
+        batch.add_stake_op(Stake.create_op({
             'user': args['user'],
             'stakeIndex': args['stakeIndex'],
             'amount': args['amount'],
             'tierId': args['tierId'],
             'timestamp': args['timestamp'],
             'transactionHash': event['transactionHash'],
-            'blockNumber': event['blockNumber']
+            'blockNumber': event['blockNumber'],
+            'blockTime': event['blockTime'],
+            'pool': batch.pool
+        }))
+        batch.add_stake_undo({
+            'action': 'delete',
+            'user': args['user'],
+            'stake_index': int(args['stakeIndex'])
         })
         
-        User.increment_field(args['user'], 'total_staked', args['amount'])
-        User.increment_field(args['user'], 'active_stakes_count', 1)
+        # Upserts the user on commit, so no separate create_or_update round trip
+        batch.increment_user(args['user'], 'total_staked', args['amount'])
+        batch.increment_user(args['user'], 'active_stakes_count', 1)
+        
+        # Lifecycle fields are insert-only (Stake.create_op): a replay keeps the stored status
+        known = batch.stake_state(args['user'], args['stakeIndex'])
+        batch.set_stake_state(args['user'], args['stakeIndex'], {
+            'status': known['status'] if known else 'active',
+            'tier_id': int(args['tierId']),
+            'amount': int(args['amount'])
+        })
         
         logger.info(f"StakeCreated: user={args['user']}, amount={args['amount']}, tier={args['tierId']}")
     
-    def process_unstaked(self, event):
+    def process_unstaked(self, event, batch):
         """
         Process Unstaked event with MongoDB-safe type conversion.
 
-        Converts uint256 amount/rewards using convert_uint256_for_mongodb()
-        to avoid overflow errors when storing in MongoDB.
+        Stores the uint256 amount/rewards as Decimal128 (encode_amount()).
         """
         args = event['args']
 
-        # Convert uint256 to MongoDB-safe types (int or string)
         amount = int(args['amount'])
         rewards = int(args['rewards'])
 
-        Stake.update_status(
+        batch.add_stake_op(Stake.update_status_op(
             args['user'],
             args['stakeIndex'],
             'unstaked',
-            unstake_amount=convert_uint256_for_mongodb(amount),
-            unstake_rewards=convert_uint256_for_mongodb(rewards),
-            unstaked_at=datetime.utcnow()
-        )
+            pool=batch.pool,
+            unstake_amount=encode_amount(amount),
+            unstake_rewards=encode_amount(rewards),
+            unstaked_at=datetime.utcfromtimestamp(event['blockTime']),
+            updated_at=datetime.utcfromtimestamp(event['blockTime'])
+        ))
+        batch.add_stake_undo({
+            'action': 'set',
+            'user': args['user'],
+            'stake_index': int(args['stakeIndex']),
+            'set': {'status': 'active'},
+            'unset': ['unstake_amount', 'unstake_rewards', 'unstaked_at']
+        })
 
-        # User.increment_field handles large values internally
-        User.increment_field(args['user'], 'total_staked', -amount)
-        User.increment_field(args['user'], 'total_rewards_claimed', rewards)
-        User.increment_field(args['user'], 'active_stakes_count', -1)
+        # User.increments_op stores the amount deltas as Decimal128
+        batch.increment_user(args['user'], 'total_staked', -amount)
+        batch.increment_user(args['user'], 'total_rewards_claimed', rewards)
+        batch.increment_user(args['user'], 'active_stakes_count', -1)
+        self.close_stake(batch, args, 'unstaked')
 
         logger.info(f"Unstaked: user={args['user']}, amount={amount}, rewards={rewards}")
     
-    def process_rewards_claimed(self, event):
+    def process_rewards_claimed(self, event, batch):
         """
         Process RewardsClaimed event with MongoDB-safe type conversion.
         """
         args = event['args']
 
-        # Convert uint256 rewards to int (increment_field handles MongoDB conversion)
+        # Convert uint256 rewards to int (increments_op handles MongoDB conversion)
         rewards = int(args['rewards'])
 
-        Stake.add_rewards(args['user'], args['stakeIndex'], rewards)
-        User.increment_field(args['user'], 'total_rewards_claimed', rewards)
+        batch.add_stake_op(Stake.add_rewards_op(
+            args['user'], args['stakeIndex'], rewards, event['blockTime'], pool=batch.pool
+        ))
+        # last_reward_claim is not restored on rollback; the re-applied claim overwrites it
+        batch.add_stake_undo({
+            'action': 'inc',
+            'user': args['user'],
+            'stake_index': int(args['stakeIndex']),
+            'inc': {'total_rewards_claimed': encode_amount(-rewards)}
+        })
+        batch.increment_user(args['user'], 'total_rewards_claimed', rewards)
 
         logger.info(f"RewardsClaimed: user={args['user']}, rewards={rewards}")
     
-    def process_emergency_withdraw(self, event):
+    def process_emergency_withdraw(self, event, batch):
         """
         Process EmergencyWithdraw event with MongoDB-safe type conversion.
         """
         args = event['args']
 
-        # Convert uint256 amount to MongoDB-safe type
         amount = int(args['amount'])
 
-        Stake.update_status(
+        batch.add_stake_op(Stake.update_status_op(
             args['user'],
             args['stakeIndex'],
             'emergency_withdrawn',
-            emergency_amount=convert_uint256_for_mongodb(amount),
-            emergency_withdrawn_at=datetime.utcnow()
-        )
+            pool=batch.pool,
+            emergency_amount=encode_amount(amount),
+            emergency_withdrawn_at=datetime.utcfromtimestamp(event['blockTime']),
+            updated_at=datetime.utcfromtimestamp(event['blockTime'])
+        ))
+        batch.add_stake_undo({
+            'action': 'set',
+            'user': args['user'],
+            'stake_index': int(args['stakeIndex']),
+            'set': {'status': 'active'},
+            'unset': ['emergency_amount', 'emergency_withdrawn_at']
+        })
 
-        User.increment_field(args['user'], 'total_staked', -amount)
-        User.increment_field(args['user'], 'active_stakes_count', -1)
+        batch.increment_user(args['user'], 'total_staked', -amount)
+        batch.increment_user(args['user'], 'active_stakes_count', -1)
+        self.close_stake(batch, args, 'emergency_withdrawn')
 
         logger.info(f"EmergencyWithdraw: user={args['user']}, amount={amount}")
     
-    def process_reward_pool_funded(self, event):
+    @staticmethod
+    def close_stake(batch, args, status):
+        """Pool stats side of an Unstaked/EmergencyWithdraw: the stake leaves TVL and its tier."""
+        known = batch.stake_state(args['user'], args['stakeIndex'])
+        batch.set_stake_state(
+            args['user'],
+            args['stakeIndex'],
+            dict(known, status=status) if known else {'status': status, 'tier_id': None, 'amount': 0}
+        )
+    
+    def load_stake_states(self, events, stakes=None):
+        """
+        Current state of the stakes the events create or close, in one query,
+        so the batch can turn each event into a pool stats delta.
+        """
+        keys = {
+            (event['args']['user'].lower(), int(event['args']['stakeIndex']))
+            for event in events if event['event'] in STATS_EVENTS
+        }
+        if not keys:
+            return {}
+        
+        stakes = stakes if stakes is not None else db['stakes']
+        docs = stakes.find(
+            Stake.pool_users_query(self.pool_key, {user for user, _ in keys}),
+            STAKE_STATE_FIELDS
+        )
+        return {
+            (doc['user_address'], doc['stake_index']): {
+                'status': doc.get('status'),
+                'tier_id': doc.get('tier_id'),
+                'amount': decode_amount(doc.get('amount'))
+            }
+            for doc in docs if (doc['user_address'], doc['stake_index']) in keys
+        }
+    
+    def process_reward_pool_funded(self, event, batch):
         args = event['args']
         logger.info(f"RewardPoolFunded: funder={args['funder']}, amount={args['amount']}")
     
-    def store_raw_event(self, event):
+    def store_raw_event(self, event, batch):
         """
-        Store raw blockchain event in MongoDB with proper type conversion.
+        Queue raw blockchain event for MongoDB with proper type conversion.
 
-        Converts all uint256 values using convert_uint256_for_mongodb()
-        to ensure MongoDB compatibility.
+        Token amounts (AMOUNT_ARGS) are stored as Decimal128, other uint256
+        values through convert_uint256_for_mongodb(). An amount too large for
+        Decimal128 is stored clamped; its exact value is kept as a decimal
+        string under amount_overflow.{arg}, which flags the event.
         """
         # Convert all values to MongoDB-compatible types
         args_dict = {}
+        overflows = {}
         for key, value in event['args'].items():
             # Handle all possible web3.py types
             if hasattr(value, 'hex'):  # bytes-like
                 args_dict[key] = value.hex() if value else None
             elif isinstance(value, int):
-                # Use centralized conversion function
-                args_dict[key] = convert_uint256_for_mongodb(value)
+                if key in AMOUNT_ARGS:
+                    args_dict[key] = encode_amount(value)
+                    if amount_overflows(value):
+                        overflows[key] = str(value)
+                else:
+                    args_dict[key] = convert_uint256_for_mongodb(value)
             else:
                 args_dict[key] = str(value)
 
@@ -150,11 +448,43 @@ class BlockchainListener:
             'block_number': int(event['blockNumber']),
             'log_index': int(event['logIndex']),
             'args': args_dict,
+            'block_time': datetime.utcfromtimestamp(event['blockTime']),
             'processed_at': datetime.utcnow()
         }
-        self.events_collection.insert_one(event_data)
+        if overflows:
+            event_data['amount_overflow'] = overflows
+        batch.add_raw_event(event_data)
+    
+    def attach_block_times(self, events):
+        """
+        Return the events with their block's timestamp as 'blockTime'.
+        Headers come from the shared LRU in one batched RPC for the misses;
+        events that already carry blockTime (replays) are left as they are.
+        """
+        missing = [event for event in events if 'blockTime' not in event]
+        if not missing:
+            return events
+        
+        block_times = self.web3.get_block_timestamps(missing)
+        return [
+            event if 'blockTime' in event
+            else dict(event, blockTime=block_times[event['blockNumber']])
+            for event in events
+        ]
     
-    def process_events(self, from_block, to_block):
+    def build_batch(self, events, stakes=None, failure_sink=None):
+        """
+        Run the handlers over already-fetched events, in order, into one
+        EventBatch. stakes is the collection holding the stakes' current state
+        (default: stakes; the projection rebuild passes its own).
+
+        An event whose handler fails is left out of the batch and reported
+        to failure_sink(from_block, to_block, error, event_name); by default
+        range_recovery.record_failure, which retries its block later. The
+        projection rebuild passes its own so it never queues live retries.
+        """
+        failure_sink = failure_sink or self.range_recovery.record_failure
+        events = self.attach_block_times(events)
         event_handlers = {
             'StakeCreated': self.process_stake_created,
             'Unstaked': self.process_unstaked,
@@ -163,50 +493,163 @@ class BlockchainListener:
             'RewardPoolFunded': self.process_reward_pool_funded
         }
         
-        for event_name, handler in event_handlers.items():
-            try:
-                events = web3_manager.get_events(event_name, from_block, to_block)
-                
-                for event in events:
-                    self.store_raw_event(event)
-                    handler(event)
-                
-                if events:
-                    logger.info(f"Processed {len(events)} {event_name} events")
+        batch = EventBatch(self.pool_key)
+        batch.stake_states = self.load_stake_states(events, stakes)
+        counts = {}
+        for event in events:
+            event_name = event['event']
+            handler = event_handlers.get(event_name)
+            if handler is None:
+                continue
             
+            event_count = batch.event_count
+            try:
+                self.store_raw_event(event, batch)
+                handler(event, batch)
+                counts[event_name] = counts.get(event_name, 0) + 1
             except Exception as e:
-                logger.error(f"Error processing {event_name}: {str(e)}")
+                # Leave no half-built event in the batch; report it to the sink
+                batch.rollback_to(event_count)
+                logger.error(
+                    f"[{self.pool_key}] Error processing {event_name} at block {event['blockNumber']}: {str(e)}"
+                )
+                block_number = int(event['blockNumber'])
+                failure_sink(block_number, block_number, e, event_name)
+        
+        for event_name, count in counts.items():
+            LISTENER_EVENTS.labels(self.pool_key, event_name).inc(count)
+            logger.info(f"[{self.pool_key}] Processed {count} {event_name} events")
+        
+        return batch
+    
+    def apply_events(self, events, block_hashes=None):
+        """
+        Apply already-fetched events as one EventBatch. block_hashes maps the
+        range's unconfirmed blocks to their hash for the undo journal.
+
+        Commit errors propagate so callers do not checkpoint past them.
+        """
+        batch = self.build_batch(events)
+        if not batch.is_empty() or block_hashes:
+            with observe_latency(MONGO_LATENCY, 'event_batch'):
+                applied = batch.commit(block_hashes=block_hashes)
+            if applied < batch.event_count:
+                logger.info(f"[{self.pool_key}] Skipped {batch.event_count - applied} already-applied events")
+            self.publish_leaderboards(batch.addresses())
     
-    def start(self):
-        logger.info("Starting blockchain listener...")
-        logger.info(f"RPC: {config.RPC_URL}")
-        logger.info(f"Contract: {config.STAKING_POOL_ADDRESS}")
+    def process_events(self, from_block, to_block, head=None):
+        """
+        Fetch and apply all events in [from_block, to_block]. Blocks within
+        CONFIRMATION_DEPTH of head are journaled for reorg rollback.
+
+        Returns the number of events fetched, or None if the fetch failed and
+        the range was queued for retry.
+        """
+        try:
+            # One eth_getLogs for all event types, already in (block, logIndex) order
+            events = self.fetch_events(from_block, to_block)
+        except Exception as e:
+            logger.error(f"[{self.pool_key}] Error fetching events for blocks {from_block}-{to_block}: {str(e)}")
+            self.range_recovery.record_failure(from_block, to_block, e)
+            return None
+        
+        block_hashes = self.reorg_journal.block_hashes_for(from_block, to_block, head or to_block, events)
+        self.apply_events(events, block_hashes)
+        self.range_recovery.record_processed(from_block, to_block)
+        return len(events)
+    
+    def start(self, serve_metrics=True):
+        """
+        Run the listener loop. serve_metrics=False when several listeners
+        share a process that serves the metrics itself (app.services.pool_listeners).
+        """
+        logger.info(f"Starting blockchain listener for pool {self.pool_key}...")
+        logger.info(f"RPC: {self.pool.rpc_url}")
+        logger.info(f"Contract: {self.pool.address}")
+        # Replays are only idempotent with the unique event index
+        require_event_index()
         
         last_block = self.get_last_processed_block()
-        logger.info(f"Starting from block: {last_block}")
+        logger.info(f"[{self.pool_key}] Starting from block: {last_block}")
+        
+        if self.head_subscription:
+            logger.info(f"Head subscription: {self.pool.ws_url}")
+            self.head_subscription.start_in_thread()
+        
+        if serve_metrics and config.LISTENER_METRICS_PORT:
+            logger.info(f"Metrics: http://0.0.0.0:{config.LISTENER_METRICS_PORT}/metrics")
+            start_metrics_server(config.LISTENER_METRICS_PORT)
+        
+        if config.LISTENER_LEASE_TTL:
+            self.lease = ListenerLease(self.pool_key)
         
         while True:
             try:
-                current_block = web3_manager.get_latest_block()
+                if self.lease and not self.lease.held:
+                    # Standby until leader, then resume from the previous leader's checkpoint
+                    self.lease.wait_until_acquired()
+                    last_block = self.get_last_processed_block()
+                    # Claims the checkpoint for our token, fencing off the old leader
+                    self.save_last_processed_block(last_block)
+                    logger.info(f"[{self.pool_key}] Active, resuming from block {last_block}")
+                
+                # Failed ranges are retried here, never alongside a live batch
+                self.range_recovery.maintain()
+                
+                current_block = self.get_head()
+                self.publish_contract_info(current_block)
+                
+                fork_block = self.reorg_journal.find_fork(last_block)
+                if fork_block is not None:
+                    logger.warning(f"[{self.pool_key}] Reorg detected at block {fork_block}")
+                    self.publish_leaderboards(self.reorg_journal.rollback(fork_block))
+                    last_block = fork_block - 1
+                    self.save_last_processed_block(last_block)
+                
+                # Far behind: continue after what a backfill already applied
+                # (final blocks only, so nothing there needs journaling)
+                if current_block - last_block > self.batch_size:
+                    backfilled = min(self.skip_backfilled(last_block), current_block)
+                    if backfilled > last_block:
+                        logger.info(f"[{self.pool_key}] Blocks {last_block + 1}-{backfilled} already backfilled")
+                        last_block = backfilled
+                        self.save_last_processed_block(last_block)
                 
                 if current_block > last_block:
                     to_block = min(last_block + self.batch_size, current_block)
                     
-                    logger.info(f"Processing blocks {last_block + 1} to {to_block}")
-                    self.process_events(last_block + 1, to_block)
+                    logger.info(f"[{self.pool_key}] Processing blocks {last_block + 1} to {to_block}")
+                    event_count = self.process_events(last_block + 1, to_block, current_block)
                     
+                    # Only reached once the range's batch has committed
+                    if event_count is not None:
+                        self.update_range_sizing(last_block + 1, to_block, event_count)
                     last_block = to_block
                     self.save_last_processed_block(last_block)
+                    self.reorg_journal.prune(current_block)
+                    record_listener_progress(self.pool_key, current_block, last_block)
+                    
+                    # Still catching up: go straight to the next range
+                    if to_block < current_block:
+                        continue
                 
-                time.sleep(self.poll_interval)
+                record_listener_progress(self.pool_key, current_block, last_block)
+                self.wait_for_head()
             
             except KeyboardInterrupt:
                 logger.info("Listener stopped by user")
+                if self.lease:
+                    self.lease.release()
                 break
+            except LeaseLostError as e:
+                logger.warning(f"[{self.pool_key}] {str(e)}, back to standby")
             except Exception as e:
-                logger.error(f"Error in listener loop: {str(e)}")
+                logger.error(f"[{self.pool_key}] Error in listener loop: {str(e)}")
                 time.sleep(self.poll_interval * 2)
 
 if __name__ == '__main__':
+    from app.services.pool_listeners import migrate_legacy_data
+    
+    migrate_legacy_data()
     listener = BlockchainListener()
     listener.start()
\ No newline at end of file
@@ -0,0 +1,100 @@
+# backend/app/services/contract_state.py - v1.0
+"""
+Block-keyed snapshot of the StakingPool's on-chain balances, shared by all
+API workers through Redis.
+
+A snapshot (totalStaked, rewardPoolBalance, DAI balanceOf the pool) is read
+with one Multicall3 eth_call pinned to a block, so its three values are
+consistent, and stored twice:
+
+- contract_info:{pool}:{block}   the snapshot of that block
+- contract_info:{pool}:latest    the newest snapshot, only ever moved forward
+
+both expiring after CONTRACT_INFO_TTL seconds. The listener refreshes the
+snapshot when it sees a new head, so the API normally answers from Redis
+without touching the RPC. When the latest snapshot has expired (listener
+down) the first request pays for one eth_blockNumber and one multicall and
+the others reuse its result. Without Redis the API falls back to reading
+the chain on every request.
+"""
+import json
+import logging
+import redis
+from app.utils.redis_client import get_redis
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+# Replace the latest snapshot unless the stored one is for a newer block
+STORE_LATEST_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current and cjson.decode(current)['block_number'] >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+return 1
+"""
+
+
+def _key(pool_key, suffix):
+    return f"contract_info:{pool_key}:{suffix}"
+
+
+def read_contract_info(manager, block_number):
+    """Snapshot of the manager's pool at block_number, from a single multicall."""
+    staking_pool = manager.staking_pool
+    total_staked, reward_pool, contract_balance = manager.multicall([
+        staking_pool.functions.totalStaked(),
+        staking_pool.functions.rewardPoolBalance(),
+        manager.dai_token.functions.balanceOf(staking_pool.address)
+    ], block_identifier=block_number)
+
+    return {
+        'total_staked': str(total_staked),
+        'reward_pool_balance': str(reward_pool),
+        'contract_balance': str(contract_balance),
+        'contract_address': staking_pool.address,
+        'block_number': block_number
+    }
+
+
+def store_contract_info(pool_key, info, redis_client=None):
+    client = redis_client or get_redis()
+    payload = json.dumps(info)
+    client.set(_key(pool_key, info['block_number']), payload, ex=config.CONTRACT_INFO_TTL)
+    client.register_script(STORE_LATEST_SCRIPT)(
+        keys=[_key(pool_key, 'latest')],
+        args=[payload, info['block_number'], config.CONTRACT_INFO_TTL]
+    )
+
+
+def refresh_contract_info(manager, block_number, redis_client=None):
+    """Read and publish the snapshot of a new head (called by the listener)."""
+    info = read_contract_info(manager, block_number)
+    store_contract_info(manager.pool_key, info, redis_client)
+    return info
+
+
+def get_contract_info(manager, redis_client=None):
+    """Latest snapshot of the manager's pool, from Redis when available."""
+    pool_key = manager.pool_key
+    try:
+        client = redis_client or get_redis()
+        cached = client.get(_key(pool_key, 'latest'))
+        if cached:
+            return json.loads(cached)
+
+        block_number = manager.get_latest_block()
+        cached = client.get(_key(pool_key, block_number))
+        if cached:
+            return json.loads(cached)
+    except redis.RedisError as e:
+        logger.warning(f"Contract info cache unavailable, reading the chain: {str(e)}")
+        return read_contract_info(manager, manager.get_latest_block())
+
+    info = read_contract_info(manager, block_number)
+    try:
+        store_contract_info(pool_key, info, client)
+    except redis.RedisError as e:
+        logger.warning(f"Could not cache contract info: {str(e)}")
+    return info
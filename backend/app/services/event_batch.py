@@ -0,0 +1,344 @@
+# backend/app/services/event_batch.py - v1.9
+"""
+Batched, idempotent apply pipeline for blockchain events.
+
+The listener used to issue several Mongo round trips per event (raw insert,
+user find/insert, stake insert, one update per user counter). EventBatch
+collects every mutation for a block range instead and commits them with a
+single bulk_write per collection:
+
+- raw_events: one InsertOne per event, in chain order
+- stakes:     ordered list (a stake created and unstaked in the same range
+              must be written before it is updated)
+- users:      one upserting UpdateOne per address with all $inc deltas merged
+- pool_stats: one upserting UpdateOne with the pool's merged $inc deltas
+              (app.models.pool_stats), derived from each stake's state
+              before and after the event
+
+Applying is idempotent. raw_events has a unique (transaction_hash,
+log_index) index and is written first: an event whose raw insert hits a
+duplicate key was already stored, so its stake/user mutations are dropped
+from the batch unless that copy is still applied=False.
+
+The projection $inc deltas cannot be repeated, so an event is claimed before
+its projections are written: one conditional update flips applied from
+False to True (tagged with the batch's claim token), and only the events
+this batch flipped are applied. A write that fails before any projection
+landed releases the claim, so the retry applies the events; once a write
+has landed the claim stands and a crash or error leaves the rest of the
+batch unapplied rather than counted twice (the reconciliation job repairs
+stakes and users from the chain). Concurrent writers of the same events
+(listener and backfill) apply each one once.
+
+For blocks that are not yet final (see app.services.reorg), the batch also
+writes an undo journal: per block, its hash and how to revert every event
+in it, so a reorg can be rolled back block by block.
+
+A batch belongs to one pool (app.utils.pools key): raw events, user
+counters and journal entries are tagged with it.
+"""
+import logging
+from datetime import datetime
+from bson import ObjectId
+from pymongo import InsertOne, ReplaceOne
+from pymongo.errors import BulkWriteError
+from app.models import db
+from app.models.pool_stats import PoolStats
+from app.models.user import AMOUNT_FIELDS, User
+from app.utils.mongodb_helpers import encode_amount
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def unapplied_query(keys):
+    """Stored copies of the (transaction_hash, log_index) events that were never fully applied."""
+    return {
+        '$or': [
+            {'transaction_hash': transaction_hash, 'log_index': log_index}
+            for transaction_hash, log_index in keys
+        ],
+        'applied': False
+    }
+
+
+def claim_update(raw_ids, claim):
+    """Flip the still-unapplied events among raw_ids to applied, tagged with claim."""
+    return {'_id': {'$in': raw_ids}, 'applied': False}, {'$set': {'applied': True, 'claim': claim}}
+
+
+def release_update(claim):
+    """Undo claim_update(): the claimed events are unapplied again."""
+    return {'claim': claim}, {'$set': {'applied': False}, '$unset': {'claim': ''}}
+
+
+def _landed(error):
+    """Whether a failed bulk_write still wrote some of its operations."""
+    if not isinstance(error, BulkWriteError):
+        return False
+    return any(error.details.get(field) for field in ('nInserted', 'nUpserted', 'nModified', 'nRemoved'))
+
+
+class EventBatch:
+    def __init__(self, pool=None):
+        self.pool = pool
+        # One entry per event: its raw document plus the projection changes it causes
+        self.entries = []
+        # (user, stake_index) -> {'status', 'tier_id', 'amount'} as of the
+        # batch's latest event; seeded from the stakes collection by the listener
+        self.stake_states = {}
+
+    @property
+    def event_count(self):
+        return len(self.entries)
+
+    def add_raw_event(self, event_data):
+        """Start a new event; following stake/user mutations belong to it."""
+        event_data['applied'] = False
+        if self.pool:
+            event_data['pool'] = self.pool
+        self.entries.append({
+            'raw': event_data,
+            'stake_ops': [],
+            'stake_undo': [],
+            'user_increments': {},
+            'stats_increments': {}
+        })
+
+    def add_stake_op(self, op):
+        self.entries[-1]['stake_ops'].append(op)
+
+    def add_stake_undo(self, spec):
+        """Record how to revert the current event's stake change (see Stake.undo_op)."""
+        if self.pool:
+            spec['pool'] = self.pool
+        self.entries[-1]['stake_undo'].append(spec)
+
+    def increment_user(self, address, field, value):
+        """Queue a $inc on a user counter for the current event."""
+        increments = self.entries[-1]['user_increments'].setdefault(address.lower(), {})
+        increments[field] = increments.get(field, 0) + int(value)
+
+    def stake_state(self, user, stake_index):
+        return self.stake_states.get((user.lower(), int(stake_index)))
+
+    def set_stake_state(self, user, stake_index, state):
+        """Record a stake's state after the current event and queue the pool stats delta."""
+        key = (user.lower(), int(stake_index))
+        increments = self.entries[-1]['stats_increments']
+        for field, value in PoolStats.delta(self.stake_states.get(key), state).items():
+            increments[field] = increments.get(field, 0) + value
+        self.stake_states[key] = state
+
+    def rollback_to(self, event_count):
+        """Drop events added after the first event_count (e.g. one whose handler failed)."""
+        del self.entries[event_count:]
+
+    def is_empty(self):
+        return not self.entries
+
+    def addresses(self):
+        """Users whose counters the batch changes."""
+        return {address for entry in self.entries for address in entry['user_increments']}
+
+    @staticmethod
+    def _duplicate_indexes(error):
+        """Indexes of inserts rejected as duplicates; re-raise on any other write error."""
+        write_errors = error.details.get('writeErrors', [])
+        if any(e['code'] != DUPLICATE_KEY_ERROR for e in write_errors):
+            raise error
+        return {e['index'] for e in write_errors}
+
+    def _unapplied_query(self, duplicate_indexes):
+        """Find the stored copies of duplicate events that were never fully applied."""
+        return unapplied_query(
+            (self.entries[i]['raw']['transaction_hash'], self.entries[i]['raw']['log_index'])
+            for i in sorted(duplicate_indexes)
+        )
+
+    def _entries_to_apply(self, duplicate_indexes, unapplied):
+        """
+        Entries still to apply: fresh inserts plus duplicates whose earlier
+        attempt never finished. Returns them with the raw_events _ids to
+        claim before applying them.
+        """
+        unapplied_ids = {(doc['transaction_hash'], doc['log_index']): doc['_id'] for doc in unapplied}
+        to_apply = []
+        raw_ids = []
+        for index, entry in enumerate(self.entries):
+            raw = entry['raw']
+            if index not in duplicate_indexes:
+                raw_id = raw['_id']
+            else:
+                raw_id = unapplied_ids.get((raw['transaction_hash'], raw['log_index']))
+                if raw_id is None:
+                    continue
+            to_apply.append(entry)
+            raw_ids.append(raw_id)
+        return to_apply, raw_ids
+
+    def projection_plan(self, entries):
+        """
+        Bulk operations for the given entries, as (collection name, ops,
+        ordered): stakes in event order, then users with $inc merged per address.
+        """
+        stake_ops = []
+        user_increments = {}
+        stats_increments = {}
+        for entry in entries:
+            stake_ops.extend(entry['stake_ops'])
+            for address, increments in entry['user_increments'].items():
+                merged = user_increments.setdefault(address, {})
+                for field, value in increments.items():
+                    merged[field] = merged.get(field, 0) + value
+            for field, value in entry['stats_increments'].items():
+                stats_increments[field] = stats_increments.get(field, 0) + value
+
+        plan = []
+        if stake_ops:
+            plan.append(('stakes', stake_ops, True))
+        if user_increments:
+            plan.append((
+                'users',
+                [
+                    User.increments_op(address, increments, self.pool)
+                    for address, increments in user_increments.items()
+                ],
+                False
+            ))
+        stats_increments = {field: value for field, value in stats_increments.items() if value}
+        if stats_increments:
+            plan.append(('pool_stats', [PoolStats.increments_op(self.pool, stats_increments)], False))
+        return plan
+
+    def journal_ops(self, block_hashes):
+        """
+        Undo journal documents for the unconfirmed blocks of this batch, one per
+        block in block_hashes (block number -> hash), including event-free ones.
+        Every event is journaled, replays included, so a journal document is
+        always complete for its block.
+        """
+        journal = {
+            block_number: {
+                '_id': f"{self.pool}:{block_number}" if self.pool else block_number,
+                'pool': self.pool,
+                'block_number': block_number,
+                'block_hash': block_hash,
+                'events': [],
+                'created_at': datetime.utcnow()
+            }
+            for block_number, block_hash in block_hashes.items()
+        }
+        for entry in self.entries:
+            doc = journal.get(entry['raw']['block_number'])
+            if doc is None:
+                continue
+            doc['events'].append({
+                'transaction_hash': entry['raw']['transaction_hash'],
+                'log_index': entry['raw']['log_index'],
+                'stake_undo': entry['stake_undo'],
+                'user_undo': {
+                    address: {
+                        field: encode_amount(-value) if field in AMOUNT_FIELDS else -value
+                        for field, value in increments.items()
+                    }
+                    for address, increments in entry['user_increments'].items()
+                },
+                'stats_undo': PoolStats.encode_increments({
+                    field: -value for field, value in entry['stats_increments'].items()
+                })
+            })
+        return [ReplaceOne({'_id': doc['_id']}, doc, upsert=True) for doc in journal.values()]
+
+    def commit(self, database=db, block_hashes=None):
+        """
+        Write the batch with one bulk_write per collection. block_hashes
+        (unconfirmed block number -> hash) are recorded in the undo journal.
+
+        Returns the number of events applied (already-applied replays are
+        skipped). Raises on failure so the caller does not advance its
+        checkpoint.
+        """
+        raw_events = database['raw_events']
+        duplicate_indexes = set()
+        try:
+            if self.entries:
+                raw_events.bulk_write([InsertOne(entry['raw']) for entry in self.entries], ordered=False)
+        except BulkWriteError as e:
+            duplicate_indexes = self._duplicate_indexes(e)
+
+        unapplied = []
+        if duplicate_indexes:
+            unapplied = list(raw_events.find(
+                self._unapplied_query(duplicate_indexes),
+                {'transaction_hash': 1, 'log_index': 1}
+            ))
+
+        to_apply, raw_ids = self._entries_to_apply(duplicate_indexes, unapplied)
+        claim = ObjectId()
+        if raw_ids and raw_events.update_many(*claim_update(raw_ids, claim)).modified_count < len(raw_ids):
+            # Some were claimed by another writer first
+            claimed = raw_events.find({'_id': {'$in': raw_ids}, 'claim': claim}, {'_id': 1})
+            to_apply = self._claimed_entries(to_apply, raw_ids, {doc['_id'] for doc in claimed})
+
+        landed = False
+        try:
+            for collection_name, ops, ordered in self.projection_plan(to_apply):
+                database[collection_name].bulk_write(ops, ordered=ordered)
+                landed = True
+        except Exception as e:
+            if self._release_claim(e, landed):
+                raw_events.update_many(*release_update(claim))
+            raise
+
+        if block_hashes:
+            database['undo_journal'].bulk_write(self.journal_ops(block_hashes), ordered=False)
+        return len(to_apply)
+
+    @staticmethod
+    def _claimed_entries(to_apply, raw_ids, claimed_ids):
+        return [entry for entry, raw_id in zip(to_apply, raw_ids) if raw_id in claimed_ids]
+
+    def _release_claim(self, error, landed):
+        """Whether a failed projection write can release the batch's claim (nothing written yet)."""
+        if landed or _landed(error):
+            logger.error(
+                f"[{self.pool}] Projection write failed after a partial write, "
+                f"the batch's remaining changes are left to reconciliation: {str(error)}"
+            )
+            return False
+        return True
+
+    async def commit_async(self, database):
+        """Same as commit() against a motor database."""
+        raw_events = database['raw_events']
+        duplicate_indexes = set()
+        try:
+            await raw_events.bulk_write([InsertOne(entry['raw']) for entry in self.entries], ordered=False)
+        except BulkWriteError as e:
+            duplicate_indexes = self._duplicate_indexes(e)
+
+        unapplied = []
+        if duplicate_indexes:
+            unapplied = await raw_events.find(
+                self._unapplied_query(duplicate_indexes),
+                {'transaction_hash': 1, 'log_index': 1}
+            ).to_list(length=None)
+
+        to_apply, raw_ids = self._entries_to_apply(duplicate_indexes, unapplied)
+        claim = ObjectId()
+        if raw_ids and (await raw_events.update_many(*claim_update(raw_ids, claim))).modified_count < len(raw_ids):
+            claimed = await raw_events.find({'_id': {'$in': raw_ids}, 'claim': claim}, {'_id': 1}).to_list(length=None)
+            to_apply = self._claimed_entries(to_apply, raw_ids, {doc['_id'] for doc in claimed})
+
+        landed = False
+        try:
+            for collection_name, ops, ordered in self.projection_plan(to_apply):
+                await database[collection_name].bulk_write(ops, ordered=ordered)
+                landed = True
+        except Exception as e:
+            if self._release_claim(e, landed):
+                await raw_events.update_many(*release_update(claim))
+            raise
+        return len(to_apply)
@@ -0,0 +1,114 @@
+# backend/app/services/head_subscription.py - v1.0
+"""
+Push-based chain head tracking over a websocket eth_subscribe('newHeads').
+
+Replaces fixed POLL_INTERVAL polling of eth_blockNumber in the listeners:
+they block until a new head is announced and then fetch logs up to it. While
+the socket is down `connected` is False and the listeners fall back to
+polling; every (re)connect wakes them so the gap since their checkpoint is
+reconciled immediately.
+
+Works with any node exposing eth_subscribe over websockets (anvil serves it
+on the same port as HTTP: ws://127.0.0.1:8545).
+"""
+import asyncio
+import json
+import logging
+import threading
+import websockets
+
+logger = logging.getLogger(__name__)
+
+# Reconnect backoff bounds (seconds)
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = 30
+
+
+class HeadSubscription:
+    def __init__(self, ws_url):
+        self.ws_url = ws_url
+        self.latest_head = None
+        self.connected = False
+
+        # Set on every new head or (re)connect; one for asyncio consumers,
+        # one for the threaded sync listener
+        self.new_head = asyncio.Event()
+        self.new_head_sync = threading.Event()
+
+    def _notify(self):
+        self.new_head_sync.set()
+        self.new_head.set()
+
+    async def _subscribe(self, ws):
+        await ws.send(json.dumps({
+            'jsonrpc': '2.0',
+            'id': 1,
+            'method': 'eth_subscribe',
+            'params': ['newHeads']
+        }))
+        reply = json.loads(await ws.recv())
+        if 'error' in reply:
+            raise ConnectionError(f"eth_subscribe failed: {reply['error']}")
+        return reply['result']
+
+    async def run(self):
+        """Keep a newHeads subscription open forever, reconnecting with backoff."""
+        delay = RECONNECT_MIN_DELAY
+
+        while True:
+            try:
+                async with websockets.connect(self.ws_url, ping_interval=20) as ws:
+                    subscription_id = await self._subscribe(ws)
+                    self.connected = True
+                    delay = RECONNECT_MIN_DELAY
+                    logger.info(f"Subscribed to newHeads on {self.ws_url}")
+
+                    # Wake consumers so they reconcile anything missed while down
+                    self._notify()
+
+                    async for message in ws:
+                        data = json.loads(message)
+                        params = data.get('params') or {}
+                        if data.get('method') != 'eth_subscription':
+                            continue
+                        if params.get('subscription') != subscription_id:
+                            continue
+
+                        self.latest_head = int(params['result']['number'], 16)
+                        self._notify()
+
+            except asyncio.CancelledError:
+                self.connected = False
+                raise
+            except Exception as e:
+                logger.warning(f"Head subscription lost ({str(e)}), falling back to polling")
+
+            # Stale until the next announcement: consumers ask the RPC instead
+            self.connected = False
+            self.latest_head = None
+            self._notify()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def wait(self, timeout):
+        """Wait for the next head announcement (asyncio consumers)."""
+        try:
+            await asyncio.wait_for(self.new_head.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.new_head.clear()
+
+    def wait_sync(self, timeout):
+        """Wait for the next head announcement (threaded consumers)."""
+        self.new_head_sync.wait(timeout)
+        self.new_head_sync.clear()
+
+    def start_in_thread(self):
+        """Run the subscription on its own event loop in a daemon thread."""
+        thread = threading.Thread(
+            target=lambda: asyncio.run(self.run()),
+            name='head-subscription',
+            daemon=True
+        )
+        thread.start()
+        return thread
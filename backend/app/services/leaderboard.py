@@ -0,0 +1,218 @@
+# backend/app/services/leaderboard.py - v1.1
+"""
+Staker leaderboards in Redis sorted sets, kept current by the listener.
+
+    leaderboard:staked            address -> active stake, all tiers
+    leaderboard:staked:tier:{id}  address -> active stake in that tier
+    leaderboard:rewards           address -> rewards claimed
+    leaderboard:tiers             set of tier ids with a sorted set
+
+Scores are DAI (wei / 10**18) as floats: enough to rank, and ZREVRANGE /
+ZREVRANK answer any page or rank in O(log n). Exact wei amounts for the
+addresses of a page are read back from MongoDB (see describe()).
+
+After each committed batch the listener refreshes the addresses it touched
+(refresh_addresses): their totals are re-read from the stakes and users
+collections and written as absolute scores, so a replayed event or a reorg
+rollback cannot skew them the way an increment would. Leaderboards span
+every pool, like the rest of /api/analytics.
+
+Seed (or repair) all of them from MongoDB:
+    python -m app.services.leaderboard rebuild
+Addresses the listener re-scores while a rebuild runs can be overwritten by
+the rebuild's older totals; they are corrected at their next event.
+"""
+import argparse
+import logging
+from app.models import db
+from app.utils.mongodb_helpers import decode_amount
+from app.utils.redis_client import get_redis
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STAKED_KEY = 'leaderboard:staked'
+REWARDS_KEY = 'leaderboard:rewards'
+TIERS_KEY = 'leaderboard:tiers'
+REBUILD_SUFFIX = ':rebuild'
+
+# Addresses per pipeline when seeding
+REBUILD_CHUNK_SIZE = 5000
+
+# Fields of a user document the leaderboards read
+REWARDS_PROJECTION = {'address': 1, 'total_rewards_claimed': 1}
+
+
+def tier_key(tier_id):
+    return f"{STAKED_KEY}:tier:{tier_id}"
+
+
+def board_key(tier_id=None):
+    return STAKED_KEY if tier_id is None else tier_key(tier_id)
+
+
+def score(wei):
+    return wei / 10**18
+
+
+def active_stakes_pipeline(addresses=None, tier_id=None):
+    """Active stake amount and count per (user, tier), optionally for some addresses / one tier."""
+    match = {'status': 'active'}
+    if addresses is not None:
+        match['user_address'] = {'$in': list(addresses)}
+    if tier_id is not None:
+        match['tier_id'] = tier_id
+    return [
+        {'$match': match},
+        {'$group': {
+            '_id': {'user': '$user_address', 'tier_id': '$tier_id'},
+            'amount': {'$sum': '$amount'},
+            'count': {'$sum': 1}
+        }}
+    ]
+
+
+def rewards_query(addresses=None):
+    return {'address': {'$in': list(addresses)}} if addresses is not None else {}
+
+
+def active_stakes_by_user(addresses=None, database=db, tier_id=None):
+    """{address: {tier_id: (amount, stake count)}} of active stakes, optionally for some addresses only."""
+    totals = {}
+    for group in database['stakes'].aggregate(active_stakes_pipeline(addresses, tier_id)):
+        key = group['_id']
+        totals.setdefault(key['user'], {})[key['tier_id']] = (decode_amount(group['amount']), group['count'])
+    return totals
+
+
+def rewards_by_user(addresses=None, database=db):
+    """{address: rewards claimed} summed over the user's per-pool documents."""
+    rewards = {}
+    for user in database['users'].find(rewards_query(addresses), REWARDS_PROJECTION):
+        rewards[user['address']] = rewards.get(user['address'], 0) + decode_amount(user.get('total_rewards_claimed'))
+    return rewards
+
+
+def _write_scores(pipe, address, tiers, rewards, tier_ids, suffix=''):
+    """Queue the absolute scores of one address; zero totals leave the board."""
+    total = sum(amount for amount, _ in tiers.values())
+    if total:
+        pipe.zadd(STAKED_KEY + suffix, {address: score(total)})
+    else:
+        pipe.zrem(STAKED_KEY + suffix, address)
+
+    for tier_id in tier_ids | set(tiers):
+        amount = tiers.get(tier_id, (0, 0))[0]
+        if amount:
+            pipe.zadd(tier_key(tier_id) + suffix, {address: score(amount)})
+        else:
+            pipe.zrem(tier_key(tier_id) + suffix, address)
+
+    if rewards:
+        pipe.zadd(REWARDS_KEY + suffix, {address: score(rewards)})
+    else:
+        pipe.zrem(REWARDS_KEY + suffix, address)
+
+
+def refresh_addresses(addresses, database=db, redis_client=None):
+    """Re-score the given addresses on every leaderboard (called after each listener batch)."""
+    addresses = {address.lower() for address in addresses}
+    if not addresses:
+        return
+
+    client = redis_client or get_redis()
+    stakes = active_stakes_by_user(addresses, database)
+    rewards = rewards_by_user(addresses, database)
+    tier_ids = {int(tier_id) for tier_id in client.smembers(TIERS_KEY)}
+
+    pipe = client.pipeline(transaction=False)
+    new_tiers = {tier_id for tiers in stakes.values() for tier_id in tiers} - tier_ids
+    if new_tiers:
+        pipe.sadd(TIERS_KEY, *new_tiers)
+    for address in addresses:
+        _write_scores(pipe, address, stakes.get(address, {}), rewards.get(address, 0), tier_ids)
+    pipe.execute()
+
+
+def rebuild(database=db, redis_client=None):
+    """
+    Seed every leaderboard from MongoDB into temporary keys, then swap them
+    in with RENAME so readers never see a half-built board.
+    """
+    client = redis_client or get_redis()
+    stakes = active_stakes_by_user(database=database)
+    rewards = rewards_by_user(database=database)
+    tier_ids = {tier_id for tiers in stakes.values() for tier_id in tiers}
+    keys = [STAKED_KEY, REWARDS_KEY] + [tier_key(tier_id) for tier_id in tier_ids]
+
+    client.delete(*[key + REBUILD_SUFFIX for key in keys])
+    addresses = sorted(set(stakes) | set(rewards))
+    for start in range(0, len(addresses), REBUILD_CHUNK_SIZE):
+        pipe = client.pipeline(transaction=False)
+        for address in addresses[start:start + REBUILD_CHUNK_SIZE]:
+            _write_scores(pipe, address, stakes.get(address, {}), rewards.get(address, 0), set(), REBUILD_SUFFIX)
+        pipe.execute()
+
+    old_tiers = {int(tier_id) for tier_id in client.smembers(TIERS_KEY)}
+    pipe = client.pipeline(transaction=True)
+    for key in keys:
+        if client.exists(key + REBUILD_SUFFIX):
+            pipe.rename(key + REBUILD_SUFFIX, key)
+        else:
+            pipe.delete(key)
+    for tier_id in old_tiers - tier_ids:
+        pipe.delete(tier_key(tier_id))
+    pipe.delete(TIERS_KEY)
+    if tier_ids:
+        pipe.sadd(TIERS_KEY, *tier_ids)
+    pipe.execute()
+    return len(addresses)
+
+
+def top(limit, offset=0, tier_id=None, key=None, redis_client=None):
+    """
+    [(address, score)] of ranks offset+1 .. offset+limit, highest first, on
+    the stake board (of a tier) or the given key (REWARDS_KEY).
+    """
+    client = redis_client or get_redis()
+    return [
+        (address.decode(), value)
+        for address, value in client.zrevrange(key or board_key(tier_id), offset, offset + limit - 1, withscores=True)
+    ]
+
+
+def rank(address, tier_id=None, redis_client=None):
+    """(1-based rank, board size) of an address, rank None when it has no active stake."""
+    client = redis_client or get_redis()
+    pipe = client.pipeline(transaction=False)
+    pipe.zrevrank(board_key(tier_id), address.lower())
+    pipe.zcard(board_key(tier_id))
+    position, size = pipe.execute()
+    return (position + 1 if position is not None else None), size
+
+
+def describe(addresses, tier_id=None, database=db):
+    """Exact wei totals, active stake counts and rewards of a page of addresses (two queries)."""
+    stakes = active_stakes_by_user(addresses, database, tier_id)
+    rewards = rewards_by_user(addresses, database)
+    details = {}
+    for address in addresses:
+        tiers = stakes.get(address, {})
+        details[address] = {
+            'total_staked': sum(amount for amount, _ in tiers.values()),
+            'active_stakes': sum(count for _, count in tiers.values()),
+            'rewards_claimed': rewards.get(address, 0)
+        }
+    return details
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Staker leaderboards in Redis')
+    parser.add_argument('command', choices=['rebuild'])
+    parser.parse_args()
+
+    logger.info(f"Seeded leaderboards with {rebuild()} addresses")
+
+
+if __name__ == '__main__':
+    main()
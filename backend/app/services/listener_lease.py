@@ -0,0 +1,148 @@
+# backend/app/services/listener_lease.py - v1.1
+"""
+Active/standby coordination of listener replicas through a Redis lease.
+
+Per pool, one Redis key holds the current leader's id with a short TTL
+(LISTENER_LEASE_TTL seconds); the leader renews it every TTL/3 and standbys
+retry acquiring it, so a crashed leader is replaced within about one TTL.
+
+Every acquisition also takes a fencing token: a per-pool counter in Redis
+that only ever grows. The leader stamps its token on the checkpoint document
+and only writes the checkpoint while the stored token is not newer than its
+own (see BlockchainListener.save_last_processed_block). A leader that lost
+the lease without noticing (long GC pause, network partition) is therefore
+fenced off and cannot move the checkpoint after its successor has claimed
+it; the events it may still have written are idempotent replays.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from app.utils.redis_client import get_redis
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+# SET NX PX and, on success, INCR the fencing counter, atomically
+ACQUIRE_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return redis.call('INCR', KEYS[2])
+end
+return false
+"""
+
+# Extend / delete the lease only while we still own it
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class LeaseLostError(Exception):
+    """The listener's fencing token is no longer the current one."""
+
+
+class ListenerLease:
+    def __init__(self, pool, ttl=None, redis_client=None):
+        self.redis = redis_client or get_redis()
+        self.ttl = ttl or config.LISTENER_LEASE_TTL
+        self.lease_key = f"listener:lease:{pool}"
+        self.token_key = f"listener:lease:{pool}:token"
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self.token = None
+        self.expires_at = 0.0
+
+        self._acquire = self.redis.register_script(ACQUIRE_SCRIPT)
+        self._renew = self.redis.register_script(RENEW_SCRIPT)
+        self._release = self.redis.register_script(RELEASE_SCRIPT)
+        self._renewer = None
+
+    @property
+    def held(self):
+        """
+        True while the lease is ours. Judged from our own clock (last
+        successful renewal + TTL, minus a margin), so an unreachable Redis
+        means giving up leadership rather than assuming it.
+        """
+        return self.token is not None and time.monotonic() < self.expires_at - self.ttl * 0.1
+
+    def try_acquire(self):
+        started_at = time.monotonic()
+        token = self._acquire(keys=[self.lease_key, self.token_key], args=[self.holder, int(self.ttl * 1000)])
+        if token is None:
+            return False
+        self.token = int(token)
+        self.expires_at = started_at + self.ttl
+        return True
+
+    def wait_until_acquired(self):
+        """Block as a standby until this replica becomes the leader."""
+        logger.info(f"Waiting for lease {self.lease_key} ({self.holder})")
+        while True:
+            try:
+                if self.try_acquire():
+                    break
+            except Exception as e:
+                logger.error(f"Lease acquire failed: {str(e)}")
+            time.sleep(max(self.ttl / 5, 0.5))
+
+        logger.info(f"Acquired lease {self.lease_key} with fencing token {self.token}")
+        self._start_renewer()
+
+    def try_hold(self):
+        """try_acquire() once and keep renewing on success; for one-off tools (backfill)."""
+        if not self.try_acquire():
+            return False
+        logger.info(f"Acquired lease {self.lease_key} with fencing token {self.token}")
+        self._start_renewer()
+        return True
+
+    def renew(self):
+        started_at = time.monotonic()
+        if self._renew(keys=[self.lease_key], args=[self.holder, int(self.ttl * 1000)]):
+            self.expires_at = started_at + self.ttl
+            return True
+        return False
+
+    def _renew_forever(self, token):
+        # Stops when the lease is lost or re-acquired under a new token
+        while self.token == token:
+            time.sleep(self.ttl / 3)
+            try:
+                if not self.renew():
+                    logger.warning(f"Lease {self.lease_key} taken over, stepping down")
+                    self.token = None
+            except Exception as e:
+                logger.error(f"Lease renewal failed: {str(e)}")
+            if self.token == token and not self.held:
+                logger.warning(f"Lease {self.lease_key} expired, stepping down")
+                self.token = None
+
+    def _start_renewer(self):
+        self._renewer = threading.Thread(
+            target=self._renew_forever,
+            args=(self.token,),
+            name=f'lease-{self.lease_key}',
+            daemon=True
+        )
+        self._renewer.start()
+
+    def release(self):
+        if self.token is None:
+            return
+        self.token = None
+        try:
+            self._release(keys=[self.lease_key], args=[self.holder])
+        except Exception as e:
+            logger.error(f"Lease release failed: {str(e)}")
@@ -0,0 +1,108 @@
+# backend/app/services/migrate_amounts.py - v1.1
+"""
+One-shot conversion of stored token amounts to Decimal128.
+
+Amounts used to be stored as int64 when they fit and as decimal strings
+otherwise, so $sum silently skipped every large value. Decimal128 holds any
+amount up to 34 digits exactly, which lets the aggregations sum natively.
+
+Converts in place, with a server-side $toDecimal pipeline update per field;
+documents already holding a Decimal128 are left alone, so the command is
+idempotent and safe to re-run (e.g. after a listener that still ran the old
+code wrote a few more documents). undo_journal entries only cover the last
+CONFIRMATION_DEPTH blocks and are read back through decode_amount, which
+accepts both encodings; they are not converted.
+
+Legacy strings longer than Decimal128's 34 exact digits are not converted
+($toDecimal would round them): they are left as strings, which
+decode_amount still reads, and reported with their _id for manual review.
+
+Usage:
+    python -m app.services.migrate_amounts [--dry-run]
+"""
+import argparse
+import logging
+from app.models import db
+from app.utils.mongodb_helpers import MAX_AMOUNT_DIGITS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+AMOUNT_FIELDS = {
+    'stakes': ('amount', 'total_rewards_claimed', 'unstake_amount', 'unstake_rewards', 'emergency_amount'),
+    'users': ('total_staked', 'total_rewards_claimed'),
+    'raw_events': ('args.amount', 'args.rewards'),
+}
+
+
+# _ids of unconvertible values listed per field
+REPORT_LIMIT = 20
+
+
+def legacy_filter(field):
+    return {field: {'$exists': True, '$not': {'$type': ['decimal', 'null']}}}
+
+
+def too_long(field):
+    """Aggregation expression: the field is a decimal string of more than MAX_AMOUNT_DIGITS digits."""
+    value = f'${field}'
+    return {'$cond': [
+        {'$eq': [{'$type': value}, 'string']},
+        {'$gt': [{'$strLenCP': {'$ltrim': {'input': value, 'chars': '-0'}}}, MAX_AMOUNT_DIGITS]},
+        False
+    ]}
+
+
+def report_too_long(collection, field):
+    """Log the legacy strings $toDecimal cannot hold exactly; returns their count."""
+    query = {**legacy_filter(field), '$expr': too_long(field)}
+    count = collection.count_documents(query)
+    if count:
+        ids = [doc['_id'] for doc in collection.find(query, {'_id': 1}).limit(REPORT_LIMIT)]
+        logger.warning(
+            f"Skipped {count} {collection.name}.{field} values over {MAX_AMOUNT_DIGITS} digits "
+            f"(left as strings), e.g. _id {ids}"
+        )
+    return count
+
+
+def migrate_amounts(database=db, dry_run=False):
+    """
+    Convert every int/string amount to Decimal128; returns
+    {collection.field: count}, with the skipped over-long strings under
+    'collection.field skipped'.
+    """
+    counts = {}
+    for name, fields in AMOUNT_FIELDS.items():
+        for field in fields:
+            skipped = report_too_long(database[name], field)
+            if skipped:
+                counts[f'{name}.{field} skipped'] = skipped
+            query = {**legacy_filter(field), '$expr': {'$not': [too_long(field)]}}
+            if dry_run:
+                count = database[name].count_documents(query)
+            else:
+                count = database[name].update_many(
+                    query, [{'$set': {field: {'$toDecimal': f'${field}'}}}]
+                ).modified_count
+            counts[f'{name}.{field}'] = count
+            if count:
+                logger.info(f"{'Would convert' if dry_run else 'Converted'} {count} {name}.{field} values")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert stored token amounts to Decimal128')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the values to convert')
+    args = parser.parse_args()
+
+    counts = migrate_amounts(dry_run=args.dry_run)
+    converted = sum(count for key, count in counts.items() if not key.endswith(' skipped'))
+    logger.info(f"{converted} amount values {'to convert' if args.dry_run else 'converted'}")
+    skipped = sum(counts.values()) - converted
+    if skipped:
+        logger.warning(f"{skipped} amount values left as strings, see the warnings above")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+# backend/app/services/pool_listeners.py - v1.2
+"""
+Multi-pool listener: runs one BlockchainListener per configured pool (POOLS),
+spread over LISTENER_PROCESSES processes by consistent hashing of the pool
+keys (see app.utils.pools).
+
+Each process runs its pools' listeners in threads (they mostly wait on RPC
+and MongoDB) and serves their metrics on LISTENER_METRICS_PORT + process
+index. The supervisor restarts a process that dies. To spread one
+deployment over several hosts, give every host the same POOLS and
+LISTENER_PROCESSES and the process indexes it should run.
+
+Data written before multi-pool support has no pool tag; `migrate` (also run
+on startup) tags it with the default CHAIN_ID / STAKING_POOL_ADDRESS pool,
+and seeds pool_stats for pools that have stakes but no stats document yet.
+`migrate` also stamps block_time on raw events stored before it was
+recorded (batched header lookups against each pool's RPC), which the
+projection rebuild and Stake timestamps rely on; not run on startup.
+
+Usage:
+    python -m app.services.pool_listeners run [--processes N] [--process-index I ...]
+    python -m app.services.pool_listeners assignments [--processes N]
+    python -m app.services.pool_listeners migrate
+"""
+import argparse
+import logging
+import multiprocessing
+import threading
+import time
+from datetime import datetime
+from pymongo import UpdateMany
+from app.models import db
+from app.models.pool_stats import PoolStats
+from app.services.blockchain_listener import BlockchainListener
+from app.utils.pools import assign_pools, configured_pools, default_pool, pool_by_key
+from app.utils.web3_utils import get_pool_manager
+from app.utils.prometheus_metrics import start_metrics_server
+from app.config import config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Collections whose documents carry the pool key
+POOL_TAGGED_COLLECTIONS = ('raw_events', 'stakes', 'users', 'failed_ranges', 'block_coverage')
+
+# Seconds between liveness checks of the listener processes
+SUPERVISE_INTERVAL = 5
+
+
+def migrate_legacy_data(database=db):
+    """Tag single-pool data with the default pool key and seed missing pool_stats. Idempotent."""
+    pool = default_pool().key
+    for name in POOL_TAGGED_COLLECTIONS:
+        result = database[name].update_many({'pool': {'$exists': False}}, {'$set': {'pool': pool}})
+        if result.modified_count:
+            logger.info(f"Tagged {result.modified_count} {name} documents with pool {pool}")
+
+    # Before any listener delta: an empty document would read as TVL = the delta
+    seeded = PoolStats.seed_missing(database['stakes'], database['pool_stats'])
+    if seeded:
+        logger.info(f"Seeded pool_stats from stakes for {', '.join(seeded)}")
+
+    # Journal entries were keyed by block number alone; they only cover the
+    # last CONFIRMATION_DEPTH blocks, so dropping them just skips one rollback window
+    database['undo_journal'].delete_many({'pool': {'$exists': False}})
+
+    # Users are unique per (address, pool) now
+    if 'address_1' in database['users'].index_information():
+        database['users'].drop_index('address_1')
+        logger.info("Dropped unique users.address index")
+
+
+def missing_block_time_query(pool):
+    return {'pool': pool, 'block_time': {'$exists': False}}
+
+
+def fill_block_times(web3, pool, chunk_size=5000, database=db):
+    """Stamp block_time on the pool's raw events stored before it was recorded."""
+    raw_events = database['raw_events']
+    blocks = raw_events.distinct('block_number', missing_block_time_query(pool))
+    for start in range(0, len(blocks), chunk_size):
+        chunk = blocks[start:start + chunk_size]
+        headers = web3.get_block_headers(chunk)
+        raw_events.bulk_write([
+            UpdateMany(
+                {'pool': pool, 'block_number': block_number, 'block_time': {'$exists': False}},
+                {'$set': {'block_time': datetime.utcfromtimestamp(header['timestamp'])}}
+            )
+            for block_number, header in headers.items()
+        ], ordered=False)
+        logger.info(f"[{pool}] Stamped block_time for {start + len(chunk)}/{len(blocks)} blocks")
+
+
+def fill_all_block_times(database=db):
+    """fill_block_times() for every pool with raw events; run after migrate_legacy_data()."""
+    for key in database['raw_events'].distinct('pool'):
+        fill_block_times(get_pool_manager(pool_by_key(key)), key, database=database)
+
+
+def run_process(index, pools):
+    """Entry point of one listener process: a listener thread per pool."""
+    if config.LISTENER_METRICS_PORT:
+        start_metrics_server(config.LISTENER_METRICS_PORT + index)
+
+    threads = []
+    for pool in pools:
+        listener = BlockchainListener(pool)
+        thread = threading.Thread(
+            target=listener.start,
+            kwargs={'serve_metrics': False},
+            name=f'listener-{pool.key}',
+            daemon=True
+        )
+        thread.start()
+        threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+
+
+def supervise(processes, indexes):
+    assignments = assign_pools(configured_pools(), processes)
+    # spawn, not fork: the parent already holds MongoDB and RPC connections
+    context = multiprocessing.get_context('spawn')
+    workers = {}
+
+    def spawn(index):
+        worker = context.Process(
+            target=run_process,
+            args=(index, assignments[index]),
+            name=f'pool-listener-{index}'
+        )
+        worker.start()
+        workers[index] = worker
+
+    for index in indexes:
+        pool_keys = [pool.key for pool in assignments[index]]
+        if not pool_keys:
+            logger.info(f"Process {index}: no pools assigned")
+            continue
+        logger.info(f"Process {index}: {', '.join(pool_keys)}")
+        spawn(index)
+
+    try:
+        while True:
+            time.sleep(SUPERVISE_INTERVAL)
+            for index, worker in list(workers.items()):
+                if not worker.is_alive():
+                    logger.error(f"Listener process {index} exited ({worker.exitcode}), restarting")
+                    spawn(index)
+    except KeyboardInterrupt:
+        logger.info("Listeners stopped by user")
+        for worker in workers.values():
+            worker.terminate()
+        for worker in workers.values():
+            worker.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-pool StakingPool listener')
+    parser.add_argument('command', choices=['run', 'assignments', 'migrate'])
+    parser.add_argument('--processes', type=int, default=config.LISTENER_PROCESSES,
+                        help=f'Listener processes (default: {config.LISTENER_PROCESSES})')
+    parser.add_argument('--process-index', type=int, action='append', default=None,
+                        help='Only run this process index (repeatable, default: all)')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        migrate_legacy_data()
+        fill_all_block_times()
+        return
+
+    if args.command == 'assignments':
+        for index, pools in assign_pools(configured_pools(), args.processes).items():
+            logger.info(f"Process {index}: {', '.join(pool.key for pool in pools) or '-'}")
+        return
+
+    indexes = args.process_index or list(range(args.processes))
+    if any(index < 0 or index >= args.processes for index in indexes):
+        parser.error(f"--process-index must be between 0 and {args.processes - 1}")
+
+    migrate_legacy_data()
+    supervise(args.processes, indexes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+# backend/app/services/range_recovery.py - v1.4
+"""
+Failed-range retry queue and block coverage tracking for the listener.
+
+When a range cannot be fetched, or a single event fails in its handler, the
+listener no longer loses it: the (event, from_block, to_block) range is
+stored in failed_ranges and the listener moves on. Between two ranges the
+listener loop re-fetches the due ones with exponential backoff (maintain()),
+so a retry never runs concurrently with a live batch: each batch reads the
+stake states it turns into pool stats deltas after the previous one
+committed. Applying is idempotent and stake writes are order-independent,
+so a late retry converges to the same state as an in-order apply; retried
+blocks still within CONFIRMATION_DEPTH of the head are journaled for reorg
+rollback like any other.
+
+Every committed range is also recorded in block_coverage, so gaps in the
+processed history can be reported. Both collections are scoped to the
+listener's pool.
+
+Usage:
+    python -m app.services.range_recovery coverage   # report gaps and pending retries
+    python -m app.services.range_recovery retry      # retry due ranges once (listener stopped)
+    (add --pool chain_id:address for a pool other than the default one)
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+from app.models import db
+from app.config import config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Compact block_coverage into merged intervals past this many documents
+COVERAGE_COMPACT_THRESHOLD = 1000
+# Fields of a block_coverage document read back
+COVERAGE_FIELDS = {'from_block': 1, 'to_block': 1}
+
+
+def due_query(pool, now):
+    """A pool's failed ranges whose backoff expired by now."""
+    return {'pool': pool, 'next_retry_at': {'$lte': now}}
+
+
+def merge_intervals(intervals):
+    """Merge inclusive (start, end) block intervals that overlap or touch."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(interval) for interval in merged]
+
+
+class RangeRecovery:
+    def __init__(self, listener, database=db):
+        self.listener = listener
+        self.pool = listener.pool_key
+        self.failed_collection = database['failed_ranges']
+        self.coverage_collection = database['block_coverage']
+        self.last_maintenance = None
+
+    def record_failure(self, from_block, to_block, error, event_name=None):
+        """Queue a range (optionally a single event type in it) for retry."""
+        now = datetime.utcnow()
+        self.failed_collection.update_one(
+            {'pool': self.pool, 'from_block': from_block, 'to_block': to_block, 'event_name': event_name},
+            {
+                '$set': {'last_error': str(error), 'updated_at': now},
+                '$setOnInsert': {
+                    'attempts': 0,
+                    'next_retry_at': now + timedelta(seconds=config.RETRY_BASE_DELAY),
+                    'created_at': now
+                }
+            },
+            upsert=True
+        )
+        logger.warning(
+            f"[{self.pool}] Queued blocks {from_block}-{to_block} "
+            f"({event_name or 'all events'}) for retry: {str(error)}"
+        )
+
+    def record_processed(self, from_block, to_block):
+        self.coverage_collection.insert_one({
+            'pool': self.pool,
+            'from_block': from_block,
+            'to_block': to_block,
+            'processed_at': datetime.utcnow()
+        })
+
+    def retry_range(self, doc):
+        """
+        Re-fetch and apply a queued range. Unconfirmed blocks get their undo
+        journal: the whole range is then re-applied, since a block's journal
+        document is rewritten with the batch's events and must list them all
+        (the events that had succeeded are skipped as replays).
+        """
+        from_block, to_block = doc['from_block'], doc['to_block']
+        events = self.listener.fetch_events(from_block, to_block)
+        block_hashes = self.listener.reorg_journal.block_hashes_for(
+            from_block, to_block, self.listener.get_head(), events
+        )
+        if doc.get('event_name') and not block_hashes:
+            events = [e for e in events if e['event'] == doc['event_name']]
+        self.listener.apply_events(events, block_hashes)
+
+    def retry_due(self, limit=10):
+        """Retry ranges whose backoff has expired, oldest blocks first."""
+        now = datetime.utcnow()
+        due = list(self.failed_collection.find(
+            due_query(self.pool, now)
+        ).sort('from_block', 1).limit(limit))
+
+        for doc in due:
+            try:
+                self.retry_range(doc)
+            except Exception as e:
+                attempts = doc.get('attempts', 0) + 1
+                delay = min(config.RETRY_BASE_DELAY * 2 ** attempts, config.RETRY_MAX_DELAY)
+                self.failed_collection.update_one(
+                    {'_id': doc['_id']},
+                    {'$set': {
+                        'attempts': attempts,
+                        'last_error': str(e),
+                        'next_retry_at': datetime.utcnow() + timedelta(seconds=delay),
+                        'updated_at': datetime.utcnow()
+                    }}
+                )
+                logger.error(
+                    f"[{self.pool}] Retry {attempts} of blocks {doc['from_block']}-{doc['to_block']} "
+                    f"failed, next in {delay}s: {str(e)}"
+                )
+                continue
+
+            self.failed_collection.delete_one({'_id': doc['_id']})
+            self.record_processed(doc['from_block'], doc['to_block'])
+            logger.info(f"[{self.pool}] Recovered blocks {doc['from_block']}-{doc['to_block']}")
+
+        return len(due)
+
+    def compact_coverage(self):
+        """Rewrite this pool's block_coverage as merged intervals."""
+        docs = list(self.coverage_collection.find({'pool': self.pool}, COVERAGE_FIELDS))
+        merged = merge_intervals((d['from_block'], d['to_block']) for d in docs)
+        if len(merged) == len(docs):
+            return
+
+        now = datetime.utcnow()
+        self.coverage_collection.insert_many([
+            {'pool': self.pool, 'from_block': start, 'to_block': end, 'processed_at': now}
+            for start, end in merged
+        ])
+        self.coverage_collection.delete_many({'_id': {'$in': [d['_id'] for d in docs]}})
+
+    def coverage_report(self):
+        """Gaps between the pool's start block and the checkpoint, plus ranges awaiting retry."""
+        self.compact_coverage()
+        covered = merge_intervals(
+            (d['from_block'], d['to_block'])
+            for d in self.coverage_collection.find({'pool': self.pool}, COVERAGE_FIELDS)
+        )
+
+        first_block = self.listener.pool.start_block + 1
+        last_block = self.listener.get_last_processed_block()
+        gaps = []
+        cursor = first_block
+        for start, end in covered:
+            if end < cursor:
+                continue
+            if start > cursor:
+                gaps.append((cursor, min(start - 1, last_block)))
+            cursor = max(cursor, end + 1)
+            if cursor > last_block:
+                break
+        if cursor <= last_block:
+            gaps.append((cursor, last_block))
+
+        failed = [
+            {
+                'from_block': d['from_block'],
+                'to_block': d['to_block'],
+                'event_name': d.get('event_name'),
+                'attempts': d.get('attempts', 0),
+                'last_error': d.get('last_error')
+            }
+            for d in self.failed_collection.find({'pool': self.pool}).sort('from_block', 1)
+        ]
+
+        return {
+            'checkpoint': last_block,
+            'gaps': gaps,
+            'failed_ranges': failed
+        }
+
+    def maintain(self):
+        """
+        Retry due ranges and compact coverage, at most every RETRY_INTERVAL.
+        Called by the listener loop between ranges, so retries are serialized
+        with the live batches.
+        """
+        now = time.monotonic()
+        if self.last_maintenance is not None and now - self.last_maintenance < config.RETRY_INTERVAL:
+            return
+        self.last_maintenance = now
+        try:
+            self.retry_due()
+            if self.coverage_collection.count_documents({'pool': self.pool}) > COVERAGE_COMPACT_THRESHOLD:
+                self.compact_coverage()
+        except Exception as e:
+            logger.error(f"[{self.pool}] Error retrying failed ranges: {str(e)}")
+
+
+def main():
+    from app.services.blockchain_listener import BlockchainListener
+    from app.utils.pools import pool_by_key
+
+    parser = argparse.ArgumentParser(description='Listener failed-range retries and coverage')
+    parser.add_argument('command', choices=['coverage', 'retry'])
+    parser.add_argument('--pool', default=None, help='Pool key chain_id:address (default: STAKING_POOL_ADDRESS)')
+    args = parser.parse_args()
+
+    pool = pool_by_key(args.pool) if args.pool else None
+    recovery = BlockchainListener(pool).range_recovery
+    if args.command == 'retry':
+        retried = recovery.retry_due(limit=1000)
+        logger.info(f"Retried {retried} ranges")
+        return
+
+    report = recovery.coverage_report()
+    logger.info(f"Checkpoint: {report['checkpoint']}")
+    for start, end in report['gaps']:
+        logger.info(f"Gap: blocks {start}-{end}")
+    for failed in report['failed_ranges']:
+        logger.info(
+            f"Pending retry: blocks {failed['from_block']}-{failed['to_block']} "
+            f"({failed['event_name'] or 'all events'}), {failed['attempts']} attempts, "
+            f"last error: {failed['last_error']}"
+        )
+    if not report['gaps'] and not report['failed_ranges']:
+        logger.info("No gaps")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+# backend/app/services/rebuild_projections.py - v1.11
+"""
+Offline rebuild of the stakes, users and pool_stats projections from raw_events.
+
+Replays raw_events in (block_number, log_index) order through the listener's
+own handlers into stakes_rebuild / users_rebuild / pool_stats_rebuild with
+bulk writes (the live indexes are copied onto them first, so the
+replay's upserts and stake-state reads are index lookups), then swaps each
+one in with an atomic renameCollection(dropTarget=True) and reseeds the Redis leaderboards. Everything comes from the local
+raw_events collection; the only RPC traffic is stamping block_time on raw
+events stored before that field existed, when python -m
+app.services.pool_listeners migrate has not already done it.
+
+Pools are replayed one after the other, each through a listener for that
+pool so the rebuilt documents keep their pool tag. Raw events from before
+multi-pool support must be tagged first (python -m app.services.pool_listeners
+migrate).
+
+An event the handlers fail on aborts the rebuild before the swap (the live
+projections stay as they are, the *_rebuild collections are left for
+inspection); it is never queued for the listener's range retries.
+
+Stop the listener first (or accept that events it applies during the final
+catch-up pass and the swap can be lost; re-run the rebuild to pick them up).
+
+pool_stats alone can be recomputed from the current stakes collection with
+--pool-stats (one aggregation, no replay; also with the listener stopped),
+e.g. to repair it. Missing pool_stats documents are seeded by python -m
+app.services.pool_listeners migrate, which the listeners run on startup.
+
+Usage:
+    python -m app.services.rebuild_projections [--chunk-size N] [--pool-stats]
+"""
+import argparse
+import calendar
+import logging
+import time
+from bson.decimal128 import Decimal128
+from hexbytes import HexBytes
+from app.models import db
+from app.models.pool_stats import PoolStats
+from app.services.blockchain_listener import BlockchainListener
+from app.services import leaderboard
+from app.services.pool_listeners import fill_block_times
+from app.utils.mongodb_helpers import decode_amount
+from app.utils.pools import pool_by_key
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROJECTIONS = ('stakes', 'users', 'pool_stats')
+REBUILD_SUFFIX = '_rebuild'
+
+
+def raw_event_to_event(doc):
+    """
+    Turn a raw_events document back into the event shape the handlers expect.
+
+    Amount args are Decimal128 (legacy data: int or decimal string), or
+    the exact value under amount_overflow when they were stored clamped;
+    addresses are 0x-prefixed, so any all-digit string is a number.
+    """
+    args = {
+        key: decode_amount(value) if isinstance(value, Decimal128) or (isinstance(value, str) and value.isdigit())
+        else value
+        for key, value in doc['args'].items()
+    }
+    args.update((key, int(value)) for key, value in doc.get('amount_overflow', {}).items())
+    return {
+        'event': doc['event_name'],
+        'args': args,
+        'transactionHash': HexBytes(doc['transaction_hash']),
+        'blockNumber': doc['block_number'],
+        'logIndex': doc['log_index'],
+        'blockTime': calendar.timegm(doc['block_time'].utctimetuple())
+    }
+
+
+# raw_events stored before events were tagged with their pool
+UNTAGGED_QUERY = {'pool': {'$exists': False}}
+
+
+def replay_query(pool, after_key=None):
+    """A pool's raw events after (block_number, log_index) after_key."""
+    query = {'pool': pool}
+    if after_key is not None:
+        block_number, log_index = after_key
+        query['$or'] = [
+            {'block_number': {'$gt': block_number}},
+            {'block_number': block_number, 'log_index': {'$gt': log_index}}
+        ]
+    return query
+
+
+def copy_indexes(source, target):
+    for name, info in source.index_information().items():
+        if name == '_id_':
+            continue
+        target.create_index(info['key'], name=name, unique=info.get('unique', False))
+
+
+def replay(listener, after_key, chunk_size, failures):
+    """
+    Replay the listener's pool raw events after (block_number, log_index)
+    after_key into the rebuild collections. Events the handlers fail on are
+    appended to failures as (pool, block_number, event_name, error).
+    Returns the last replayed key and event count.
+    """
+    cursor = db['raw_events'].find(replay_query(listener.pool_key, after_key)).sort([('block_number', 1), ('log_index', 1)])
+    replayed = 0
+    chunk = []
+
+    def record_failure(from_block, to_block, error, event_name=None):
+        failures.append((listener.pool_key, from_block, event_name, str(error)))
+
+    def flush():
+        batch = listener.build_batch(
+            [raw_event_to_event(doc) for doc in chunk],
+            stakes=db['stakes' + REBUILD_SUFFIX],
+            failure_sink=record_failure
+        )
+        for collection_name, ops, ordered in batch.projection_plan(batch.entries):
+            db[collection_name + REBUILD_SUFFIX].bulk_write(ops, ordered=ordered)
+
+    for doc in cursor:
+        chunk.append(doc)
+        after_key = (doc['block_number'], doc['log_index'])
+        if len(chunk) >= chunk_size:
+            flush()
+            replayed += len(chunk)
+            chunk = []
+            logger.info(f"[{listener.pool_key}] Replayed {replayed} events (block {after_key[0]})")
+
+    if chunk:
+        flush()
+        replayed += len(chunk)
+
+    return after_key, replayed
+
+
+def rebuild(chunk_size):
+    started_at = time.time()
+
+    if db['raw_events'].count_documents(UNTAGGED_QUERY, limit=1):
+        logger.error("raw_events has untagged events: run python -m app.services.pool_listeners migrate first")
+        return
+
+    listeners = [BlockchainListener(pool_by_key(key)) for key in db['raw_events'].distinct('pool')]
+    # Normally done by python -m app.services.pool_listeners migrate
+    for listener in listeners:
+        fill_block_times(listener.web3, listener.pool_key, chunk_size)
+
+    for name in PROJECTIONS:
+        db.drop_collection(name + REBUILD_SUFFIX)
+        db.create_collection(name + REBUILD_SUFFIX)
+        # Before the replay: its stake upserts and state reads go through them
+        copy_indexes(db[name], db[name + REBUILD_SUFFIX])
+
+    total = 0
+    failures = []
+    for listener in listeners:
+        last_key, replayed = replay(listener, None, chunk_size, failures)
+        total += replayed
+
+        # Catch up on events the listener stored while the main pass ran
+        while replayed:
+            last_key, replayed = replay(listener, last_key, chunk_size, failures)
+            total += replayed
+
+    if failures:
+        for pool, block_number, event_name, error in failures:
+            logger.error(f"[{pool}] {event_name} at block {block_number} failed to replay: {error}")
+        logger.error(
+            f"Rebuild aborted: {len(failures)} events failed, projections left untouched "
+            f"(partial results in the {REBUILD_SUFFIX} collections)"
+        )
+        return
+
+    if not total:
+        logger.info("No raw events to replay, projections left untouched")
+        return
+
+    for name in PROJECTIONS:
+        db[name + REBUILD_SUFFIX].rename(name, dropTarget=True)
+        logger.info(f"Swapped in rebuilt {name}")
+
+    try:
+        logger.info(f"Reseeded leaderboards with {leaderboard.rebuild()} addresses")
+    except Exception as e:
+        logger.error(f"Leaderboard reseed failed, run python -m app.services.leaderboard rebuild: {str(e)}")
+
+    logger.info(f"Rebuild complete: {total} events in {time.time() - started_at:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild stakes/users from raw_events')
+    parser.add_argument('--chunk-size', type=int, default=5000,
+                        help='Events per bulk write (default: 5000)')
+    parser.add_argument('--pool-stats', action='store_true',
+                        help='Only recompute pool_stats from the stakes collection')
+    args = parser.parse_args()
+
+    if args.pool_stats:
+        logger.info(f"Recomputed pool_stats for {PoolStats.recompute()} pools")
+        return
+    rebuild(args.chunk_size)
+
+
+if __name__ == '__main__':
+    main()
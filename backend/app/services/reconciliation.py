@@ -0,0 +1,284 @@
+# backend/app/services/reconciliation.py - v1.4
+"""
+Chain-vs-database reconciliation of the stakes and users projections.
+
+The projections can drift from the contract: counters written before the
+Decimal128 amount encoding skipped every delta outside int64, and a lost
+event leaves a stake behind.
+This job reads each user's on-chain state and corrects the documents.
+
+Users are walked per pool in _id order, RECONCILE_CHUNK_SIZE at a time. For
+a chunk, every view call is batched through Multicall3
+(RECONCILE_MULTICALL_SIZE calls per eth_call), pinned to the pool's listener
+checkpoint so the chain and the projections describe the same block:
+
+    userTotalStaked(user), getUserStakeCount(user)   one call each per user
+    getUserStake(user, i)                            one call per stake
+
+Corrections only apply if the document's updated_at is unchanged, so a
+concurrent listener write always wins. Users with events after the
+checkpoint are skipped until the next run. Stake corrections are written
+one by one so that each one that lands also moves pool_stats
+(app.models.pool_stats) by the same difference; drift is rare, user
+corrections stay bulk-written. Users with corrected stakes are re-scored
+on the leaderboards (app.services.leaderboard).
+
+Not corrected, only reported: stakes on chain but missing in the database
+(they need their StakeCreated event, e.g. via range recovery), stakes in the
+database but not on chain, and stakes the chain shows inactive but the
+database active (an Unstaked and an EmergencyWithdraw look the same on chain).
+users.total_rewards_claimed has no on-chain counterpart and is not checked.
+
+Runs as the tasks.reconcile_chain_state Celery task (hourly), or:
+    python -m app.services.reconciliation [--pool chain_id:address] [--dry-run]
+"""
+import argparse
+import logging
+from collections import Counter
+from datetime import datetime
+from pymongo import UpdateOne
+from web3 import Web3
+from app.models import db, pool_stats_collection, stakes_collection, users_collection
+from app.models.pool_stats import PoolStats
+from app.models.stake import Stake
+from app.services.leaderboard import refresh_addresses
+from app.utils.mongodb_helpers import decode_amount, encode_amount
+from app.config import config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Unresolved differences kept in a summary as examples
+SAMPLE_SIZE = 20
+# Fields of a user document compared with the chain
+USER_PROJECTION = {'address': 1, 'total_staked': 1, 'active_stakes_count': 1, 'updated_at': 1}
+
+
+def new_summary(pool_key):
+    return {
+        'pool': pool_key,
+        'users_checked': 0,
+        'stakes_checked': 0,
+        'users_drifted': 0,
+        'stakes_drifted': 0,
+        'corrected': 0,
+        'skipped_in_flux': 0,
+        'missing_stakes': 0,
+        'orphan_stakes': 0,
+        'unresolved_status': 0,
+        'fields': Counter(),
+        'samples': []
+    }
+
+
+def batched_calls(manager, calls, block_number):
+    """Results of view calls, RECONCILE_MULTICALL_SIZE per multicall, all at one block."""
+    results = []
+    size = config.RECONCILE_MULTICALL_SIZE
+    for start in range(0, len(calls), size):
+        results.extend(manager.multicall(calls[start:start + size], block_identifier=block_number))
+    return results
+
+
+def users_chunk_query(pool_key, last_id=None):
+    """The pool's user documents after _id last_id (chunks are read in _id order)."""
+    query = {'pool': pool_key}
+    if last_id is not None:
+        query['_id'] = {'$gt': last_id}
+    return query
+
+
+def in_flux_query(pool_key, addresses, block_number):
+    return {
+        'pool': pool_key,
+        'block_number': {'$gt': block_number},
+        'args.user': {'$in': [Web3.to_checksum_address(a) for a in addresses]}
+    }
+
+
+def users_in_flux(pool_key, addresses, block_number):
+    """Users with raw events after block_number: the projections are ahead of the chain read."""
+    return {
+        address.lower()
+        for address in db['raw_events'].distinct('args.user', in_flux_query(pool_key, addresses, block_number))
+    }
+
+
+def _note(summary, kind, **details):
+    if len(summary['samples']) < SAMPLE_SIZE:
+        summary['samples'].append(dict(details, kind=kind))
+
+
+def compare_stake(doc, chain_stake, now):
+    """$set fixing a stake document from its on-chain struct, or None if nothing to fix."""
+    amount, start_time, last_reward_claim, tier_id, active = chain_stake
+    fixes = {}
+    if decode_amount(doc.get('amount')) != amount:
+        fixes['amount'] = encode_amount(amount)
+    if doc.get('tier_id') != tier_id:
+        fixes['tier_id'] = tier_id
+    if doc.get('start_time') != start_time:
+        fixes['start_time'] = start_time
+    if active and doc.get('last_reward_claim') != last_reward_claim:
+        fixes['last_reward_claim'] = last_reward_claim
+    if active and doc.get('status') != 'active':
+        fixes['status'] = 'active'
+    if not fixes:
+        return None
+    fixes['updated_at'] = now
+    return fixes
+
+
+def stake_state(doc):
+    """A stake document as a pool stats contribution (see PoolStats.contribution)."""
+    return {'status': doc.get('status'), 'tier_id': doc.get('tier_id'), 'amount': decode_amount(doc.get('amount'))}
+
+
+def apply_stake_fixes(pool_key, fixes_by_doc):
+    """Write stake corrections and move pool_stats by the ones that applied; returns their count."""
+    corrected = 0
+    stats_increments = {}
+    for doc, fixes in fixes_by_doc:
+        result = stakes_collection.update_one({'_id': doc['_id'], 'updated_at': doc.get('updated_at')}, {'$set': fixes})
+        if not result.modified_count:
+            continue
+        corrected += 1
+        for field, value in PoolStats.delta(stake_state(doc), stake_state(dict(doc, **fixes))).items():
+            stats_increments[field] = stats_increments.get(field, 0) + value
+
+    stats_increments = {field: value for field, value in stats_increments.items() if value}
+    if stats_increments:
+        pool_stats_collection.bulk_write([PoolStats.increments_op(pool_key, stats_increments)])
+    return corrected
+
+
+def reconcile_chunk(listener, users, summary, dry_run=False):
+    manager = listener.web3
+    contract = manager.staking_pool
+    pool_key = listener.pool_key
+    block_number = listener.get_last_processed_block()
+    now = datetime.utcnow()
+
+    addresses = [user['address'] for user in users]
+    checksummed = [Web3.to_checksum_address(address) for address in addresses]
+
+    per_user = batched_calls(
+        manager,
+        [contract.functions.userTotalStaked(a) for a in checksummed] +
+        [contract.functions.getUserStakeCount(a) for a in checksummed],
+        block_number
+    )
+    totals = dict(zip(addresses, per_user[:len(users)]))
+    counts = dict(zip(addresses, per_user[len(users):]))
+
+    stake_keys = [(address, index) for address in addresses for index in range(counts[address])]
+    chain_stakes = dict(zip(stake_keys, batched_calls(
+        manager,
+        [contract.functions.getUserStake(Web3.to_checksum_address(a), i) for a, i in stake_keys],
+        block_number
+    )))
+
+    db_stakes = {
+        (doc['user_address'], doc['stake_index']): doc
+        for doc in stakes_collection.find(Stake.pool_users_query(pool_key, addresses))
+    }
+    in_flux = users_in_flux(pool_key, addresses, block_number)
+
+    stake_fixes = []
+    for key, chain_stake in chain_stakes.items():
+        if key[0] in in_flux:
+            continue
+        summary['stakes_checked'] += 1
+        doc = db_stakes.get(key)
+        if doc is None:
+            summary['missing_stakes'] += 1
+            _note(summary, 'missing_stake', user=key[0], stake_index=key[1], block=block_number)
+            continue
+
+        active = chain_stake[4]
+        if not active and doc.get('status') == 'active':
+            summary['unresolved_status'] += 1
+            _note(summary, 'inactive_on_chain', user=key[0], stake_index=key[1], block=block_number)
+
+        fixes = compare_stake(doc, chain_stake, now)
+        if fixes:
+            summary['stakes_drifted'] += 1
+            summary['fields'].update(f"stake_{field}" for field in fixes if field != 'updated_at')
+            stake_fixes.append((doc, fixes))
+
+    for key in db_stakes.keys() - chain_stakes.keys():
+        if key[0] not in in_flux:
+            summary['orphan_stakes'] += 1
+            _note(summary, 'orphan_stake', user=key[0], stake_index=key[1], block=block_number)
+
+    active_counts = Counter(address for (address, _), chain_stake in chain_stakes.items() if chain_stake[4])
+    user_ops = []
+    for user in users:
+        address = user['address']
+        if address in in_flux:
+            summary['skipped_in_flux'] += 1
+            continue
+        summary['users_checked'] += 1
+
+        active_count = active_counts[address]
+        fixes = {}
+        if decode_amount(user.get('total_staked')) != totals[address]:
+            fixes['total_staked'] = encode_amount(totals[address])
+        if user.get('active_stakes_count', 0) != active_count:
+            fixes['active_stakes_count'] = active_count
+        if fixes:
+            summary['users_drifted'] += 1
+            summary['fields'].update(f"user_{field}" for field in fixes)
+            fixes['updated_at'] = now
+            user_ops.append(UpdateOne({'_id': user['_id'], 'updated_at': user.get('updated_at')}, {'$set': fixes}))
+
+    if dry_run:
+        return
+    summary['corrected'] += apply_stake_fixes(pool_key, stake_fixes)
+    if user_ops:
+        summary['corrected'] += users_collection.bulk_write(user_ops, ordered=False).modified_count
+    if stake_fixes:
+        refresh_addresses({doc['user_address'] for doc, _ in stake_fixes})
+
+
+def reconcile_pool(pool=None, dry_run=False):
+    """Reconcile one pool's users and stakes; returns its drift summary."""
+    from app.services.blockchain_listener import BlockchainListener
+
+    listener = BlockchainListener(pool)
+    summary = new_summary(listener.pool_key)
+    last_id = None
+    while True:
+        users = list(
+            users_collection.find(users_chunk_query(listener.pool_key, last_id), USER_PROJECTION)
+            .sort('_id', 1).limit(config.RECONCILE_CHUNK_SIZE)
+        )
+        if not users:
+            break
+        last_id = users[-1]['_id']
+
+        reconcile_chunk(listener, users, summary, dry_run)
+        logger.info(
+            f"[{listener.pool_key}] Reconciled {summary['users_checked']} users: "
+            f"{summary['users_drifted']} users / {summary['stakes_drifted']} stakes drifted"
+        )
+
+    summary['fields'] = dict(summary['fields'])
+    return summary
+
+
+def main():
+    from app.utils.pools import pool_by_key
+
+    parser = argparse.ArgumentParser(description='Reconcile stakes/users with on-chain state')
+    parser.add_argument('--pool', default=None, help='Pool key chain_id:address (default: STAKING_POOL_ADDRESS)')
+    parser.add_argument('--dry-run', action='store_true', help='Report drift without correcting it')
+    args = parser.parse_args()
+
+    summary = reconcile_pool(pool_by_key(args.pool) if args.pool else None, dry_run=args.dry_run)
+    for field, value in summary.items():
+        logger.info(f"{field}: {value}")
+
+
+if __name__ == '__main__':
+    main()
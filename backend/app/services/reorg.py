@@ -0,0 +1,154 @@
+# backend/app/services/reorg.py - v1.6
+"""
+Reorg detection and incremental rollback for the listener.
+
+Blocks within CONFIRMATION_DEPTH of the head can still be reorged away.
+For those blocks EventBatch writes an undo journal (collection
+undo_journal, one document per block: its hash plus, per event, how to
+revert its stake change, user counters and pool stats). Before each range the listener
+compares the hash of its last journaled block with the chain; on mismatch
+it walks back to the fork point, reverts the journaled blocks above it in
+reverse order, deletes their raw events and rewinds the checkpoint, so only
+the reorged blocks are re-applied. Journal entries are pruned once their
+block is CONFIRMATION_DEPTH deep.
+
+Each listener has its own journal, scoped to its pool.
+"""
+import logging
+from app.models import db
+from app.models.pool_stats import PoolStats
+from app.models.stake import Stake
+from app.models.user import User
+from app.utils.mongodb_helpers import decode_amount
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+
+def blocks_query(pool, first=None, last=None):
+    """Filter on a pool's documents of blocks first..last (inclusive, open-ended when None)."""
+    block_number = {}
+    if first is not None:
+        block_number['$gte'] = first
+    if last is not None:
+        block_number['$lte'] = last
+    return {'pool': pool, 'block_number': block_number}
+
+
+class ReorgJournal:
+    def __init__(self, web3, pool, database=db):
+        self.web3 = web3
+        self.pool = pool
+        self.journal_collection = database['undo_journal']
+        self.stakes_collection = database['stakes']
+        self.users_collection = database['users']
+        self.pool_stats_collection = database['pool_stats']
+        self.raw_events_collection = database['raw_events']
+        self.depth = config.CONFIRMATION_DEPTH
+
+    @property
+    def enabled(self):
+        return self.depth > 0
+
+    def unconfirmed_blocks(self, from_block, to_block, head):
+        """Blocks of [from_block, to_block] that are not yet CONFIRMATION_DEPTH deep."""
+        first_unconfirmed = max(from_block, head - self.depth + 1)
+        return range(first_unconfirmed, to_block + 1)
+
+    def block_hashes_for(self, from_block, to_block, head, events):
+        """
+        Hashes to journal for a range, checked against the events' own
+        blockHash so a reorg between eth_getLogs and the header lookup is
+        caught before anything is written.
+        """
+        if not self.enabled:
+            return {}
+
+        hashes = self.web3.get_block_hashes(self.unconfirmed_blocks(from_block, to_block, head))
+        for event in events:
+            expected = hashes.get(event['blockNumber'])
+            if expected is not None and event['blockHash'].hex() != expected:
+                raise RuntimeError(
+                    f"Block {event['blockNumber']} changed while fetching, retrying range"
+                )
+        return hashes
+
+    def find_fork(self, last_block):
+        """
+        Return the first block whose journaled hash no longer matches the
+        chain, or None when the journaled tip is still canonical.
+        """
+        if not self.enabled:
+            return None
+
+        journaled = list(self.journal_collection.find(
+            blocks_query(self.pool, last=last_block),
+            {'block_number': 1, 'block_hash': 1}
+        ).sort('block_number', -1))
+        if not journaled:
+            return None
+
+        # Hashes chain, so a matching tip means every block below matches too
+        canonical = self.web3.get_block_hashes([doc['block_number'] for doc in journaled])
+        fork_block = None
+        for doc in journaled:
+            if canonical[doc['block_number']] == doc['block_hash']:
+                break
+            fork_block = doc['block_number']
+        else:
+            logger.error(
+                f"Reorg deeper than CONFIRMATION_DEPTH ({self.depth}) below block "
+                f"{fork_block}: rolling back the journaled part only, a rebuild is required"
+            )
+
+        return fork_block
+
+    def rollback(self, fork_block):
+        """Revert every journaled block >= fork_block, newest event first; returns the users touched."""
+        journal = list(self.journal_collection.find(
+            blocks_query(self.pool, first=fork_block)
+        ).sort('block_number', -1))
+
+        stake_ops = []
+        user_increments = {}
+        stats_increments = {}
+        event_count = 0
+        for doc in journal:
+            for event in reversed(doc['events']):
+                event_count += 1
+                for spec in reversed(event['stake_undo']):
+                    stake_ops.append(Stake.undo_op(spec))
+                for address, increments in event['user_undo'].items():
+                    merged = user_increments.setdefault(address, {})
+                    for field, value in increments.items():
+                        merged[field] = merged.get(field, 0) + decode_amount(value)
+                for field, value in event.get('stats_undo', {}).items():
+                    stats_increments[field] = stats_increments.get(field, 0) + decode_amount(value)
+
+        if stake_ops:
+            self.stakes_collection.bulk_write(stake_ops, ordered=True)
+        if user_increments:
+            self.users_collection.bulk_write(
+                [
+                    User.increments_op(address, increments, self.pool)
+                    for address, increments in user_increments.items()
+                ],
+                ordered=False
+            )
+        stats_increments = {field: value for field, value in stats_increments.items() if value}
+        if stats_increments:
+            self.pool_stats_collection.bulk_write([PoolStats.increments_op(self.pool, stats_increments)])
+
+        self.raw_events_collection.delete_many(blocks_query(self.pool, first=fork_block))
+        self.journal_collection.delete_many(blocks_query(self.pool, first=fork_block))
+        self.web3.forget_block_headers(fork_block)
+
+        logger.warning(
+            f"Rolled back {len(journal)} blocks ({event_count} events) from block {fork_block}"
+        )
+        return set(user_increments)
+
+    def prune(self, head):
+        """Drop journal entries for blocks that are now final."""
+        if self.enabled:
+            self.journal_collection.delete_many(blocks_query(self.pool, last=head - self.depth))
@@ -1,28 +1,116 @@
-# backend/app/tasks/analytics_tasks.py - v4.3
+# backend/app/tasks/analytics_tasks.py - v4.11
 import logging
 from datetime import datetime, timedelta
 from app.tasks.celery_app import celery_app
 from app.models.metric import Metric
-from app.models import stakes_collection, users_collection, raw_events_collection
-from app.utils.mongodb_helpers import convert_to_double, convert_uint256_for_mongodb
+from app.models.pool_stats import PoolStats
+from app.models.user import User
+from app.services.leaderboard import rewards_by_user
+from app.models import stakes_collection, raw_events_collection
+from app.utils.mongodb_helpers import convert_uint256_for_mongodb, decode_amount
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def top_users_pipeline(limit=10):
+    """Active stake totals of the `limit` biggest stakers."""
+    return [
+        {'$match': {'status': 'active'}},
+        {
+            '$group': {
+                '_id': '$user_address',
+                'total_staked': {'$sum': '$amount'},
+                'active_stakes': {'$sum': 1}
+            }
+        },
+        {'$sort': {'total_staked': -1}},
+        {'$limit': limit}
+    ]
+
+def stake_totals_pipeline():
+    """Staked amount and rewards claimed over every stake (a whole-collection aggregation)."""
+    return [
+        {
+            '$group': {
+                '_id': None,
+                'total_staked': {'$sum': '$amount'},
+                'total_rewards': {'$sum': '$total_rewards_claimed'}
+            }
+        }
+    ]
+
+def rewards_timeline_pipeline(start_time):
+    """RewardsClaimed amounts and counts per day of block_time since start_time."""
+    return [
+        {
+            '$match': {
+                'event_name': 'RewardsClaimed',
+                'block_time': {'$gte': start_time}
+            }
+        },
+        {
+            '$project': {
+                'date': {
+                    '$dateToString': {
+                        'format': '%Y-%m-%d',
+                        'date': '$block_time'
+                    }
+                },
+                'amount': '$args.rewards'
+            }
+        },
+        {
+            '$group': {
+                '_id': '$date',
+                'total_rewards': {'$sum': '$amount'},
+                'claim_count': {'$sum': 1}
+            }
+        },
+        {'$sort': {'_id': 1}}
+    ]
+
+def activity_heatmap_pipeline(start_time):
+    """Event counts per (day, hour of block_time, event) since start_time."""
+    return [
+        {
+            '$match': {
+                'block_time': {'$gte': start_time},
+                'event_name': {'$in': ['StakeCreated', 'RewardsClaimed', 'Unstaked']}
+            }
+        },
+        {
+            '$project': {
+                'date': {
+                    '$dateToString': {
+                        'format': '%Y-%m-%d',
+                        'date': '$block_time'
+                    }
+                },
+                'hour': {'$hour': '$block_time'},
+                'event_name': 1
+            }
+        },
+        {
+            '$group': {
+                '_id': {
+                    'date': '$date',
+                    'hour': '$hour',
+                    'event': '$event_name'
+                },
+                'count': {'$sum': 1}
+            }
+        },
+        {'$sort': {'_id.date': 1, '_id.hour': 1}}
+    ]
+
 @celery_app.task(name='tasks.snapshot_tvl')
 def snapshot_tvl():
     """Calculate and record Total Value Locked (TVL)"""
     try:
-        # Use convert_to_double to handle mixed int/string types in amount field
-        pipeline = [
-            {'$match': {'status': 'active'}},
-            {'$group': {'_id': None, 'total': {'$sum': convert_to_double('$amount')}}}
-        ]
-
-        result = list(stakes_collection.aggregate(pipeline))
-        tvl = int(result[0]['total']) if result else 0
-
-        active_stakes_count = stakes_collection.count_documents({'status': 'active'})
+        # Maintained by the listener (app.models.pool_stats)
+        stats = PoolStats.get()
+        tvl = stats['tvl']
+        active_stakes_count = stats['stakes']['active']
 
         # Convert large TVL values to MongoDB-safe format (int or string)
         Metric.record(
@@ -45,8 +133,10 @@ def snapshot_tvl():
 def snapshot_users():
     """Calculate and record user statistics"""
     try:
-        total_users = users_collection.count_documents({})
-        active_users = users_collection.count_documents({'active_stakes_count': {'$gt': 0}})
+        # Distinct addresses: users are stored once per pool
+        stats = User.stats()
+        total_users = stats['total_users']
+        active_users = stats['active_users']
         
         Metric.record(
             metric_type='users',
@@ -68,28 +158,16 @@ def snapshot_users():
 def snapshot_tier_distribution():
     """Record stake distribution across tiers"""
     try:
-        # Use convert_to_double to handle mixed int/string types in amount field
-        pipeline = [
-            {'$match': {'status': 'active'}},
-            {
-                '$group': {
-                    '_id': '$tier_id',
-                    'count': {'$sum': 1},
-                    'total_amount': {'$sum': convert_to_double('$amount')}
-                }
-            }
-        ]
-
-        tiers = list(stakes_collection.aggregate(pipeline))
+        tiers = PoolStats.get()['tiers']
 
         tier_data = {}
-        for tier in tiers:
-            tier_data[f'tier_{tier["_id"]}'] = {
+        for tier_id, tier in tiers.items():
+            tier_data[f'tier_{tier_id}'] = {
                 'count': tier['count'],
-                'amount': str(int(tier['total_amount']))
+                'amount': str(tier['amount'])
             }
         
-        total_active = sum(t['count'] for t in tiers)
+        total_active = sum(t['count'] for t in tiers.values())
         
         Metric.record(
             metric_type='tier_distribution',
@@ -114,33 +192,19 @@ def snapshot_top_users():
     """
     try:
         # Aggregate active stakes by user to get accurate total_staked
-        pipeline = [
-            {'$match': {'status': 'active'}},
-            {
-                '$group': {
-                    '_id': '$user_address',
-                    'total_staked': {'$sum': convert_to_double('$amount')},
-                    'active_stakes': {'$sum': 1}
-                }
-            },
-            {'$sort': {'total_staked': -1}},
-            {'$limit': 10}
-        ]
+        aggregated_users = list(stakes_collection.aggregate(top_users_pipeline()))
 
-        aggregated_users = list(stakes_collection.aggregate(pipeline))
-
-        # Enrich with rewards data from users collection
+        # Enrich with rewards data from users collection, one query for all of them
+        rewards = rewards_by_user([agg_user['_id'] for agg_user in aggregated_users])
         top_users_data = []
         for agg_user in aggregated_users:
             user_address = agg_user['_id']
-            user_doc = users_collection.find_one({'address': user_address})
-
-            total_staked_int = int(agg_user['total_staked'])
+            total_staked_int = decode_amount(agg_user['total_staked'])
 
             top_users_data.append({
                 'address': user_address,
                 'total_staked': str(total_staked_int),
-                'rewards_claimed': str(user_doc.get('total_rewards_claimed', 0)) if user_doc else '0',
+                'rewards_claimed': str(rewards.get(user_address, 0)),
                 'active_stakes': agg_user['active_stakes']
             })
 
@@ -166,22 +230,11 @@ def snapshot_top_users():
 def calculate_effective_apy():
     """Calculate effective APY based on actual rewards distributed"""
     try:
-        # Use convert_to_double to handle mixed int/string types
-        pipeline = [
-            {
-                '$group': {
-                    '_id': None,
-                    'total_staked': {'$sum': convert_to_double('$amount')},
-                    'total_rewards': {'$sum': convert_to_double('$total_rewards_claimed')}
-                }
-            }
-        ]
+        result = list(stakes_collection.aggregate(stake_totals_pipeline()))
+        total_staked = decode_amount(result[0]['total_staked']) if result else 0
 
-        result = list(stakes_collection.aggregate(pipeline))
-
-        if result and result[0]['total_staked'] > 0:
-            total_staked = int(result[0]['total_staked'])
-            total_rewards = int(result[0]['total_rewards'])
+        if total_staked > 0:
+            total_rewards = decode_amount(result[0]['total_rewards'])
             
             effective_apy = (total_rewards / total_staked) * 100 if total_staked > 0 else 0
             
@@ -205,17 +258,17 @@ def calculate_effective_apy():
         logger.error(f"❌ Effective APY calculation failed: {str(e)}")
         return {'status': 'error', 'message': str(e)}
 
-@celery_app.task(name='tasks.cleanup_old_metrics')
-def cleanup_old_metrics():
-    """Delete metrics older than 30 days"""
+@celery_app.task(name='tasks.rollup_metrics')
+def rollup_metrics():
+    """Roll raw metrics up into the hourly and daily tiers (expiry is left to the time-series TTLs)"""
     try:
-        deleted_count = Metric.cleanup_old(days=30)
+        written = Metric.rollup_all()
         
-        logger.info(f"✅ Cleanup: Deleted {deleted_count} old metrics")
-        return {'status': 'success', 'deleted': deleted_count}
+        logger.info(f"✅ Rollup: {written}")
+        return {'status': 'success', 'written': written}
     
     except Exception as e:
-        logger.error(f"❌ Cleanup failed: {str(e)}")
+        logger.error(f"❌ Rollup failed: {str(e)}")
         return {'status': 'error', 'message': str(e)}
 
 @celery_app.task(name='tasks.test_mongodb')
@@ -235,6 +288,9 @@ def snapshot_rewards_timeline():
     """
     Record rewards claimed timeline by aggregating RewardsClaimed events by day.
 
+    Buckets by block_time (when the claim happened on-chain), not by when
+    the listener processed it, so backfilled history lands on the right day.
+
     Aggregates raw_events collection to calculate:
     - Daily rewards claimed
     - Number of claims per day
@@ -245,35 +301,7 @@ def snapshot_rewards_timeline():
         start_time = datetime.utcnow() - timedelta(days=90)
 
         # Aggregate RewardsClaimed events by day
-        pipeline = [
-            {
-                '$match': {
-                    'event_name': 'RewardsClaimed',
-                    'processed_at': {'$gte': start_time}
-                }
-            },
-            {
-                '$project': {
-                    'date': {
-                        '$dateToString': {
-                            'format': '%Y-%m-%d',
-                            'date': '$processed_at'
-                        }
-                    },
-                    'amount': convert_to_double('$args.rewards')
-                }
-            },
-            {
-                '$group': {
-                    '_id': '$date',
-                    'total_rewards': {'$sum': '$amount'},
-                    'claim_count': {'$sum': 1}
-                }
-            },
-            {'$sort': {'_id': 1}}
-        ]
-
-        daily_rewards = list(raw_events_collection.aggregate(pipeline))
+        daily_rewards = list(raw_events_collection.aggregate(rewards_timeline_pipeline(start_time)))
 
         # Calculate totals
         total_days = len(daily_rewards)
@@ -281,7 +309,7 @@ def snapshot_rewards_timeline():
         timeline_data = []
 
         for day_data in daily_rewards:
-            total_rewards_int = int(day_data['total_rewards'])
+            total_rewards_int = decode_amount(day_data['total_rewards'])
             total_rewards_sum += total_rewards_int
 
             timeline_data.append({
@@ -314,7 +342,8 @@ def snapshot_rewards_timeline():
 @celery_app.task(name='tasks.snapshot_activity_heatmap')
 def snapshot_activity_heatmap():
     """
-    Record activity heatmap by aggregating raw_events by hour and day.
+    Record activity heatmap by aggregating raw_events by hour and day
+    of their block_time.
 
     Aggregates raw_events collection to calculate:
     - Events per hour for each day (24 hours x 7-90 days)
@@ -326,39 +355,7 @@ def snapshot_activity_heatmap():
         start_time = datetime.utcnow() - timedelta(days=30)
 
         # Aggregate events by date and hour
-        pipeline = [
-            {
-                '$match': {
-                    'processed_at': {'$gte': start_time},
-                    'event_name': {'$in': ['StakeCreated', 'RewardsClaimed', 'Unstaked']}
-                }
-            },
-            {
-                '$project': {
-                    'date': {
-                        '$dateToString': {
-                            'format': '%Y-%m-%d',
-                            'date': '$processed_at'
-                        }
-                    },
-                    'hour': {'$hour': '$processed_at'},
-                    'event_name': 1
-                }
-            },
-            {
-                '$group': {
-                    '_id': {
-                        'date': '$date',
-                        'hour': '$hour',
-                        'event': '$event_name'
-                    },
-                    'count': {'$sum': 1}
-                }
-            },
-            {'$sort': {'_id.date': 1, '_id.hour': 1}}
-        ]
-
-        activity_data = list(raw_events_collection.aggregate(pipeline))
+        activity_data = list(raw_events_collection.aggregate(activity_heatmap_pipeline(start_time)))
 
         # Group by date-hour for storage
         hourly_activity = {}
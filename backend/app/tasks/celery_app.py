@@ -1,13 +1,12 @@
-# backend/app/tasks/celery_app.py - v4.0
+# backend/app/tasks/celery_app.py - v4.3
 from celery import Celery
-from celery.schedules import crontab
 from app.config import config
 
 celery_app = Celery(
     'chainstaker',
     broker=config.CELERY_BROKER_URL,
     backend=config.CELERY_RESULT_BACKEND,
-    include=['app.tasks.analytics_tasks']
+    include=['app.tasks.analytics_tasks', 'app.tasks.reconciliation_tasks', 'app.tasks.task_metrics']
 )
 
 celery_app.conf.update(
@@ -51,8 +50,14 @@ celery_app.conf.beat_schedule = {
         'task': 'tasks.snapshot_activity_heatmap',
         'schedule': 900.0,
     },
-    'cleanup-old-metrics-daily': {
-        'task': 'tasks.cleanup_old_metrics',
-        'schedule': crontab(hour=3, minute=0),
+    'reconcile-chain-state-hourly': {
+        'task': 'tasks.reconcile_chain_state',
+        'schedule': 3600.0,
+    },
+    # Hourly and daily metric rollups; old metrics expire through the
+    # time-series TTLs of app.models.metric
+    'rollup-metrics-every-15-minutes': {
+        'task': 'tasks.rollup_metrics',
+        'schedule': 900.0,
     },
 }
\ No newline at end of file
@@ -0,0 +1,34 @@
+# backend/app/tasks/reconciliation_tasks.py - v1.0
+import logging
+from app.tasks.celery_app import celery_app
+from app.models.metric import Metric
+from app.services.reconciliation import reconcile_pool
+from app.utils.pools import configured_pools
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@celery_app.task(name='tasks.reconcile_chain_state', time_limit=3600, soft_time_limit=3300)
+def reconcile_chain_state(dry_run=False):
+    """Compare stakes/users with on-chain state, correct drift and record a chain_drift metric"""
+    try:
+        summaries = [reconcile_pool(pool, dry_run=dry_run) for pool in configured_pools()]
+        drifted = sum(s['users_drifted'] + s['stakes_drifted'] for s in summaries)
+        corrected = sum(s['corrected'] for s in summaries)
+        
+        Metric.record(
+            metric_type='chain_drift',
+            value=drifted,
+            metadata={
+                'corrected': corrected,
+                'dry_run': dry_run,
+                'pools': summaries
+            }
+        )
+        
+        logger.info(f"✅ Reconciliation: {drifted} drifted documents, {corrected} corrected")
+        return {'status': 'success', 'drifted': drifted, 'corrected': corrected}
+    
+    except Exception as e:
+        logger.error(f"❌ Reconciliation failed: {str(e)}")
+        return {'status': 'error', 'message': str(e)}
@@ -0,0 +1,48 @@
+# backend/app/tasks/task_metrics.py - v1.0
+"""
+Prometheus metrics for Celery tasks, wired through Celery signals.
+
+The analytics tasks catch their own exceptions and return
+{'status': 'error', ...}, so a result with that status counts as a failure
+as well as an exception raised out of the task.
+
+The worker serves the metrics on CELERY_METRICS_PORT. With the prefork pool
+tasks run in child processes: set PROMETHEUS_MULTIPROC_DIR so their samples
+reach the server (see app.utils.prometheus_metrics).
+"""
+import logging
+import time
+from celery.signals import task_failure, task_postrun, task_prerun, worker_init
+from app.utils.prometheus_metrics import TASK_DURATION, TASK_FAILURES, start_metrics_server
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+# task_id -> perf_counter() at task start
+_started_at = {}
+
+
+@worker_init.connect
+def start_worker_metrics_server(**kwargs):
+    if config.CELERY_METRICS_PORT:
+        logger.info(f"Metrics: http://0.0.0.0:{config.CELERY_METRICS_PORT}/metrics")
+        start_metrics_server(config.CELERY_METRICS_PORT)
+
+
+@task_prerun.connect
+def record_task_start(task_id=None, **kwargs):
+    _started_at[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def record_task_end(task_id=None, task=None, retval=None, **kwargs):
+    started_at = _started_at.pop(task_id, None)
+    if started_at is not None:
+        TASK_DURATION.labels(task.name).observe(time.perf_counter() - started_at)
+    if isinstance(retval, dict) and retval.get('status') == 'error':
+        TASK_FAILURES.labels(task.name).inc()
+
+
+@task_failure.connect
+def record_task_failure(sender=None, **kwargs):
+    TASK_FAILURES.labels(sender.name).inc()
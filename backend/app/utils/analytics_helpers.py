@@ -8,6 +8,7 @@ Follows WEB3 RULESET from CLAUDE.md (lines 3-8).
 
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
+import numpy as np
 
 
 def calculate_percentage_change(old_value: float, new_value: float) -> float:
@@ -74,6 +75,140 @@ def aggregate_metrics_to_points(
     return sampled
 
 
+def lttb_indices(x: np.ndarray, y: np.ndarray, target_points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of `target_points` points that
+    keep the visual shape of the series (x ascending).
+
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the point kept
+    before it and the centroid of the next bucket. Bucket centroids and
+    triangle areas are computed with NumPy; only the walk over buckets
+    (target_points iterations) runs in Python.
+
+    Args:
+        x: Ascending x values (e.g. epoch milliseconds), float array
+        y: Values, float array of the same length
+        target_points: Number of points to keep (>= 3 to downsample)
+
+    Returns:
+        Ascending array of indices into x / y
+
+    Example:
+        >>> lttb_indices(np.arange(1000.0), values, 50)
+        array([  0,  12,  31, ..., 999])
+    """
+    n = len(y)
+    if target_points >= n or target_points < 3:
+        return np.arange(n)
+
+    # target_points - 2 buckets over the points between the first and the last
+    edges = np.linspace(1, n - 1, target_points - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    # Centroid of the following bucket; the last point after the final bucket
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    selected = np.empty(target_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    kept = 0
+    for i in range(target_points - 2):
+        start, end = edges[i], edges[i + 1]
+        ax, ay = x[kept], y[kept]
+        areas = np.abs(
+            (ax - next_x[i]) * (y[start:end] - ay) - (ax - x[start:end]) * (next_y[i] - ay)
+        )
+        kept = start + int(areas.argmax())
+        selected[i + 1] = kept
+    return selected
+
+
+def minmax_indices(y: np.ndarray, target_points: int) -> np.ndarray:
+    """
+    Min-max downsampling: indices of the lowest and highest point of each
+    of (target_points - 2) / 2 equal-width buckets, plus the first and last
+    points, fully vectorized.
+
+    Cheaper than LTTB and guarantees every extreme of the series survives,
+    at the cost of a more jagged line.
+
+    Args:
+        y: Values, float array
+        target_points: Maximum number of points to keep (>= 4 to downsample)
+
+    Returns:
+        Ascending array of at most target_points indices into y
+
+    Example:
+        >>> minmax_indices(values, 50)   # 24 buckets: 48 extremes + first + last
+    """
+    n = len(y)
+    if target_points >= n or target_points < 4:
+        return np.arange(n)
+
+    interior = y[1:n - 1]
+    m = n - 2
+    width = -(-m // ((target_points - 2) // 2))
+    padded = width * -(-m // width)
+    offsets = np.arange(0, padded, width) + 1
+
+    lows = np.full(padded, np.inf)
+    lows[:m] = interior
+    highs = np.full(padded, -np.inf)
+    highs[:m] = interior
+
+    low = lows.reshape(-1, width).argmin(axis=1) + offsets
+    high = highs.reshape(-1, width).argmax(axis=1) + offsets
+    return np.unique(np.concatenate(([0], low, high, [n - 1])))
+
+
+# Methods downsample_series() accepts
+DOWNSAMPLING_METHODS = ('lttb', 'minmax')
+
+
+def downsample_series(
+    points: List[Dict[str, Any]],
+    target_points: int = 50,
+    method: str = 'lttb',
+    value_key: str = 'value'
+) -> List[Dict[str, Any]]:
+    """
+    Reduce an ascending series to target_points points, keeping its shape.
+
+    Unlike aggregate_metrics_to_points (every nth document), spikes and the
+    first (baseline) and last points always survive.
+
+    Args:
+        points: Points sorted by time, oldest first, with a datetime
+                'timestamp' and a numeric (int or decimal string) value
+        target_points: Desired number of data points (default: 50)
+        method: 'lttb' (smooth, shape-preserving) or 'minmax' (every extreme)
+        value_key: The key containing the value (default: 'value')
+
+    Returns:
+        The selected points, oldest first
+
+    Example:
+        Input: 1,200 points with a one-off spike, target_points=50
+        Output: 50 points, the first, the last and the spike among them
+    """
+    if len(points) <= target_points:
+        return points
+
+    y = np.array([float(point[value_key]) for point in points])
+    if method == 'minmax':
+        indices = minmax_indices(y, target_points)
+    elif method == 'lttb':
+        x = np.array([point['timestamp'] for point in points], dtype='datetime64[ms]').astype(np.float64)
+        indices = lttb_indices(x, y, target_points)
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+
+    return [points[index] for index in indices]
+
+
 def format_sparkline_data(
     metrics: List[Dict[str, Any]],
     value_key: str = 'value',
@@ -186,15 +321,29 @@ def get_metric_change_data(
     }
 
 
+def user_total_staked_pipeline(user_address: str) -> list:
+    """Aggregation summing a user's active stake amounts into {'total'}."""
+    return [
+        {'$match': {
+            'user_address': user_address.lower(),
+            'status': 'active'
+        }},
+        {'$group': {
+            '_id': None,
+            'total': {'$sum': '$amount'}
+        }}
+    ]
+
+
 def calculate_user_total_staked_from_stakes(stakes_collection, user_address: str) -> int:
     """
     Calculate user's total staked amount by aggregating active stakes.
 
-    This is the SOURCE OF TRUTH for total_staked, fixing the issue where
-    increment_field() fails with large uint256 values (>2^63).
+    This is the SOURCE OF TRUTH for total_staked (users.total_staked is a
+    running counter and can drift, see app.services.reconciliation).
 
-    Uses MongoDB aggregation to sum all active stake amounts for a user.
-    Handles mixed int/string types from convert_uint256_for_mongodb().
+    Uses MongoDB aggregation to sum all active stake amounts for a user
+    (Decimal128, summed exactly).
 
     Args:
         stakes_collection: MongoDB collection instance
@@ -207,20 +356,9 @@ def calculate_user_total_staked_from_stakes(stakes_collection, user_address: str
         >>> calculate_user_total_staked_from_stakes(stakes_collection, '0xabc...')
         1500000000000000000000  # 1500 DAI in Wei
     """
-    from app.utils.mongodb_helpers import convert_to_double
-
-    pipeline = [
-        {'$match': {
-            'user_address': user_address.lower(),
-            'status': 'active'
-        }},
-        {'$group': {
-            '_id': None,
-            'total': {'$sum': convert_to_double('$amount')}
-        }}
-    ]
+    from app.utils.mongodb_helpers import decode_amount
 
-    result = list(stakes_collection.aggregate(pipeline))
-    total_staked = int(result[0]['total']) if result else 0
+    result = list(stakes_collection.aggregate(user_total_staked_pipeline(user_address)))
+    total_staked = decode_amount(result[0]['total']) if result else 0
 
     return total_staked
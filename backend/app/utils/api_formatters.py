@@ -4,7 +4,7 @@ API response formatters for ChainStalker.
 
 Centralizes formatting logic for consistent API responses across all endpoints.
 """
-from app.utils.mongodb_helpers import normalize_timestamp_field
+from app.utils.mongodb_helpers import decode_amount, normalize_timestamp_field
 
 
 def format_stake_for_api(stake):
@@ -27,10 +27,10 @@ def format_stake_for_api(stake):
     return {
         'user_address': stake['user_address'],
         'stake_index': stake['stake_index'],
-        'amount': str(stake['amount']),
+        'amount': str(decode_amount(stake['amount'])),
         'tier_id': stake['tier_id'],
         'status': stake['status'],
-        'total_rewards_claimed': str(stake.get('total_rewards_claimed', 0)),
+        'total_rewards_claimed': str(decode_amount(stake.get('total_rewards_claimed'))),
         'start_time': stake['start_time'] * 1000,  # Convert seconds to milliseconds for JavaScript
         'last_reward_claim': last_reward_claim_ms,
         'tx_hash': stake.get('tx_hash'),
@@ -46,9 +46,10 @@ def format_user_for_api(user):
     """
     return {
         'address': user['address'],
-        'total_staked': str(user.get('total_staked', 0)),
-        'total_rewards_claimed': str(user.get('total_rewards_claimed', 0)),
+        'total_staked': str(decode_amount(user.get('total_staked'))),
+        'total_rewards_claimed': str(decode_amount(user.get('total_rewards_claimed'))),
         'active_stakes_count': user.get('active_stakes_count', 0),
+        'pools': user.get('pools', []),
         'created_at': user.get('created_at').isoformat() if user.get('created_at') else None,
         'updated_at': user.get('updated_at').isoformat() if user.get('updated_at') else None
     }
@@ -0,0 +1,118 @@
+# backend/app/utils/event_decoder.py - v1.0
+"""
+Precompiled log decoder for the StakingPool events.
+
+web3's ContractEvent.process_log() runs every log through the generic ABI
+machinery (event ABI lookup, eth_abi decoder registry, normalizers). That
+dominates listener CPU time during backfills. Every StakingPool event only
+has static, one-word fields, so the layout of each event can be worked out
+once from the ABI and each log decoded by slicing its topics and data:
+
+- indexed inputs:     topics[1:], one 32-byte word each
+- non-indexed inputs: data, one 32-byte word each, in ABI order
+
+The result has the same shape as process_log() output (checksummed
+addresses, Python ints, AttributeDict args), so the listener handlers and
+store_raw_event see no difference. Events with a field type it cannot
+slice (dynamic types) are reported as unsupported and left to web3.
+
+Benchmark: python -m benchmarks.decode_events (from backend/)
+"""
+from functools import lru_cache
+from eth_utils import event_abi_to_log_topic, to_checksum_address
+from web3.datastructures import AttributeDict
+
+WORD_SIZE = 32
+
+
+@lru_cache(maxsize=65536)
+def _checksum_address(word):
+    """Checksum the address in the low 20 bytes of a word (cached: stakers repeat)."""
+    return to_checksum_address(word[12:])
+
+
+def _decode_uint(word):
+    return int.from_bytes(word, 'big')
+
+
+def _decode_int(word):
+    return int.from_bytes(word, 'big', signed=True)
+
+
+def _decode_bool(word):
+    return word[-1] == 1
+
+
+def _word_decoder(abi_type):
+    """Decoder for one static, single-word ABI type, or None if unsupported."""
+    if abi_type == 'address':
+        return _checksum_address
+    if abi_type == 'bool':
+        return _decode_bool
+    if abi_type.startswith('uint'):
+        return _decode_uint
+    if abi_type.startswith('int'):
+        return _decode_int
+    if abi_type.startswith('bytes') and abi_type[5:].isdigit():
+        size = int(abi_type[5:])
+        return lambda word: bytes(word[:size])
+    return None
+
+
+class EventDecoder:
+    def __init__(self, abi):
+        # topic0 -> (event name, [(arg name, topic position, decoder)], [(arg name, data offset, decoder)])
+        self.layouts = {}
+        self.unsupported = set()
+
+        for event_abi in abi:
+            if event_abi.get('type') != 'event' or event_abi.get('anonymous'):
+                continue
+
+            topic0 = bytes(event_abi_to_log_topic(event_abi))
+            indexed = []
+            data = []
+            supported = True
+            for field in event_abi['inputs']:
+                decoder = _word_decoder(field['type'])
+                if decoder is None:
+                    supported = False
+                    break
+                if field['indexed']:
+                    indexed.append((field['name'], len(indexed) + 1, decoder))
+                else:
+                    data.append((field['name'], len(data) * WORD_SIZE, decoder))
+
+            if supported:
+                self.layouts[topic0] = (event_abi['name'], indexed, data)
+            else:
+                self.unsupported.add(event_abi['name'])
+
+    def decode(self, log):
+        """
+        Decode one raw log into process_log() shape. Returns None when its
+        topic0 has no precompiled layout.
+        """
+        topics = log['topics']
+        layout = self.layouts.get(bytes(topics[0]))
+        if layout is None:
+            return None
+
+        event_name, indexed, data_fields = layout
+        data = log['data']
+        args = {}
+        for name, position, decoder in indexed:
+            args[name] = decoder(bytes(topics[position]))
+        for name, offset, decoder in data_fields:
+            args[name] = decoder(data[offset:offset + WORD_SIZE])
+
+        return AttributeDict({
+            'args': AttributeDict(args),
+            'event': event_name,
+            'logIndex': log['logIndex'],
+            'transactionIndex': log['transactionIndex'],
+            'transactionHash': log['transactionHash'],
+            'address': log['address'],
+            'blockHash': log['blockHash'],
+            'blockNumber': log['blockNumber']
+        })
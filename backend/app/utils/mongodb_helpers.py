@@ -2,11 +2,20 @@
 """
 MongoDB helpers for handling Solidity uint256 types and aggregation.
 
-ChainStalker stores large uint256 values as strings (when > int64 max)
-to avoid MongoDB overflow. These helpers provide conversion utilities
-for both storage and aggregation operations.
+Token amounts are stored as Decimal128 (encode_amount / decode_amount), so
+aggregations $sum them natively and exactly. Other uint256 values (indexes,
+timestamps) go through convert_uint256_for_mongodb(). Data written before
+the Decimal128 encoding is converted by app.services.migrate_amounts.
 """
+import logging
 from datetime import datetime
+from bson.decimal128 import Decimal128
+
+logger = logging.getLogger(__name__)
+
+# Decimal128 holds integers exactly up to 34 digits (1e16 DAI in wei)
+MAX_AMOUNT_DIGITS = 34
+MAX_AMOUNT = 10**MAX_AMOUNT_DIGITS - 1
 
 
 def convert_uint256_for_mongodb(value):
@@ -20,22 +29,39 @@ def convert_uint256_for_mongodb(value):
     return int_value if -2**63 <= int_value < 2**63 else str(int_value)
 
 
-def convert_to_double(field_name):
+def encode_amount(value):
+    """
+    Encode a token amount (uint256, or a signed delta of one) for MongoDB.
+
+    Every amount field (stakes, users counters, raw_events amount/rewards)
+    is stored as Decimal128: exact for integers up to 34 digits (1e16 DAI in
+    wei), summed natively and exactly by $sum / $inc. Larger values are
+    clamped to +/-MAX_AMOUNT with a warning, so the event is still applied
+    instead of failing on every retry; callers that keep the raw value flag
+    it with amount_overflows().
     """
-    Create MongoDB $convert expression to safely convert field to double.
+    int_value = int(value)
+    if amount_overflows(int_value):
+        logger.warning(f"Amount {int_value} exceeds {MAX_AMOUNT_DIGITS} digits, stored clamped to {MAX_AMOUNT}")
+        int_value = MAX_AMOUNT if int_value > 0 else -MAX_AMOUNT
+    return Decimal128(str(int_value))
+
 
-    Handles both int and string values in MongoDB, converting them to double
-    for use in aggregation pipelines ($sum, $avg, etc).
+def amount_overflows(value):
+    """True when an amount is too large for encode_amount() to store exactly."""
+    return abs(int(value)) > MAX_AMOUNT
 
+
+def decode_amount(value):
+    """
+    Read back a stored amount as int. Accepts Decimal128 and the legacy
+    int / decimal-string encodings; missing values read as 0.
     """
-    return {
-        '$convert': {
-            'input': field_name,
-            'to': 'double',
-            'onError': 0,   # Return 0 if conversion fails
-            'onNull': 0     # Return 0 if field is null
-        }
-    }
+    if value is None:
+        return 0
+    if isinstance(value, Decimal128):
+        return int(value.to_decimal())
+    return int(value)
 
 
 def get_current_timestamp():
@@ -0,0 +1,118 @@
+# backend/app/utils/pools.py - v1.0
+"""
+StakingPool deployments indexed by the listener, and their assignment to
+listener processes.
+
+A pool is identified by its key "<chain_id>:<lowercase address>". Every
+document the listener writes (raw_events, stakes, users, undo_journal,
+failed_ranges, block_coverage) carries it in a `pool` field, and listener
+checkpoints are stored per key.
+
+Pools come from POOLS ("chain_id:address[@start_block],..."), defaulting to
+the single CHAIN_ID / STAKING_POOL_ADDRESS deployment; without @start_block
+a pool starts after START_BLOCK. RPC endpoints are per chain: RPC_URLS /
+WS_URLS ("chain_id=url,..."), falling back to RPC_URL / WS_URL for CHAIN_ID.
+An RPC URL may list several endpoints as "url|url" (see app.utils.rpc_pool).
+
+Pools are spread over listener processes with a consistent hash ring, so
+changing the process count only moves about 1/N of the pools.
+"""
+import bisect
+import hashlib
+from collections import namedtuple
+from app.config import config
+
+# Points per process on the hash ring; more points, more even spread
+RING_REPLICAS = 64
+
+
+class Pool(namedtuple('Pool', ['chain_id', 'address', 'rpc_url', 'ws_url', 'start_block'])):
+    __slots__ = ()
+
+    @property
+    def key(self):
+        return f"{self.chain_id}:{self.address.lower()}"
+
+
+def _parse_chain_urls(value):
+    urls = {}
+    for entry in filter(None, (part.strip() for part in value.split(','))):
+        chain_id, url = entry.split('=', 1)
+        urls[int(chain_id)] = url.strip()
+    return urls
+
+
+def rpc_url_for(chain_id):
+    urls = _parse_chain_urls(config.RPC_URLS)
+    if chain_id in urls:
+        return urls[chain_id]
+    if chain_id == config.CHAIN_ID:
+        return config.RPC_URL
+    raise ValueError(f"No RPC URL configured for chain {chain_id} (set RPC_URLS)")
+
+
+def ws_url_for(chain_id):
+    urls = _parse_chain_urls(config.WS_URLS)
+    if chain_id in urls:
+        return urls[chain_id]
+    return config.WS_URL if chain_id == config.CHAIN_ID else ''
+
+
+def make_pool(chain_id, address, start_block=None):
+    chain_id = int(chain_id)
+    start_block = config.START_BLOCK if start_block is None else int(start_block)
+    return Pool(chain_id, address, rpc_url_for(chain_id), ws_url_for(chain_id), start_block)
+
+
+def default_pool():
+    """The CHAIN_ID / STAKING_POOL_ADDRESS deployment (single-pool setups)."""
+    return make_pool(config.CHAIN_ID, config.STAKING_POOL_ADDRESS)
+
+
+def configured_pools():
+    if not config.POOLS:
+        return [default_pool()]
+
+    pools = []
+    for entry in filter(None, (part.strip() for part in config.POOLS.split(','))):
+        chain_id, address = entry.split(':', 1)
+        address, _, start_block = address.partition('@')
+        pools.append(make_pool(chain_id, address.strip(), start_block.strip() or None))
+    return pools
+
+
+def pool_by_key(key):
+    """Pool for a stored pool key, configured or not."""
+    chain_id, address = key.split(':', 1)
+    key = f"{int(chain_id)}:{address.lower()}"
+    for pool in configured_pools():
+        if pool.key == key:
+            return pool
+    return make_pool(chain_id, address)
+
+
+def _ring_hash(value):
+    return int(hashlib.md5(value.encode()).hexdigest()[:16], 16)
+
+
+class HashRing:
+    def __init__(self, nodes, replicas=RING_REPLICAS):
+        self.ring = sorted(
+            (_ring_hash(f"{node}#{replica}"), node)
+            for node in nodes
+            for replica in range(replicas)
+        )
+        self.hashes = [point for point, _ in self.ring]
+
+    def node_for(self, key):
+        index = bisect.bisect(self.hashes, _ring_hash(key)) % len(self.ring)
+        return self.ring[index][1]
+
+
+def assign_pools(pools, processes):
+    """Map process index (0..processes-1) -> pools it listens to."""
+    ring = HashRing(range(processes))
+    assignments = {index: [] for index in range(processes)}
+    for pool in pools:
+        assignments[ring.node_for(pool.key)].append(pool)
+    return assignments
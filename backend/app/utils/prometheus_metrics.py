@@ -0,0 +1,107 @@
+# backend/app/utils/prometheus_metrics.py - v1.1
+"""
+Prometheus metrics for the listener, the Celery analytics tasks and the API.
+
+Each process exposes its own numbers in the Prometheus text format:
+
+- listener:       HTTP server on LISTENER_METRICS_PORT (start_metrics_server)
+- celery worker:  HTTP server on CELERY_METRICS_PORT (see app.tasks.task_metrics)
+- Flask API:      GET /metrics
+
+gunicorn and the prefork Celery pool run several processes per service; set
+PROMETHEUS_MULTIPROC_DIR to a shared, empty directory for those so every
+worker's samples are aggregated (prometheus_client multiprocess mode).
+"""
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+    generate_latest, multiprocess, start_http_server, CONTENT_TYPE_LATEST
+)
+
+# Listener
+LISTENER_HEAD_BLOCK = Gauge(
+    'chainstalker_listener_head_block', 'Latest chain head seen by the listener', ['pool'],
+    multiprocess_mode='max'
+)
+LISTENER_LAST_BLOCK = Gauge(
+    'chainstalker_listener_last_processed_block', 'Last block the listener checkpointed', ['pool'],
+    multiprocess_mode='max'
+)
+LISTENER_LAG_BLOCKS = Gauge(
+    'chainstalker_listener_lag_blocks', 'Chain head minus last processed block', ['pool'],
+    multiprocess_mode='max'
+)
+LISTENER_EVENTS = Counter(
+    'chainstalker_listener_events', 'StakingPool events processed (rate() for events/sec)',
+    ['pool', 'event']
+)
+RPC_LATENCY = Histogram(
+    'chainstalker_rpc_latency_seconds', 'RPC call latency', ['method'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+RPC_ENDPOINT_LATENCY = Histogram(
+    'chainstalker_rpc_endpoint_latency_seconds', 'Latency of successful requests per RPC endpoint', ['endpoint'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+RPC_ENDPOINT_ERRORS = Counter(
+    'chainstalker_rpc_endpoint_errors', 'Failed requests (transport, HTTP, rate limit) per RPC endpoint', ['endpoint']
+)
+RPC_HEDGED_REQUESTS = Counter(
+    'chainstalker_rpc_hedged_requests', 'Reads also sent to a second endpoint after the hedge delay', ['method']
+)
+MONGO_LATENCY = Histogram(
+    'chainstalker_mongo_latency_seconds', 'MongoDB write latency in the listener', ['operation'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 10)
+)
+
+# Celery analytics tasks
+TASK_DURATION = Histogram(
+    'chainstalker_celery_task_duration_seconds', 'Celery task run time', ['task'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+TASK_FAILURES = Counter(
+    'chainstalker_celery_task_failures', 'Celery tasks that raised or returned status=error', ['task']
+)
+
+# API
+API_LATENCY = Histogram(
+    'chainstalker_api_request_latency_seconds', 'API request latency', ['blueprint', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+
+def metrics_registry():
+    """Registry to expose: aggregated across processes in multiprocess mode."""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics():
+    """(body, content type) of the Prometheus text exposition."""
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port):
+    """Serve /metrics from a background thread of this process (port 0 = off)."""
+    if port:
+        start_http_server(port, registry=metrics_registry())
+
+
+@contextmanager
+def observe_latency(histogram, label):
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(label).observe(time.perf_counter() - started_at)
+
+
+def record_listener_progress(pool, head, last_block):
+    LISTENER_HEAD_BLOCK.labels(pool).set(head)
+    LISTENER_LAST_BLOCK.labels(pool).set(last_block)
+    LISTENER_LAG_BLOCKS.labels(pool).set(max(head - last_block, 0))
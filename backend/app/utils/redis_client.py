@@ -0,0 +1,13 @@
+# backend/app/utils/redis_client.py - v1.0
+import redis
+from app.config import config
+
+_client = None
+
+
+def get_redis():
+    """Shared Redis client for REDIS_URL (connection-pooled, created on first use)."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(config.REDIS_URL)
+    return _client
@@ -0,0 +1,272 @@
+# backend/app/utils/rpc_pool.py - v1.0
+"""
+Pool of JSON-RPC endpoints for one chain, with latency-aware routing,
+failover and hedged reads.
+
+An RPC URL setting (RPC_URL, or an RPC_URLS entry) may list several
+endpoints separated by "|". Per endpoint the pool keeps:
+
+- its median latency over the last RPC_LATENCY_WINDOW requests, used to
+  route each request to the fastest healthy endpoint (endpoints without
+  samples are tried first, and a few requests go to a random endpoint so
+  a slower one that recovered gets noticed);
+- its consecutive failures (transport errors, HTTP errors, rate-limit
+  responses); RPC_ERROR_THRESHOLD of them in a row take it out of rotation
+  for RPC_COOLDOWN seconds;
+- the last block number it reported, so a request for a given block avoids
+  endpoints known to be behind it (a lagging node silently returns fewer
+  logs for a range past its head).
+
+Read calls are hedged: when the chosen endpoint has not answered within its
+RPC_HEDGE_PERCENTILE latency percentile, the same request also goes to the
+next endpoint and the first good answer wins. A failed read fails over to
+the next endpoint. Other calls go to the best endpoint once.
+
+EndpointPoolProvider plugs the pool into web3; the listener's batched
+header lookups use EndpointPool.request() directly.
+
+Try it against local fake nodes with injected delays:
+    python -m benchmarks.rpc_pool (from backend/)
+"""
+import json
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+import requests
+from web3.providers.base import JSONBaseProvider
+from app.config import config
+from app.utils.prometheus_metrics import RPC_ENDPOINT_ERRORS, RPC_ENDPOINT_LATENCY, RPC_HEDGED_REQUESTS
+
+# Idempotent reads: safe to hedge and to retry on another endpoint
+READ_METHODS = frozenset({
+    'eth_blockNumber', 'eth_chainId', 'net_version', 'web3_clientVersion',
+    'eth_call', 'eth_getLogs', 'eth_getBlockByNumber', 'eth_getBlockByHash',
+    'eth_getBalance', 'eth_getCode', 'eth_getTransactionCount', 'eth_getTransactionReceipt',
+    'eth_getTransactionByHash', 'eth_estimateGas', 'eth_gasPrice', 'eth_feeHistory',
+    'eth_maxPriorityFeePerGas', 'eth_syncing',
+})
+
+# JSON-RPC error fragments meaning the provider is throttling us
+RATE_LIMIT_ERRORS = ('rate limit', 'too many requests', 'exceeded the quota', 'capacity')
+
+# Share of requests routed to a random endpoint to keep every latency current
+EXPLORATION_RATE = 0.05
+
+# Samples an endpoint needs before its own percentile sets the hedge delay
+MIN_HEDGE_SAMPLES = 20
+
+
+def split_rpc_urls(value):
+    """Endpoint URLs of an RPC URL setting ("url|url|...")."""
+    return [url.strip() for url in value.split('|') if url.strip()]
+
+
+def required_block(method, params):
+    """Highest block number a request refers to, when it names one."""
+    def as_block(value):
+        if isinstance(value, str) and value.startswith('0x'):
+            return int(value, 16)
+        if isinstance(value, int):
+            return value
+        return None
+
+    if method == 'eth_getLogs' and params:
+        return as_block(params[0].get('toBlock'))
+    if method == 'eth_getBlockByNumber' and params:
+        return as_block(params[0])
+    if method in ('eth_call', 'eth_getBalance', 'eth_getCode') and len(params) > 1:
+        return as_block(params[-1])
+    return None
+
+
+class RpcEndpointError(Exception):
+    """An endpoint failed to answer (transport, HTTP status or rate limit)."""
+
+
+class Endpoint:
+    def __init__(self, url):
+        self.url = url
+        # Metric label: host only, the path often carries an API key
+        self.name = urlparse(url).netloc or url
+        self.latency = None
+        self.samples = deque(maxlen=config.RPC_LATENCY_WINDOW)
+        self.failures = 0
+        self.down_until = 0.0
+        self.head = None
+        self.lock = threading.Lock()
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.down_until
+
+    def record_success(self, elapsed):
+        with self.lock:
+            self.samples.append(elapsed)
+            # Median, not mean: one stalled request should not reroute traffic
+            self.latency = sorted(self.samples)[len(self.samples) // 2]
+            self.failures = 0
+        RPC_ENDPOINT_LATENCY.labels(self.name).observe(elapsed)
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= config.RPC_ERROR_THRESHOLD:
+                self.down_until = time.monotonic() + config.RPC_COOLDOWN
+        RPC_ENDPOINT_ERRORS.labels(self.name).inc()
+
+    def record_head(self, block_number):
+        with self.lock:
+            if self.head is None or block_number > self.head:
+                self.head = block_number
+
+    def hedge_delay(self):
+        """Seconds to wait for this endpoint before hedging: its latency percentile."""
+        with self.lock:
+            samples = sorted(self.samples)
+        if len(samples) < MIN_HEDGE_SAMPLES:
+            return max(config.RPC_HEDGE_MIN_DELAY, 4 * (self.latency or 0))
+        index = min(len(samples) - 1, int(len(samples) * config.RPC_HEDGE_PERCENTILE / 100))
+        return max(config.RPC_HEDGE_MIN_DELAY, samples[index])
+
+
+class EndpointPool:
+    def __init__(self, urls, session=None):
+        if not urls:
+            raise ValueError("No RPC endpoint configured")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.session = session or requests.Session()
+        # Hedged requests run here; a losing request finishes in the background
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(2, config.RPC_POOL_SIZE),
+            thread_name_prefix='rpc-hedge'
+        ) if len(self.endpoints) > 1 else None
+
+    def ranked(self, block_number=None):
+        """
+        Endpoints in routing order: healthy before cooling down, then fastest
+        first. Endpoints known to be behind block_number are left out, unless
+        no other endpoint remains.
+        """
+        endpoints = self.endpoints
+        if block_number is not None:
+            endpoints = [
+                endpoint for endpoint in endpoints
+                if endpoint.head is None or endpoint.head >= block_number
+            ] or endpoints
+        ranked = sorted(endpoints, key=lambda endpoint: (not endpoint.healthy, endpoint.latency or 0.0))
+        if len(ranked) > 1 and random.random() < EXPLORATION_RATE:
+            explored = random.choice(ranked[1:])
+            if explored.healthy:
+                ranked.remove(explored)
+                ranked.insert(0, explored)
+        return ranked
+
+    def _send(self, endpoint, body):
+        started_at = time.perf_counter()
+        try:
+            response = self.session.post(
+                endpoint.url,
+                data=body,
+                headers={'Content-Type': 'application/json'},
+                timeout=config.RPC_TIMEOUT
+            )
+            response.raise_for_status()
+            content = response.content
+            _raise_for_rate_limit(content)
+        except (requests.RequestException, RpcEndpointError) as e:
+            endpoint.record_failure()
+            raise RpcEndpointError(f"{endpoint.name}: {str(e)}") from e
+        endpoint.record_success(time.perf_counter() - started_at)
+        return endpoint, content
+
+    def request(self, body, method, block_number=None):
+        """
+        POST a JSON-RPC body (bytes; one request or a batch) and return
+        (endpoint, raw response). Reads are hedged and fail over.
+        """
+        candidates = self.ranked(block_number)
+        if method not in READ_METHODS:
+            return self._send(candidates[0], body)
+        if self.executor is None or not config.RPC_HEDGE_PERCENTILE:
+            return self._failover(candidates, body)
+        return self._hedged(candidates, method, body)
+
+    def _failover(self, candidates, body):
+        errors = []
+        for endpoint in candidates:
+            try:
+                return self._send(endpoint, body)
+            except RpcEndpointError as e:
+                errors.append(str(e))
+        raise RpcEndpointError(f"All RPC endpoints failed: {'; '.join(errors)}")
+
+    def _hedged(self, candidates, method, body):
+        remaining = iter(candidates)
+        pending = {}
+        errors = []
+
+        def launch():
+            endpoint = next(remaining, None)
+            if endpoint is not None:
+                pending[self.executor.submit(self._send, endpoint, body)] = endpoint
+            return endpoint
+
+        delay = launch().hedge_delay()
+        while pending:
+            done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+            if not done:
+                # Slower than usual: race the next endpoint, once
+                if launch() is not None:
+                    RPC_HEDGED_REQUESTS.labels(method).inc()
+                delay = None
+                continue
+
+            for future in done:
+                pending.pop(future)
+                try:
+                    return future.result()
+                except RpcEndpointError as e:
+                    # Fail over right away, even while another request is in flight
+                    errors.append(str(e))
+                    launch()
+
+        raise RpcEndpointError(f"All RPC endpoints failed: {'; '.join(errors)}")
+
+
+def _raise_for_rate_limit(content):
+    """Rate-limit answers come back as HTTP 200 with a JSON-RPC error from some providers."""
+    if b'"error"' not in content:
+        # Skip parsing large eth_getLogs answers twice
+        return
+    try:
+        payload = json.loads(content)
+    except ValueError:
+        raise RpcEndpointError("Invalid JSON-RPC response")
+    for item in payload if isinstance(payload, list) else [payload]:
+        error = item.get('error') if isinstance(item, dict) else None
+        if error and (error.get('code') == 429 or any(
+            fragment in str(error.get('message', '')).lower() for fragment in RATE_LIMIT_ERRORS
+        )):
+            raise RpcEndpointError(f"Rate limited: {error.get('message')}")
+
+
+class EndpointPoolProvider(JSONBaseProvider):
+    """web3 provider sending every request through an EndpointPool."""
+
+    def __init__(self, endpoints):
+        super().__init__()
+        self.endpoints = endpoints
+
+    def make_request(self, method, params):
+        body = self.encode_rpc_request(method, params)
+        endpoint, content = self.endpoints.request(body, method, required_block(method, params))
+        response = self.decode_rpc_response(content)
+        result = response.get('result')
+        if method == 'eth_blockNumber' and isinstance(result, str):
+            endpoint.record_head(int(result, 16))
+        elif method == 'eth_getBlockByNumber' and isinstance(result, dict) and result.get('number'):
+            endpoint.record_head(int(result['number'], 16))
+        return response
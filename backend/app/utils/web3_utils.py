@@ -1,22 +1,105 @@
-# backend/app/utils/web3_utils.py - v1.0
+# backend/app/utils/web3_utils.py - v1.13
+"""
+Web3 access to the StakingPool deployments.
+
+Nothing connects at import: `web3_manager` is a proxy that builds the
+default Web3Manager on first attribute access, once per process. A process
+forked after that (gunicorn, Celery prefork) notices the pid change and
+builds its own, so HTTP connections are never shared across processes. The
+RPC is only contacted by actual calls, so the API starts without a node.
+
+Each manager owns one keep-alive requests.Session (RPC_POOL_SIZE pooled
+connections per endpoint, RPC_TIMEOUT seconds per call) and routes both the
+web3 provider and the batched header lookups through an EndpointPool over
+its RPC endpoints (several "|"-separated URLs, see app.utils.rpc_pool). Contract reads that belong together go
+through multicall(): one aggregate3 eth_call pinned to one block.
+"""
 import json
+import logging
 import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+import requests
+from requests.adapters import HTTPAdapter
+from eth_utils import event_abi_to_log_topic
 from web3 import Web3
+from web3._utils.abi import get_abi_output_types
+from web3.exceptions import ContractLogicError
 from web3.middleware import geth_poa_middleware
 from app.config import config
+from app.utils.event_decoder import EventDecoder
+from app.utils.rpc_pool import EndpointPool, EndpointPoolProvider, split_rpc_urls
+from app.utils.prometheus_metrics import RPC_LATENCY, observe_latency
+
+logger = logging.getLogger(__name__)
+
+# Provider error fragments meaning "this block range is too big", seen across
+# geth/Infura ("query returned more than 10000 results"), Alchemy ("Log
+# response size exceeded"), QuickNode ("eth_getLogs is limited to a 10000
+# block range") and BSC/Ankr/Chainstack style limits. Splitting the range is
+# the fix for these only: rate limits and plain timeouts are retried as is.
+RANGE_LIMIT_ERRORS = (
+    'query returned more than',
+    'log response size exceeded',
+    'too many results',
+    'is limited to a',
+    'exceed maximum block range',
+    'exceeds maximum block range',
+    'block range is too',
+    'block range too large',
+    'range is too large',
+)
+
+
+def is_range_limit_error(error):
+    """True when an eth_getLogs failure should be retried on a smaller range."""
+    message = str(error).lower()
+    return any(fragment in message for fragment in RANGE_LIMIT_ERRORS)
+
+
+@lru_cache(maxsize=None)
+def _load_abi(contract_name):
+    abi_path = os.path.join(
+        os.path.dirname(__file__),
+        '..',
+        'abi',
+        f'{contract_name}.json'
+    )
+    
+    if not os.path.exists(abi_path):
+        raise FileNotFoundError(f"ABI file not found: {abi_path}")
+    
+    with open(abi_path, 'r') as f:
+        return json.load(f)
+
+
+def _rpc_session():
+    """Keep-alive session with a connection pool sized for the listener threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=config.RPC_POOL_SIZE, pool_maxsize=config.RPC_POOL_SIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
 
 class Web3Manager:
-    def __init__(self):
-        self.w3 = Web3(Web3.HTTPProvider(config.RPC_URL))
+    def __init__(self, rpc_url=None, chain_id=None, pool_address=None):
+        """
+        Defaults to the RPC_URL / CHAIN_ID / STAKING_POOL_ADDRESS deployment.
+        Makes no RPC call; connection errors surface on the first request.
+        """
+        self.rpc_url = rpc_url or config.RPC_URL
+        self.chain_id = chain_id or config.CHAIN_ID
+        self.rpc_session = _rpc_session()
+        self.endpoints = EndpointPool(split_rpc_urls(self.rpc_url), self.rpc_session)
+        self.w3 = Web3(EndpointPoolProvider(self.endpoints))
         
-        if config.CHAIN_ID in [31337, 11155111]:
+        if self.chain_id in [31337, 11155111]:
             self.w3.middleware_onion.inject(geth_poa_middleware, layer=0)
         
-        if not self.w3.is_connected():
-            raise ConnectionError(f"Failed to connect to RPC: {config.RPC_URL}")
-        
         self.staking_pool = self._load_contract(
-            config.STAKING_POOL_ADDRESS,
+            pool_address or config.STAKING_POOL_ADDRESS,
             'StakingPool'
         )
         
@@ -24,31 +107,265 @@ class Web3Manager:
             config.DAI_TOKEN_ADDRESS,
             'ERC20'
         )
-    
-    def _load_contract(self, address, contract_name):
-        abi_path = os.path.join(
-            os.path.dirname(__file__),
-            '..',
-            'abi',
-            f'{contract_name}.json'
-        )
         
-        if not os.path.exists(abi_path):
-            raise FileNotFoundError(f"ABI file not found: {abi_path}")
+        self.multicall_contract = self._load_contract(
+            config.MULTICALL_ADDRESS,
+            'Multicall3'
+        ) if config.MULTICALL_ADDRESS else None
+        # Whether MULTICALL_ADDRESS was checked for code (once, on first use)
+        self.multicall_probed = False
         
-        with open(abi_path, 'r') as f:
-            abi = json.load(f)
+        # topic0 -> event name for every event declared in the StakingPool ABI
+        self.event_topics = {
+            bytes(event_abi_to_log_topic(abi)): abi['name']
+            for abi in self.staking_pool.abi
+            if abi.get('type') == 'event'
+        }
+        self.event_decoder = EventDecoder(self.staking_pool.abi)
         
+        # Bounded LRU of block number -> {'hash', 'timestamp'}, shared by the
+        # listener threads (main loop, head subscription, backfill workers)
+        self._headers = OrderedDict()
+        self._headers_lock = threading.Lock()
+    
+    def _load_contract(self, address, contract_name):
         return self.w3.eth.contract(
             address=Web3.to_checksum_address(address),
-            abi=abi
+            abi=_load_abi(contract_name)
         )
     
+    @property
+    def pool_key(self):
+        """app.utils.pools key of this manager's StakingPool."""
+        return f"{self.chain_id}:{self.staking_pool.address.lower()}"
+    
+    def is_connected(self):
+        return self.w3.is_connected()
+    
     def get_latest_block(self):
-        return self.w3.eth.block_number
+        with observe_latency(RPC_LATENCY, 'eth_blockNumber'):
+            return self.w3.eth.block_number
+    
+    def _fetch_block_headers(self, block_numbers):
+        """
+        eth_getBlockByNumber for many blocks as batched JSON-RPC requests
+        (web3.py 6 has no batching), HEADER_BATCH_SIZE blocks per POST.
+        """
+        headers = {}
+        for start in range(0, len(block_numbers), config.HEADER_BATCH_SIZE):
+            chunk = block_numbers[start:start + config.HEADER_BATCH_SIZE]
+            payload = [
+                {
+                    'jsonrpc': '2.0',
+                    'id': block_number,
+                    'method': 'eth_getBlockByNumber',
+                    'params': [hex(block_number), False]
+                }
+                for block_number in chunk
+            ]
+            with observe_latency(RPC_LATENCY, 'eth_getBlockByNumber'):
+                endpoint, content = self.endpoints.request(
+                    json.dumps(payload).encode(), 'eth_getBlockByNumber', max(chunk)
+                )
+            
+            for item in json.loads(content):
+                if item.get('error'):
+                    raise ValueError(f"eth_getBlockByNumber({item['id']}) failed: {item['error']}")
+                block = item.get('result')
+                if block is None:
+                    raise ValueError(f"Block {item['id']} not found")
+                headers[int(block['number'], 16)] = {
+                    'hash': block['hash'],
+                    'timestamp': int(block['timestamp'], 16)
+                }
+        
+            endpoint.record_head(max(chunk))
+        
+        missing = set(block_numbers) - headers.keys()
+        if missing:
+            raise ValueError(f"No header returned for blocks {sorted(missing)}")
+        return headers
+    
+    def get_block_headers(self, block_numbers, refresh=False):
+        """
+        Map block number -> {'hash', 'timestamp'}, fetching only blocks that
+        are not cached yet (all of them with refresh=True).
+        """
+        block_numbers = sorted(set(int(n) for n in block_numbers))
+        
+        with self._headers_lock:
+            cached = {} if refresh else {
+                n: self._headers[n] for n in block_numbers if n in self._headers
+            }
+            for block_number in cached:
+                self._headers.move_to_end(block_number)
+        
+        missing = [n for n in block_numbers if n not in cached]
+        if not missing:
+            return cached
+        
+        fetched = self._fetch_block_headers(missing)
+        with self._headers_lock:
+            for block_number, header in fetched.items():
+                self._headers[block_number] = header
+                self._headers.move_to_end(block_number)
+            while len(self._headers) > config.BLOCK_HEADER_CACHE_SIZE:
+                self._headers.popitem(last=False)
+        
+        cached.update(fetched)
+        return cached
+    
+    def forget_block_headers(self, from_block):
+        """Drop cached headers from from_block up, e.g. after a reorg."""
+        with self._headers_lock:
+            for block_number in [n for n in self._headers if n >= from_block]:
+                del self._headers[block_number]
+    
+    def get_block_hashes(self, block_numbers):
+        """
+        Map block number -> block hash (0x-prefixed hex). Always asks the
+        node: callers compare these against stored hashes to detect reorgs.
+        """
+        headers = self.get_block_headers(block_numbers, refresh=True)
+        return {block_number: header['hash'] for block_number, header in headers.items()}
+    
+    def get_block_timestamps(self, events):
+        """
+        Map block number -> block timestamp for decoded events. A cached
+        header whose hash differs from an event's blockHash is stale (reorged)
+        and is fetched again.
+        """
+        headers = self.get_block_headers(e['blockNumber'] for e in events)
+        stale = {
+            e['blockNumber'] for e in events
+            if 'blockHash' in e and Web3.to_hex(e['blockHash']) != headers[e['blockNumber']]['hash']
+        }
+        if stale:
+            headers.update(self.get_block_headers(stale, refresh=True))
+        return {block_number: header['timestamp'] for block_number, header in headers.items()}
+    
+    def multicall(self, calls, block_identifier='latest', allow_failure=False):
+        """
+        Run view calls (e.g. contract.functions.totalStaked()) as a single
+        Multicall3 aggregate3 eth_call, so every result reads the same block.
+        Returns the decoded results in order, as .call() would; with
+        allow_failure=True a reverted call gives None instead of failing the
+        batch. Without MULTICALL_ADDRESS, or when nothing is deployed there
+        (e.g. the canonical address on a fresh anvil), the calls go one by
+        one, pinned to block_identifier.
+        """
+        if self.multicall_contract is not None and not self.multicall_probed:
+            with observe_latency(RPC_LATENCY, 'eth_getCode'):
+                code = self.w3.eth.get_code(self.multicall_contract.address)
+            self.multicall_probed = True
+            if not code:
+                logger.warning(
+                    f"No contract at MULTICALL_ADDRESS {self.multicall_contract.address}, "
+                    f"falling back to one eth_call per read"
+                )
+                self.multicall_contract = None
+        
+        if self.multicall_contract is None:
+            results = []
+            with observe_latency(RPC_LATENCY, 'eth_call'):
+                for call in calls:
+                    try:
+                        results.append(call.call(block_identifier=block_identifier))
+                    except ContractLogicError:
+                        if not allow_failure:
+                            raise
+                        results.append(None)
+            return results
+        
+        aggregate = [(call.address, allow_failure, call._encode_transaction_data()) for call in calls]
+        with observe_latency(RPC_LATENCY, 'eth_call'):
+            returned = self.multicall_contract.functions.aggregate3(aggregate).call(
+                block_identifier=block_identifier
+            )
+        
+        results = []
+        for call, (success, data) in zip(calls, returned):
+            if not success:
+                results.append(None)
+                continue
+            values = self.w3.codec.decode(get_abi_output_types(call.abi), data)
+            results.append(values[0] if len(values) == 1 else values)
+        return results
     
     def get_events(self, event_name, from_block, to_block):
         event = getattr(self.staking_pool.events, event_name)
         return event.get_logs(fromBlock=from_block, toBlock=to_block)
+    
+    def pool_log_filter(self, from_block, to_block):
+        """eth_getLogs filter matching every StakingPool event (topic0 OR-filter)."""
+        return {
+            'address': self.staking_pool.address,
+            'fromBlock': from_block,
+            'toBlock': to_block,
+            'topics': [[Web3.to_hex(topic) for topic in self.event_topics]]
+        }
+    
+    def decode_pool_logs(self, logs):
+        """
+        Decode raw StakingPool logs by topic0, sorted by (blockNumber, logIndex).
+        Uses the precompiled EventDecoder, web3's process_log() as fallback.
+        """
+        events = []
+        for log in logs:
+            decoded = self.event_decoder.decode(log)
+            if decoded is None:
+                event_name = self.event_topics.get(bytes(log['topics'][0]))
+                if event_name is None:
+                    continue
+                decoded = getattr(self.staking_pool.events, event_name)().process_log(log)
+            events.append(decoded)
+        
+        events.sort(key=lambda e: (e['blockNumber'], e['logIndex']))
+        return events
+    
+    def get_pool_events(self, from_block, to_block):
+        """
+        Fetch every StakingPool event in [from_block, to_block] with a single
+        eth_getLogs call, decoded and sorted in chain order.
+        """
+        with observe_latency(RPC_LATENCY, 'eth_getLogs'):
+            logs = self.w3.eth.get_logs(self.pool_log_filter(from_block, to_block))
+        return self.decode_pool_logs(logs)
+
+# Managers of this process, by pool key (None = default deployment); rebuilt after a fork
+_managers = {}
+_managers_pid = None
+_managers_lock = threading.Lock()
+
+
+def _get_manager(key, factory):
+    global _managers_pid
+    with _managers_lock:
+        if _managers_pid != os.getpid():
+            _managers.clear()
+            _managers_pid = os.getpid()
+        if key not in _managers:
+            _managers[key] = factory()
+        return _managers[key]
+
+
+def get_web3_manager():
+    """The default deployment's Web3Manager for this process, created on first use."""
+    return _get_manager(None, Web3Manager)
+
+
+def get_pool_manager(pool):
+    """Web3Manager for an app.utils.pools.Pool, one per pool per process."""
+    if pool.key == f"{config.CHAIN_ID}:{str(config.STAKING_POOL_ADDRESS).lower()}" and pool.rpc_url == config.RPC_URL:
+        return get_web3_manager()
+    return _get_manager(pool.key, lambda: Web3Manager(pool.rpc_url, pool.chain_id, pool.address))
+
+
+class _LazyWeb3Manager:
+    """Stand-in for the default Web3Manager; resolves per process on attribute access."""
+    
+    def __getattr__(self, name):
+        return getattr(get_web3_manager(), name)
+
 
-web3_manager = Web3Manager()
\ No newline at end of file
+web3_manager = _LazyWeb3Manager()
\ No newline at end of file
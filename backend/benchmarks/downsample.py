@@ -0,0 +1,82 @@
+# backend/benchmarks/downsample.py - v1.0
+"""
+Sparkline downsampling check: every-nth sampling (aggregate_metrics_to_points)
+vs LTTB and min-max (downsample_series) on a synthetic TVL series.
+
+Builds --hours of 5-minute TVL snapshots (a random walk with one upward and
+one downward spike), reduces them to --points points each way and prints,
+per method: whether both spikes and the first point survived, the largest
+gap between the true and the drawn extremes, and the time taken. Also
+prints how many documents the old query (every raw snapshot) and the
+bucketed one (Metric.get_series: at most 4 per bin) transfer. No MongoDB
+needed.
+
+Usage (from backend/):
+    python -m benchmarks.downsample [--hours 720] [--points 50] [--repeat 20]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from app.utils.analytics_helpers import aggregate_metrics_to_points, downsample_series
+
+WEI = 10**18
+
+
+def synthetic_series(hours, seed=1):
+    """Ascending 5-minute TVL points with a spike up at 60% and down at 80% of the window."""
+    rng = random.Random(seed)
+    count = hours * 12
+    start = datetime(2026, 1, 1)
+    value = 1_000_000 * WEI
+    points = []
+    for i in range(count):
+        value += int(rng.gauss(0, 1_000) * WEI)
+        points.append({'timestamp': start + timedelta(minutes=5 * i), 'value': value})
+    points[int(count * 0.6) + 7]['value'] += 500_000 * WEI
+    points[int(count * 0.8) + 3]['value'] -= 400_000 * WEI
+    return points
+
+
+def report(name, series, sampled, seconds):
+    values = [point['value'] for point in series]
+    drawn = [point['value'] for point in sampled]
+    high, low = max(values), min(values)
+    print(
+        f"{name:<10} points={len(sampled):<4} "
+        f"spikes={'kept' if high in drawn and low in drawn else 'LOST':<4} "
+        f"baseline={'kept' if sampled[0] is series[0] else 'LOST':<4} "
+        f"extreme_gap={max(high - max(drawn), min(drawn) - low) / WEI:>12,.0f} DAI "
+        f"{seconds * 1000:8.2f} ms"
+    )
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sparkline downsampling: every-nth vs LTTB vs min-max')
+    parser.add_argument('--hours', type=int, default=720)
+    parser.add_argument('--points', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    series = synthetic_series(args.hours)
+    bin_minutes = max(5, -(-args.hours * 60 // args.points))
+    print(f"{len(series)} raw snapshots over {args.hours}h -> {args.points} points")
+    print(f"transfer: {len(series)} full documents before, "
+          f"<= {4 * -(-args.hours * 60 // bin_minutes)} (timestamp, value) pairs bucketed by MongoDB")
+
+    sampled, seconds = timed(lambda: aggregate_metrics_to_points(series, args.points), args.repeat)
+    report('every-nth', series, sampled, seconds)
+    for method in ('lttb', 'minmax'):
+        sampled, seconds = timed(lambda: downsample_series(series, args.points, method=method), args.repeat)
+        report(method, series, sampled, seconds)
+
+
+if __name__ == '__main__':
+    main()
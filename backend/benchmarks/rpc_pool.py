@@ -0,0 +1,118 @@
+# backend/benchmarks/rpc_pool.py - v1.0
+"""
+Routing / hedging check of app.utils.rpc_pool.EndpointPool against local fake
+JSON-RPC nodes.
+
+Starts one HTTP server per --node spec, each answering eth_blockNumber
+after an injected delay, and sends --requests reads through an
+EndpointPool: once with hedging off, once with it on. Prints latency
+percentiles and which node answered. No real node needed.
+
+Node spec: NAME:DELAY_MS[:SLOW_RATE:SLOW_MS[:ERROR_RATE]]
+    fast:20:0.03:800     20ms, but 3% of requests stall for 800ms
+    steady:60            always 60ms
+    flaky:10:0:0:0.5     10ms, half of the requests answer HTTP 503
+
+Usage (from backend/):
+    python -m benchmarks.rpc_pool [--requests 500] [--node fast:20:0.03:800 --node steady:60]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from app.config import config
+from app.utils.rpc_pool import EndpointPool, RpcEndpointError
+
+DEFAULT_NODES = ['fast:20:0.03:800', 'steady:60', 'flaky:10:0:0:0.5']
+
+
+def parse_node(spec):
+    name, *numbers = spec.split(':')
+    delay_ms, slow_rate, slow_ms, error_rate = (list(map(float, numbers)) + [0, 0, 0, 0])[:4]
+    return name, delay_ms / 1000, slow_rate, slow_ms / 1000, error_rate
+
+
+def start_fake_node(name, delay, slow_rate, slow_delay, error_rate, seed):
+    """Serve a fake JSON-RPC node on a free local port; returns its URL."""
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            with lock:
+                slow = rng.random() < slow_rate
+                failed = rng.random() < error_rate
+            time.sleep(slow_delay if slow else delay)
+
+            if failed:
+                self.send_response(503)
+                self.end_headers()
+                return
+            body = json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': hex(1000), 'node': name}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/{name}"
+
+
+def run(urls, count, hedge_percentile):
+    config.RPC_HEDGE_PERCENTILE = hedge_percentile
+    pool = EndpointPool(urls, requests.Session())
+    latencies = []
+    answered_by = Counter()
+    failures = 0
+
+    for request_id in range(count):
+        body = json.dumps({'jsonrpc': '2.0', 'id': request_id, 'method': 'eth_blockNumber', 'params': []}).encode()
+        started_at = time.perf_counter()
+        try:
+            _, content = pool.request(body, 'eth_blockNumber')
+        except RpcEndpointError:
+            failures += 1
+            continue
+        latencies.append(time.perf_counter() - started_at)
+        answered_by[json.loads(content)['node']] += 1
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000 if latencies else 0
+
+    label = f"hedge p{hedge_percentile:g}" if hedge_percentile else "no hedging"
+    print(f"{label:>12}: p50 {percentile(50):6.1f}ms  p95 {percentile(95):6.1f}ms  "
+          f"p99 {percentile(99):6.1f}ms  max {percentile(100):6.1f}ms  failed {failures}")
+    print(f"{'':>12}  answered by {dict(answered_by)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EndpointPool routing and hedging against fake nodes')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--node', action='append', default=None,
+                        help='NAME:DELAY_MS[:SLOW_RATE:SLOW_MS[:ERROR_RATE]] (repeatable)')
+    parser.add_argument('--percentile', type=float, default=95, help='Hedge percentile of the hedged run')
+    args = parser.parse_args()
+
+    urls = [
+        start_fake_node(*parse_node(spec), seed=index)
+        for index, spec in enumerate(args.node or DEFAULT_NODES)
+    ]
+    print(f"{args.requests} eth_blockNumber requests over {len(urls)} fake nodes")
+    run(urls, args.requests, 0)
+    run(urls, args.requests, args.percentile)
+
+
+if __name__ == '__main__':
+    main()
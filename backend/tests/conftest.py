@@ -0,0 +1,16 @@
+# backend/tests/conftest.py - v1.0
+"""
+Shared test setup. Run from backend/:
+
+    python -m pytest
+
+app.config reads the environment at import, so the defaults the app needs
+to import are set here, before any test module imports it. Tests needing a
+MongoDB server use TEST_MONGODB_URI and are skipped without it.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('STAKING_POOL_ADDRESS', '0x' + '11' * 20)
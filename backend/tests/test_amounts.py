@@ -0,0 +1,42 @@
+# backend/tests/test_amounts.py - v1.0
+"""Decimal128 amount encoding (app.utils.mongodb_helpers) past its 34 exact digits."""
+from datetime import datetime
+from bson.decimal128 import Decimal128
+from app.services.blockchain_listener import BlockchainListener
+from app.services.event_batch import EventBatch
+from app.services.rebuild_projections import raw_event_to_event
+from app.utils.mongodb_helpers import MAX_AMOUNT, amount_overflows, decode_amount, encode_amount
+
+
+def test_encode_amount_exact_up_to_34_digits():
+    assert decode_amount(encode_amount(MAX_AMOUNT)) == MAX_AMOUNT
+    assert decode_amount(encode_amount(-MAX_AMOUNT)) == -MAX_AMOUNT
+    assert not amount_overflows(MAX_AMOUNT)
+
+
+def test_encode_amount_clamps_larger_values():
+    assert amount_overflows(MAX_AMOUNT + 1)
+    assert decode_amount(encode_amount(10**40 + 1)) == MAX_AMOUNT
+    assert decode_amount(encode_amount(-(10**40 + 1))) == -MAX_AMOUNT
+
+
+def test_raw_event_keeps_exact_overflowing_amount():
+    huge = 10**40 + 1
+    event = {
+        'event': 'Unstaked',
+        'args': {'user': '0x' + '22' * 20, 'stakeIndex': 0, 'amount': huge, 'rewards': 5},
+        'transactionHash': bytes(32),
+        'blockNumber': 10,
+        'logIndex': 0,
+        'blockTime': 1_700_000_000
+    }
+    batch = EventBatch('default')
+    BlockchainListener.store_raw_event(None, event, batch)
+    doc = batch.entries[0]['raw']
+
+    assert doc['args']['amount'] == Decimal128(str(MAX_AMOUNT))
+    assert doc['amount_overflow'] == {'amount': str(huge)}
+    assert doc['block_time'] == datetime.utcfromtimestamp(1_700_000_000)
+    # The projection rebuild replays the exact value
+    assert raw_event_to_event(doc)['args']['amount'] == huge
+    assert raw_event_to_event(doc)['args']['rewards'] == 5
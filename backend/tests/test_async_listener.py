@@ -0,0 +1,39 @@
+# backend/tests/test_async_listener.py - v1.0
+"""The async fetcher continues after backfilled blocks, like the sync listener."""
+import asyncio
+import pytest
+from app.config import config
+from app.services.async_listener import AsyncBlockchainListener
+
+
+@pytest.mark.asyncio
+async def test_fetcher_queues_backfilled_blocks_as_an_empty_range(monkeypatch):
+    listener = AsyncBlockchainListener.__new__(AsyncBlockchainListener)
+    listener.pool_key = 'default'
+    listener.batch_size = 10
+    listener.queue = asyncio.Queue()
+    fetched = []
+
+    async def get_head_async():
+        return 1000 + config.CONFIRMATION_DEPTH
+
+    async def fetch_events_async(from_block, to_block):
+        fetched.append((from_block, to_block))
+        return []
+
+    monkeypatch.setattr(listener, 'get_head_async', get_head_async, raising=False)
+    monkeypatch.setattr(listener, 'fetch_events_async', fetch_events_async, raising=False)
+    monkeypatch.setattr(listener, 'publish_contract_info', lambda head: None, raising=False)
+    monkeypatch.setattr(listener, 'skip_backfilled', lambda last_block: 500, raising=False)
+    monkeypatch.setattr(listener, 'attach_block_times', lambda events: events, raising=False)
+    monkeypatch.setattr(listener, 'resize_window', lambda *args: None, raising=False)
+
+    task = asyncio.create_task(listener.fetcher(100))
+    skipped = await listener.queue.get()
+    following = await listener.queue.get()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert skipped == (101, 500, [])
+    assert following == (501, 510, [])
+    assert fetched[0] == (501, 510)
@@ -0,0 +1,72 @@
+# backend/tests/test_backfill.py - v1.0
+"""The backfill never applies blocks the live listener may be applying too."""
+import pytest
+from app.config import config
+from app.services import backfill
+
+
+class FakeListener:
+    pool_key = 'default'
+
+    def __init__(self, pool=None):
+        pass
+
+    def get_last_processed_block(self):
+        return 100
+
+
+class FakeLease:
+    available = True
+    instances = []
+
+    def __init__(self, pool):
+        self.released = False
+        FakeLease.instances.append(self)
+
+    def try_hold(self):
+        return FakeLease.available
+
+    def release(self):
+        self.released = True
+
+
+@pytest.fixture
+def applied(monkeypatch):
+    calls = []
+    monkeypatch.setattr(backfill, 'require_event_index', lambda: None)
+    monkeypatch.setattr(backfill, 'BlockchainListener', FakeListener)
+    monkeypatch.setattr(backfill, 'ListenerLease', FakeLease)
+    monkeypatch.setattr(backfill, 'apply_shards', lambda listener, start, end, *args: calls.append((start, end)))
+    monkeypatch.setattr(config, 'LISTENER_LEASE_TTL', 0)
+    FakeLease.available = True
+    FakeLease.instances = []
+    return calls
+
+
+def test_refuses_blocks_past_the_checkpoint_without_lease(applied):
+    backfill.run_backfill(from_block=101, to_block=200)
+    assert applied == []
+
+
+def test_history_below_the_checkpoint_is_allowed(applied):
+    backfill.run_backfill(from_block=1, to_block=100)
+    assert applied == [(1, 100)]
+
+
+def test_listener_stopped_allows_blocks_past_the_checkpoint(applied):
+    backfill.run_backfill(from_block=101, to_block=200, listener_stopped=True)
+    assert applied == [(101, 200)]
+
+
+def test_takes_the_listener_lease(applied, monkeypatch):
+    monkeypatch.setattr(config, 'LISTENER_LEASE_TTL', 5)
+    backfill.run_backfill(from_block=101, to_block=200)
+    assert applied == [(101, 200)]
+    assert FakeLease.instances[0].released
+
+
+def test_refuses_while_a_listener_holds_the_lease(applied, monkeypatch):
+    monkeypatch.setattr(config, 'LISTENER_LEASE_TTL', 5)
+    FakeLease.available = False
+    backfill.run_backfill(from_block=101, to_block=200, listener_stopped=True)
+    assert applied == []
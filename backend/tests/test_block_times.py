@@ -0,0 +1,82 @@
+# backend/tests/test_block_times.py - v1.0
+"""Stake timestamps come from block time, and the migration stamps it on old raw events."""
+from datetime import datetime
+from app.models.stake import Stake
+from app.services.pool_listeners import fill_block_times, missing_block_time_query
+
+BLOCK_TIME = 1_700_000_000
+
+
+def stake_created(**extra):
+    return dict({
+        'user': '0x' + 'AB' * 20,
+        'stakeIndex': 3,
+        'amount': 10**18,
+        'tierId': 1,
+        'timestamp': BLOCK_TIME - 12,
+        'transactionHash': bytes(32),
+        'blockNumber': 100,
+        'pool': 'default'
+    }, **extra)
+
+
+def test_stake_build_uses_block_time():
+    first = Stake.build(stake_created(blockTime=BLOCK_TIME))
+    assert first['created_at'] == first['updated_at'] == datetime.utcfromtimestamp(BLOCK_TIME)
+    # A replay builds the same document
+    assert Stake.build(stake_created(blockTime=BLOCK_TIME)) == first
+    # Without blockTime: the stake's own on-chain timestamp
+    assert Stake.build(stake_created())['created_at'] == datetime.utcfromtimestamp(BLOCK_TIME - 12)
+
+
+def test_create_op_leaves_updated_at_to_later_events():
+    update = Stake.create_op(stake_created(blockTime=BLOCK_TIME))._doc
+    assert 'updated_at' not in update['$set']
+    assert update['$setOnInsert']['updated_at'] == datetime.utcfromtimestamp(BLOCK_TIME)
+
+
+class FakeRawEvents:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def distinct(self, field, query):
+        assert query == missing_block_time_query('default')
+        return sorted({doc[field] for doc in self.docs if doc['pool'] == 'default' and 'block_time' not in doc})
+
+    def bulk_write(self, ops, ordered):
+        for op in ops:
+            for doc in self.docs:
+                if all(doc.get(key) == value for key, value in op._filter.items() if key != 'block_time') \
+                        and 'block_time' not in doc:
+                    doc.update(op._doc['$set'])
+
+
+class FakeWeb3:
+    def __init__(self):
+        self.requested = []
+
+    def get_block_headers(self, blocks):
+        self.requested.append(list(blocks))
+        return {block: {'timestamp': BLOCK_TIME + block} for block in blocks}
+
+
+def test_fill_block_times():
+    stamped = datetime.utcfromtimestamp(1)
+    docs = [
+        {'pool': 'default', 'block_number': 5},
+        {'pool': 'default', 'block_number': 5},
+        {'pool': 'default', 'block_number': 7},
+        {'pool': 'default', 'block_number': 8, 'block_time': stamped},
+        {'pool': 'other', 'block_number': 9},
+    ]
+    web3 = FakeWeb3()
+    fill_block_times(web3, 'default', chunk_size=1, database={'raw_events': FakeRawEvents(docs)})
+
+    assert web3.requested == [[5], [7]]
+    assert [doc.get('block_time') for doc in docs] == [
+        datetime.utcfromtimestamp(BLOCK_TIME + 5),
+        datetime.utcfromtimestamp(BLOCK_TIME + 5),
+        datetime.utcfromtimestamp(BLOCK_TIME + 7),
+        stamped,
+        None,
+    ]
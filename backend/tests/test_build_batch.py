@@ -0,0 +1,60 @@
+# backend/tests/test_build_batch.py - v1.0
+"""Where BlockchainListener.build_batch reports the events its handlers fail on."""
+import pytest
+from app.services.blockchain_listener import BlockchainListener
+
+
+class FakeRangeRecovery:
+    def __init__(self):
+        self.failures = []
+
+    def record_failure(self, from_block, to_block, error, event_name=None):
+        self.failures.append((from_block, to_block, event_name))
+
+
+def listener():
+    listener = BlockchainListener.__new__(BlockchainListener)
+    listener.pool_key = 'default'
+    listener.range_recovery = FakeRangeRecovery()
+    return listener
+
+
+def rewards_claimed(block_number, **args):
+    return {
+        'event': 'RewardsClaimed',
+        'args': dict({'user': '0x' + '33' * 20, 'stakeIndex': 0}, **args),
+        'transactionHash': bytes(32),
+        'blockNumber': block_number,
+        'logIndex': 0,
+        'blockTime': 1_700_000_000
+    }
+
+
+# The second event has no rewards: its handler fails
+EVENTS = [rewards_claimed(10, rewards=5), rewards_claimed(11)]
+
+
+def test_failures_queue_live_retries_by_default():
+    live = listener()
+    batch = live.build_batch(EVENTS)
+    assert batch.event_count == 1
+    assert live.range_recovery.failures == [(11, 11, 'RewardsClaimed')]
+
+
+def test_failure_sink_replaces_live_retries():
+    rebuild = listener()
+    failures = []
+    batch = rebuild.build_batch(
+        EVENTS, failure_sink=lambda start, end, error, event_name: failures.append((start, event_name))
+    )
+    assert batch.event_count == 1
+    assert failures == [(11, 'RewardsClaimed')]
+    assert rebuild.range_recovery.failures == []
+
+
+def test_failure_sink_can_abort():
+    def fail(start, end, error, event_name):
+        raise RuntimeError(f"{event_name} at block {start}: {error}")
+
+    with pytest.raises(RuntimeError, match='RewardsClaimed at block 11'):
+        listener().build_batch(EVENTS, failure_sink=fail)
@@ -0,0 +1,178 @@
+# backend/tests/test_event_batch.py - v1.0
+"""
+EventBatch.commit replays: a batch that dies after its projection writes
+must not count its $inc deltas twice when the range is re-applied.
+"""
+import pytest
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from app.services.event_batch import DUPLICATE_KEY_ERROR, EventBatch
+from app.utils.mongodb_helpers import decode_amount
+
+USER = '0x' + '44' * 20
+
+
+class Crash(BaseException):
+    """The process dying mid-commit."""
+
+
+class Result:
+    def __init__(self, modified_count):
+        self.modified_count = modified_count
+
+
+def matches(doc, query):
+    for field, condition in query.items():
+        if field == '$or':
+            if not any(matches(doc, alternative) for alternative in condition):
+                return False
+        elif isinstance(condition, dict) and '$in' in condition:
+            if doc.get(field) not in condition['$in']:
+                return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+class FakeCollection:
+    """The few pymongo calls EventBatch.commit makes, on flat documents."""
+
+    def __init__(self, name, unique=None, fail_on_write=None):
+        self.name = name
+        self.docs = []
+        self.unique = unique
+        self.fail_on_write = fail_on_write
+
+    def apply_update(self, doc, update, inserted):
+        for field, value in update.get('$set', {}).items():
+            doc[field] = value
+        if inserted:
+            for field, value in update.get('$setOnInsert', {}).items():
+                doc[field] = value
+        for field in update.get('$unset', {}):
+            doc.pop(field, None)
+        for field, value in update.get('$inc', {}).items():
+            doc[field] = decode_amount(doc.get(field)) + decode_amount(value)
+
+    def update_many(self, query, update):
+        matched = [doc for doc in self.docs if matches(doc, query)]
+        for doc in matched:
+            self.apply_update(doc, update, False)
+        return Result(len(matched))
+
+    def find(self, query, projection=None):
+        return [dict(doc) for doc in self.docs if matches(doc, query)]
+
+    def bulk_write(self, ops, ordered=True):
+        if self.fail_on_write:
+            self.fail_on_write(self)
+        errors = []
+        for index, op in enumerate(ops):
+            if isinstance(op, InsertOne):
+                doc = op._doc
+                doc.setdefault('_id', ObjectId())
+                key = tuple(doc.get(field) for field in self.unique)
+                if any(tuple(other.get(field) for field in self.unique) == key for other in self.docs):
+                    errors.append({'index': index, 'code': DUPLICATE_KEY_ERROR})
+                    continue
+                self.docs.append(dict(doc))
+            else:
+                assert isinstance(op, UpdateOne)
+                doc = next((doc for doc in self.docs if matches(doc, op._filter)), None)
+                inserted = doc is None
+                if inserted:
+                    doc = dict(op._filter)
+                    self.docs.append(doc)
+                self.apply_update(doc, op._doc, inserted)
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'nInserted': len(ops) - len(errors)})
+
+
+class FakeDatabase(dict):
+    def __init__(self):
+        super().__init__(
+            raw_events=FakeCollection('raw_events', unique=('transaction_hash', 'log_index')),
+            stakes=FakeCollection('stakes'),
+            users=FakeCollection('users'),
+            pool_stats=FakeCollection('pool_stats'),
+            undo_journal=FakeCollection('undo_journal')
+        )
+
+
+def stake_batch():
+    """One StakeCreated-like event: a user counter and the pool TVL move by 100."""
+    batch = EventBatch('default')
+    batch.add_raw_event({'transaction_hash': '0xaa', 'log_index': 0, 'block_number': 10})
+    batch.add_stake_op(UpdateOne({'user_address': USER, 'stake_index': 0}, {'$set': {'amount': Decimal128('100')}}, upsert=True))
+    batch.increment_user(USER, 'total_staked', 100)
+    batch.set_stake_state(USER, 0, {'status': 'active', 'tier_id': 1, 'amount': 100})
+    return batch
+
+
+def totals(database):
+    user = database['users'].docs[0] if database['users'].docs else {}
+    stats = database['pool_stats'].docs[0] if database['pool_stats'].docs else {}
+    return decode_amount(user.get('total_staked')), decode_amount(stats.get('tvl'))
+
+
+def test_replay_applies_once():
+    database = FakeDatabase()
+    assert stake_batch().commit(database) == 1
+    assert stake_batch().commit(database) == 0
+    assert totals(database) == (100, 100)
+
+
+def test_crash_after_projection_writes_is_not_counted_twice():
+    database = FakeDatabase()
+    pool_stats = database['pool_stats']
+    original = pool_stats.bulk_write
+
+    def write_then_crash(ops, ordered=True):
+        original(ops, ordered)
+        raise Crash()
+
+    pool_stats.bulk_write = write_then_crash
+    with pytest.raises(Crash):
+        stake_batch().commit(database, block_hashes={10: '0x10'})
+    assert totals(database) == (100, 100)
+
+    # The listener restarts from its checkpoint and re-applies the range
+    pool_stats.bulk_write = original
+    assert stake_batch().commit(database) == 0
+    assert totals(database) == (100, 100)
+
+
+def test_failure_before_any_projection_write_releases_the_claim():
+    database = FakeDatabase()
+
+    def unreachable(collection):
+        raise ConnectionError('stakes unreachable')
+
+    database['stakes'].fail_on_write = unreachable
+    with pytest.raises(ConnectionError):
+        stake_batch().commit(database)
+    assert totals(database) == (0, 0)
+    assert database['raw_events'].docs[0]['applied'] is False
+
+    database['stakes'].fail_on_write = None
+    assert stake_batch().commit(database) == 1
+    assert totals(database) == (100, 100)
+    assert database['raw_events'].docs[0]['applied'] is True
+
+
+def test_event_claimed_by_another_writer_is_skipped():
+    database = FakeDatabase()
+    batch = stake_batch()
+    raw_events = database['raw_events']
+    original = raw_events.update_many
+
+    def claimed_first(query, update):
+        # A concurrent writer claims the stored copy between our insert and our claim
+        original({'applied': False}, {'$set': {'applied': True, 'claim': 'other'}})
+        return original(query, update)
+
+    raw_events.update_many = claimed_first
+    assert batch.commit(database) == 0
+    assert totals(database) == (0, 0)
@@ -0,0 +1,201 @@
+# backend/tests/test_head_subscription.py - v1.0
+"""
+Push-based head tracking (app.services.head_subscription) against a small
+in-process fake JSON-RPC websocket node, and against anvil when
+TEST_ANVIL_URL is set (e.g. http://127.0.0.1:8545, websocket on the same
+port):
+
+    anvil &
+    TEST_ANVIL_URL=http://127.0.0.1:8545 python -m pytest tests/test_head_subscription.py
+"""
+import asyncio
+import json
+import os
+import time
+import pytest
+import requests
+import websockets
+from app.services import head_subscription
+from app.services.blockchain_listener import BlockchainListener
+from app.services.head_subscription import HeadSubscription
+
+SUBSCRIPTION_ID = '0x9cef478923ff08bf67fde6c64013158d'
+
+
+class FakeNode:
+    """Answers eth_subscribe / eth_blockNumber and pushes newHeads to every subscriber."""
+
+    def __init__(self, subscribe_error=None):
+        self.subscribe_error = subscribe_error
+        self.head = 0
+        self.connections = set()
+        self.server = None
+
+    async def handler(self, ws, path=None):
+        self.connections.add(ws)
+        try:
+            async for message in ws:
+                request = json.loads(message)
+                reply = {'jsonrpc': '2.0', 'id': request['id']}
+                if request['method'] == 'eth_subscribe' and self.subscribe_error:
+                    reply['error'] = {'code': -32601, 'message': self.subscribe_error}
+                elif request['method'] == 'eth_subscribe':
+                    reply['result'] = SUBSCRIPTION_ID
+                else:
+                    reply['result'] = hex(self.head)
+                await ws.send(json.dumps(reply))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.connections.discard(ws)
+
+    async def start(self):
+        self.server = await websockets.serve(self.handler, '127.0.0.1', 0)
+        return f"ws://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def announce(self, number, subscription=SUBSCRIPTION_ID):
+        self.head = number
+        notification = json.dumps({
+            'jsonrpc': '2.0',
+            'method': 'eth_subscription',
+            'params': {'subscription': subscription, 'result': {'number': hex(number)}}
+        })
+        for ws in list(self.connections):
+            await ws.send(notification)
+
+    async def drop_connections(self):
+        for ws in list(self.connections):
+            await ws.close()
+
+
+async def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not met in time'
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture(autouse=True)
+def fast_reconnect(monkeypatch):
+    monkeypatch.setattr(head_subscription, 'RECONNECT_MIN_DELAY', 0.05)
+
+
+@pytest.mark.asyncio
+async def test_heads_are_pushed():
+    node = FakeNode()
+    subscription = HeadSubscription(await node.start())
+    task = asyncio.create_task(subscription.run())
+    try:
+        await wait_until(lambda: subscription.connected)
+        await node.announce(5)
+        await wait_until(lambda: subscription.latest_head == 5)
+
+        # Another subscription's notifications are ignored
+        await node.announce(6, subscription='0x1')
+        await node.announce(7)
+        await wait_until(lambda: subscription.latest_head == 7)
+        assert subscription.new_head_sync.is_set()
+    finally:
+        task.cancel()
+        await node.stop()
+
+
+@pytest.mark.asyncio
+async def test_disconnect_falls_back_and_reconnect_wakes_consumers():
+    node = FakeNode()
+    subscription = HeadSubscription(await node.start())
+    task = asyncio.create_task(subscription.run())
+    try:
+        await wait_until(lambda: subscription.connected)
+        await node.announce(10)
+        await wait_until(lambda: subscription.latest_head == 10)
+
+        subscription.new_head_sync.clear()
+        await node.drop_connections()
+        await wait_until(lambda: not subscription.connected)
+        # Stale head dropped: the listener polls the RPC meanwhile
+        assert subscription.latest_head is None
+        assert subscription.new_head_sync.is_set()
+
+        subscription.new_head_sync.clear()
+        await wait_until(lambda: subscription.connected)
+        # Woken on reconnect so the gap since the checkpoint is reconciled
+        assert subscription.new_head_sync.is_set()
+        await node.announce(12)
+        await wait_until(lambda: subscription.latest_head == 12)
+    finally:
+        task.cancel()
+        await node.stop()
+
+
+@pytest.mark.asyncio
+async def test_rejected_subscription_stays_on_polling():
+    node = FakeNode(subscribe_error='the method eth_subscribe does not exist')
+    subscription = HeadSubscription(await node.start())
+    task = asyncio.create_task(subscription.run())
+    try:
+        await asyncio.sleep(0.3)
+        assert not subscription.connected
+        assert subscription.latest_head is None
+    finally:
+        task.cancel()
+        await node.stop()
+
+
+class FakeManager:
+    def __init__(self, head):
+        self.head = head
+        self.calls = 0
+
+    def get_latest_block(self):
+        self.calls += 1
+        return self.head
+
+
+def test_listener_head_source():
+    listener = BlockchainListener.__new__(BlockchainListener)
+    listener.web3 = FakeManager(head=40)
+    listener.poll_interval = 0
+    listener.head_subscription = HeadSubscription('ws://unused')
+
+    # Not connected: polled from the RPC
+    assert listener.get_head() == 40
+    assert listener.web3.calls == 1
+
+    # Connected: the pushed head, no RPC call
+    listener.head_subscription.connected = True
+    listener.head_subscription.latest_head = 42
+    assert listener.get_head() == 42
+    assert listener.web3.calls == 1
+
+    # Pushed head wakes the sync loop before HEAD_TIMEOUT
+    listener.head_subscription.new_head_sync.set()
+    started = time.monotonic()
+    listener.wait_for_head()
+    assert time.monotonic() - started < 1
+    assert not listener.head_subscription.new_head_sync.is_set()
+
+
+@pytest.mark.asyncio
+async def test_anvil_new_heads():
+    url = os.getenv('TEST_ANVIL_URL')
+    if not url:
+        pytest.skip('TEST_ANVIL_URL not set')
+
+    def rpc(method):
+        response = requests.post(url, json={'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': []}, timeout=5)
+        return response.json()['result']
+
+    subscription = HeadSubscription(url.replace('http', 'ws', 1))
+    task = asyncio.create_task(subscription.run())
+    try:
+        await wait_until(lambda: subscription.connected)
+        head = int(await asyncio.to_thread(rpc, 'eth_blockNumber'), 16)
+        await asyncio.to_thread(rpc, 'evm_mine')
+        await wait_until(lambda: subscription.latest_head == head + 1)
+    finally:
+        task.cancel()
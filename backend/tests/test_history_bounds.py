@@ -0,0 +1,23 @@
+# backend/tests/test_history_bounds.py - v1.0
+"""The history endpoints reject windows past the coarsest metric tier's retention before querying."""
+import pytest
+from flask import Flask
+from app.api.analytics import analytics_bp
+from app.api.tvl_sparkline import tvl_sparkline_bp
+from app.models.metric import MAX_HOURS
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
+    app.register_blueprint(tvl_sparkline_bp, url_prefix='/api/analytics/tvl')
+    return app.test_client()
+
+
+@pytest.mark.parametrize('path', ['/api/analytics/history', '/api/analytics/tvl/sparkline'])
+@pytest.mark.parametrize('hours', [0, MAX_HOURS + 1, 10**12])
+def test_out_of_range_hours(client, path, hours):
+    response = client.get(f'{path}?hours={hours}')
+    assert response.status_code == 400
+    assert str(MAX_HOURS) in response.get_json()['error']
@@ -0,0 +1,68 @@
+# backend/tests/test_pool_stats.py - v1.0
+"""pool_stats is seeded from the stakes of pools that have none, before the listener's first delta."""
+from bson.decimal128 import Decimal128
+from app.models.pool_stats import PoolStats
+from app.utils.mongodb_helpers import decode_amount
+
+
+class FakeStakes:
+    def __init__(self, stakes):
+        self.stakes = stakes
+        self.pipelines = []
+
+    def distinct(self, field):
+        return sorted({stake[field] for stake in self.stakes})
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        stakes = self.stakes
+        if '$match' in pipeline[0]:
+            stakes = [stake for stake in stakes if stake['pool'] in pipeline[0]['$match']['pool']['$in']]
+        groups = {}
+        for stake in stakes:
+            key = (stake['pool'], stake['status'], stake['tier_id'])
+            group = groups.setdefault(key, {'count': 0, 'amount': 0})
+            group['count'] += 1
+            group['amount'] += decode_amount(stake['amount'])
+        return [
+            {'_id': {'pool': pool, 'status': status, 'tier_id': tier_id},
+             'count': group['count'], 'amount': Decimal128(str(group['amount']))}
+            for (pool, status, tier_id), group in groups.items()
+        ]
+
+
+class FakeStats:
+    def __init__(self, docs):
+        self.docs = {doc['_id']: doc for doc in docs}
+
+    def distinct(self, field):
+        return list(self.docs)
+
+    def update_one(self, query, update, upsert=False):
+        self.docs.setdefault(query['_id'], update['$setOnInsert'])
+
+
+def stake(pool, status, amount, tier_id=1):
+    return {'pool': pool, 'status': status, 'tier_id': tier_id, 'amount': Decimal128(str(amount))}
+
+
+def test_seed_missing_only_creates_absent_documents():
+    stakes = FakeStakes([
+        stake('1:0xa', 'active', 100),
+        stake('1:0xa', 'active', 50, tier_id=2),
+        stake('1:0xa', 'unstaked', 30),
+        stake('1:0xb', 'active', 7),
+    ])
+    existing = {'_id': '1:0xb', 'pool': '1:0xb', 'tvl': Decimal128('999')}
+    stats = FakeStats([existing])
+
+    assert PoolStats.seed_missing(stakes, stats) == ['1:0xa']
+    seeded = stats.docs['1:0xa']
+    assert decode_amount(seeded['tvl']) == 150
+    assert seeded['stakes'] == {'active': 2, 'unstaked': 1, 'emergency_withdrawn': 0}
+    assert seeded['tiers']['2']['count'] == 1
+    # Only the missing pool was aggregated; the existing document is left alone
+    assert stakes.pipelines[0][0] == {'$match': {'pool': {'$in': ['1:0xa']}}}
+    assert stats.docs['1:0xb'] is existing
+
+    assert PoolStats.seed_missing(stakes, stats) == []
@@ -0,0 +1,71 @@
+# backend/tests/test_query_shapes.py - v1.0
+"""
+Index spec vs query shapes (app.models.indexes, app.models.query_shapes).
+
+test_query_plans explains every shape against a scratch database indexed
+by the migrate command and fails on a collection scan; it needs a MongoDB 7
+server:
+
+    TEST_MONGODB_URI=mongodb://localhost:27017 python -m pytest tests/test_query_shapes.py
+"""
+import os
+import pytest
+from app.models.indexes import EVENT_KEY, INDEXES, migrate_collections, migrate_indexes, require_event_index
+from app.models.query_shapes import check_query_plans, query_shapes
+
+
+class FakeCollection:
+    def __init__(self, indexes):
+        self.indexes = indexes
+
+    def index_information(self):
+        return self.indexes
+
+
+def test_every_shape_targets_an_indexed_collection():
+    for label, command, full_scan in query_shapes():
+        collection = next(iter(command.values()))
+        assert full_scan or collection in INDEXES, f"{label}: {collection} has no index spec"
+
+
+def test_shapes_come_from_the_code_builders():
+    from app.models.stake import Stake
+    from app.services.reorg import blocks_query
+    from app.utils.pools import default_pool
+
+    shapes = {label: command for label, command, _ in query_shapes()}
+    assert shapes['GET /stakes?status&tier_id']['filter'] == Stake.query(status='active', tier_id=1)
+    assert shapes['GET /stakes/stats by tier']['pipeline'] == Stake.stats_by_tier_pipeline()
+    assert shapes['reorg: prune journal']['deletes'][0]['q'] == blocks_query(default_pool().key, last=0)
+
+
+def test_require_event_index():
+    unique = {'transaction_hash_1_log_index_1': {'key': EVENT_KEY, 'unique': True}}
+    require_event_index({'raw_events': FakeCollection(unique)})
+
+    not_unique = {'transaction_hash_1_log_index_1': {'key': EVENT_KEY}}
+    for indexes in ({}, not_unique):
+        with pytest.raises(RuntimeError, match='indexes migrate'):
+            require_event_index({'raw_events': FakeCollection(indexes)})
+
+
+@pytest.fixture
+def scratch_database():
+    uri = os.getenv('TEST_MONGODB_URI')
+    if not uri:
+        pytest.skip('TEST_MONGODB_URI not set')
+    from pymongo import MongoClient
+
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+    name = f"chainstalker_test_{os.getpid()}"
+    client.drop_database(name)
+    yield client[name]
+    client.drop_database(name)
+    client.close()
+
+
+def test_query_plans(scratch_database):
+    migrate_collections(scratch_database)
+    migrate_indexes(scratch_database)
+    require_event_index(scratch_database)
+    assert check_query_plans(scratch_database)
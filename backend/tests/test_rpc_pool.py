@@ -0,0 +1,256 @@
+# backend/tests/test_rpc_pool.py - v1.0
+"""
+Failover, hedging and health scoring of app.utils.rpc_pool.EndpointPool
+against local fake JSON-RPC nodes with injected delays and failures.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app.config import config
+from app.utils import rpc_pool
+from app.utils.prometheus_metrics import RPC_HEDGED_REQUESTS
+from app.utils.rpc_pool import EndpointPool, EndpointPoolProvider, RpcEndpointError
+
+
+class FakeNode:
+    """
+    HTTP JSON-RPC node answering every request with `head` after `delay`
+    seconds; `status` other than 200 answers an HTTP error, `error` a
+    JSON-RPC error (HTTP 200).
+    """
+
+    def __init__(self, name, delay=0.0, head=1000):
+        self.name = name
+        self.delay = delay
+        self.head = head
+        self.status = 200
+        self.error = None
+        self.methods = []
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                node.methods.append(request['method'])
+                time.sleep(node.delay)
+                if node.status != 200:
+                    self.send_response(node.status)
+                    self.end_headers()
+                    return
+                reply = {'jsonrpc': '2.0', 'id': request['id'], 'node': node.name}
+                if node.error:
+                    reply['error'] = node.error
+                else:
+                    reply['result'] = hex(node.head)
+                body = json.dumps(reply).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/{name}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def nodes():
+    started = []
+
+    def start(name, **kwargs):
+        node = FakeNode(name, **kwargs)
+        started.append(node)
+        return node
+
+    yield start
+    for node in started:
+        node.close()
+
+
+@pytest.fixture(autouse=True)
+def pool_config(monkeypatch):
+    # Deterministic routing, short timeouts
+    monkeypatch.setattr(rpc_pool, 'EXPLORATION_RATE', 0)
+    monkeypatch.setattr(config, 'RPC_TIMEOUT', 5)
+    monkeypatch.setattr(config, 'RPC_HEDGE_PERCENTILE', 95)
+    monkeypatch.setattr(config, 'RPC_HEDGE_MIN_DELAY', 0.05)
+    monkeypatch.setattr(config, 'RPC_ERROR_THRESHOLD', 3)
+    monkeypatch.setattr(config, 'RPC_COOLDOWN', 30)
+
+
+def body(method='eth_blockNumber', params=None):
+    return json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params or []}).encode()
+
+
+def answered_by(content):
+    return json.loads(content)['node']
+
+
+@pytest.mark.parametrize('hedge_percentile', [0, 95])
+def test_failover_on_http_error(nodes, monkeypatch, hedge_percentile):
+    monkeypatch.setattr(config, 'RPC_HEDGE_PERCENTILE', hedge_percentile)
+    broken, backup = nodes('broken'), nodes('backup', delay=0.01)
+    broken.status = 503
+    pool = EndpointPool([broken.url, backup.url])
+
+    endpoint, content = pool.request(body(), 'eth_blockNumber')
+    assert endpoint is pool.endpoints[1]
+    assert answered_by(content) == 'backup'
+    assert pool.endpoints[0].failures == 1
+    assert pool.endpoints[1].failures == 0
+
+
+def test_rate_limit_answer_fails_over(nodes):
+    limited, backup = nodes('limited'), nodes('backup', delay=0.01)
+    limited.error = {'code': -32005, 'message': 'Too Many Requests'}
+    pool = EndpointPool([limited.url, backup.url])
+
+    _, content = pool.request(body(), 'eth_blockNumber')
+    assert answered_by(content) == 'backup'
+    assert pool.endpoints[0].failures == 1
+
+
+def test_plain_json_rpc_error_is_an_answer(nodes):
+    reverted, backup = nodes('reverted'), nodes('backup')
+    reverted.error = {'code': 3, 'message': 'execution reverted'}
+    pool = EndpointPool([reverted.url, backup.url])
+
+    _, content = pool.request(body('eth_call'), 'eth_call')
+    assert answered_by(content) == 'reverted'
+    assert pool.endpoints[0].failures == 0
+
+
+def test_all_endpoints_failing(nodes):
+    first, second = nodes('first'), nodes('second')
+    first.status = second.status = 502
+    pool = EndpointPool([first.url, second.url])
+
+    with pytest.raises(RpcEndpointError, match='All RPC endpoints failed'):
+        pool.request(body(), 'eth_blockNumber')
+
+
+def test_error_threshold_cools_endpoint_down(nodes, monkeypatch):
+    monkeypatch.setattr(config, 'RPC_COOLDOWN', 0.3)
+    flaky, steady = nodes('flaky'), nodes('steady', delay=0.02)
+    flaky.status = 503
+    pool = EndpointPool([flaky.url, steady.url])
+    flaky_endpoint = pool.endpoints[0]
+
+    for _ in range(config.RPC_ERROR_THRESHOLD):
+        assert flaky_endpoint.healthy
+        pool.request(body(), 'eth_blockNumber')
+    assert not flaky_endpoint.healthy
+    assert pool.ranked()[-1] is flaky_endpoint
+
+    # Cooling down: not tried any more, although it has no latency yet
+    requests_seen = len(flaky.methods)
+    pool.request(body(), 'eth_blockNumber')
+    assert len(flaky.methods) == requests_seen
+
+    # Back in rotation after the cooldown; one success resets its failures
+    time.sleep(0.35)
+    flaky.status = 200
+    assert flaky_endpoint.healthy
+    assert pool.ranked()[0] is flaky_endpoint
+    pool.request(body(), 'eth_blockNumber')
+    assert flaky_endpoint.failures == 0
+
+
+def test_routes_to_fastest_endpoint(nodes, monkeypatch):
+    monkeypatch.setattr(config, 'RPC_HEDGE_PERCENTILE', 0)
+    slow, fast = nodes('slow', delay=0.08), nodes('fast', delay=0.005)
+    pool = EndpointPool([slow.url, fast.url])
+
+    # Unmeasured endpoints are tried first, then the fastest one wins
+    answers = [answered_by(pool.request(body(), 'eth_blockNumber')[1]) for _ in range(6)]
+    assert set(answers[:2]) == {'slow', 'fast'}
+    assert answers[2:] == ['fast'] * 4
+    assert pool.endpoints[1].latency < pool.endpoints[0].latency
+
+
+def test_median_latency_ignores_one_stall():
+    endpoint = rpc_pool.Endpoint('http://127.0.0.1:1/node')
+    for elapsed in (0.01, 0.012, 2.0, 0.011, 0.009):
+        endpoint.record_success(elapsed)
+    assert endpoint.latency == 0.011
+
+
+def test_hedge_delay_uses_latency_percentile():
+    endpoint = rpc_pool.Endpoint('http://127.0.0.1:1/node')
+    endpoint.record_success(0.02)
+    # Too few samples: a multiple of the median, at least RPC_HEDGE_MIN_DELAY
+    assert endpoint.hedge_delay() == pytest.approx(0.08)
+    for i in range(99):
+        endpoint.record_success(0.1 if i >= 94 else 0.02)
+    assert endpoint.hedge_delay() == pytest.approx(0.1)
+
+
+def test_slow_read_is_hedged(nodes):
+    stalled, backup = nodes('stalled', delay=0.01), nodes('backup', delay=0.01)
+    pool = EndpointPool([stalled.url, backup.url])
+    pool.endpoints[0].record_success(0.001)
+    pool.endpoints[1].record_success(0.002)
+    stalled.delay = 1.0
+    hedged = RPC_HEDGED_REQUESTS.labels('eth_blockNumber')._value.get()
+
+    started = time.perf_counter()
+    _, content = pool.request(body(), 'eth_blockNumber')
+    assert time.perf_counter() - started < 0.5
+    assert answered_by(content) == 'backup'
+    assert stalled.methods == ['eth_blockNumber']
+    assert RPC_HEDGED_REQUESTS.labels('eth_blockNumber')._value.get() == hedged + 1
+
+
+def test_fast_read_is_not_hedged(nodes):
+    primary, backup = nodes('primary', delay=0.005), nodes('backup')
+    pool = EndpointPool([primary.url, backup.url])
+    pool.endpoints[0].record_success(0.005)
+    pool.endpoints[1].record_success(0.05)
+
+    _, content = pool.request(body(), 'eth_blockNumber')
+    assert answered_by(content) == 'primary'
+    assert backup.methods == []
+
+
+def test_writes_are_neither_hedged_nor_retried(nodes):
+    slow, backup = nodes('slow', delay=0.3), nodes('backup')
+    pool = EndpointPool([slow.url, backup.url])
+    pool.endpoints[0].record_success(0.001)
+    pool.endpoints[1].record_success(0.002)
+
+    slow.status = 503
+    with pytest.raises(RpcEndpointError):
+        pool.request(body('eth_sendRawTransaction', ['0x00']), 'eth_sendRawTransaction')
+    slow.status = 200
+    _, content = pool.request(body('eth_sendRawTransaction', ['0x00']), 'eth_sendRawTransaction')
+    assert answered_by(content) == 'slow'
+    assert backup.methods == []
+
+
+def test_lagging_endpoint_skipped_for_newer_blocks(nodes):
+    lagging, synced = nodes('lagging', head=90), nodes('synced', delay=0.02, head=100)
+    provider = EndpointPoolProvider(EndpointPool([lagging.url, synced.url]))
+    pool = provider.endpoints
+
+    # Heads are learnt from eth_blockNumber answers
+    provider.make_request('eth_blockNumber', [])
+    provider.make_request('eth_blockNumber', [])
+    assert [endpoint.head for endpoint in pool.endpoints] == [90, 100]
+
+    params = [{'fromBlock': hex(95), 'toBlock': hex(100)}]
+    assert pool.ranked(rpc_pool.required_block('eth_getLogs', params)) == [pool.endpoints[1]]
+    # Old enough for both: the faster one first
+    assert pool.ranked(80)[0] is pool.endpoints[0]
+    # Nobody has it yet: every endpoint rather than none
+    assert len(pool.ranked(200)) == 2
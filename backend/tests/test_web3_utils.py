@@ -0,0 +1,28 @@
+# backend/tests/test_web3_utils.py - v1.0
+"""Only the providers' "range too large" errors split an eth_getLogs range."""
+import pytest
+import requests
+from app.utils.web3_utils import is_range_limit_error
+
+
+@pytest.mark.parametrize('message', [
+    'query returned more than 10000 results',
+    'Log response size exceeded. You can make eth_getLogs requests with up to a 2K block range',
+    'eth_getLogs is limited to a 10000 block range',
+    'exceed maximum block range: 5000',
+    'block range is too wide',
+    'block range too large',
+])
+def test_range_limit_errors_split(message):
+    assert is_range_limit_error(ValueError({'code': -32005, 'message': message}))
+
+
+@pytest.mark.parametrize('error', [
+    ValueError({'code': 429, 'message': 'Your app has exceeded its compute units per second capacity'}),
+    ValueError({'code': -32005, 'message': 'daily request count limit exceeded'}),
+    ValueError('rate limit exceeded'),
+    requests.exceptions.Timeout('Read timed out. (read timeout=10)'),
+    TimeoutError('timeout'),
+])
+def test_rate_limits_and_timeouts_do_not_split(error):
+    assert not is_range_limit_error(error)
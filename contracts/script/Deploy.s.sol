@@ -4,6 +4,7 @@ pragma solidity ^0.8.20;
 import {Script, console} from "forge-std/Script.sol";
 import {StakingPool} from "src/StakingPool.sol";
 import {MockDAI} from "test/mocks/MockDAI.sol";
+import {Multicall3} from "test/mocks/Multicall3.sol";
 import {IERC20} from "@openzeppelin/contracts/token/ERC20/IERC20.sol";
 
 contract DeployScript is Script {
@@ -15,6 +16,7 @@ contract DeployScript is Script {
         uint256 protocolFeeBps = vm.envUint("PROTOCOL_FEE_BPS");
         uint256 initialRewardPool = vm.envUint("INITIAL_REWARD_POOL");
         bool deployMockDAI = vm.envBool("DEPLOY_MOCK_DAI");
+        bool deployMulticall = vm.envOr("DEPLOY_MULTICALL", false);
 
         address deployer = vm.addr(deployerPrivateKey);
 
@@ -43,6 +45,14 @@ contract DeployScript is Script {
         
         console.log("StakingPool deployed at:", address(stakingPool));
 
+        // Local chains have no canonical Multicall3; the backend batches reads through it
+        address multicallAddress;
+        if (deployMulticall) {
+            console.log("\nDeploying Multicall3...");
+            multicallAddress = address(new Multicall3());
+            console.log("Multicall3 deployed at:", multicallAddress);
+        }
+
         // ========== IMPROVED FUNDING LOGIC ==========
         if (initialRewardPool > 0) {
             console.log("\n=== Funding Reward Pool ===");
@@ -74,6 +84,9 @@ contract DeployScript is Script {
         console.log("Deployer:", deployer);
         console.log("DAI Address:", daiAddress);
         console.log("StakingPool Address:", address(stakingPool));
+        if (deployMulticall) {
+            console.log("Multicall3 Address:", multicallAddress);
+        }
         console.log("Fee Collector:", feeCollector);
         console.log("Max Stake Per User:", maxStakePerUser);
         console.log("Max Total Stake:", maxTotalStake);